@@ -0,0 +1,228 @@
+"""
+analytics.py
+
+Модуль аналитики аудиторий групп.
+
+Содержит:
+- Построение разреженной матрицы инцидентности лид × группа из выгрузок сборщиков.
+- Число групп на лида и пересечение аудиторий групп (на `scipy`, если он установлен).
+
+Автор: sergiomarotco, https://github.com/sergiomarotco/vk_lead_searcher
+Дата: 2026-10-19
+"""
+import argparse
+import os
+from array import array
+from collections import Counter
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Tuple
+import classes.bcolors as b
+import classes.vk_api_params as vk_p
+from classes import events
+from classes.run_context import RunContext, DEFAULT_CONTEXT
+import export_leads
+from export_leads import FORMAT_AUTO, FORMATS, pa
+
+try:
+    import numpy as np
+    import scipy.sparse as sp
+except ImportError:  # без scipy пересечения считаются на множествах Python
+    np = None
+    sp = None
+
+
+MIN_GROUPS = 2  # лид попадает в таблицу горячих лидов, если активен хотя бы в стольких группах
+TOP_PAIRS = 1000  # сколько пар групп с наибольшей общей аудиторией сохранять
+TOP_PRINT = 10  # сколько пар выводить на экран
+
+LEAD_COLUMNS = ["lead_id", "lead_url", "groups", "interactions"]
+OVERLAP_COLUMNS = ["group_a", "group_b", "shared", "size_a", "size_b", "jaccard"]
+
+LEAD_SCHEMA = OVERLAP_SCHEMA = None
+if pa is not None:
+    LEAD_SCHEMA = pa.schema([
+        ("lead_id", pa.int64()), ("lead_url", pa.string()), ("groups", pa.int64()), ("interactions", pa.int64()),
+    ])
+    OVERLAP_SCHEMA = pa.schema([
+        ("group_a", pa.int64()), ("group_b", pa.int64()), ("shared", pa.int64()), ("size_a", pa.int64()),
+        ("size_b", pa.int64()), ("jaccard", pa.float64()),
+    ])
+
+
+class Incidence:
+    """Класс матрицы инцидентности лид × группа.
+    Описание:
+
+        - копит взаимодействия (`add`) и строит разреженную матрицу CSR (`matrix`, требует `scipy`).
+    """
+
+    def __init__(self):
+        self.lead_index: Dict[int, int] = {}
+        self.group_index: Dict[int, int] = {}
+        self.leads: List[int] = []
+        self.groups: List[int] = []
+        self.rows = array("q")
+        self.cols = array("q")
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, lead_id: int, group_id: int) -> None:
+        """
+        Учесть взаимодействие лида в группе
+        :param lead_id: id лида
+        :param group_id: id группы
+        """
+        row = self.lead_index.get(lead_id)
+        if row is None:
+            row = self.lead_index[lead_id] = len(self.leads)
+            self.leads.append(lead_id)
+        col = self.group_index.get(group_id)
+        if col is None:
+            col = self.group_index[group_id] = len(self.groups)
+            self.groups.append(group_id)
+        self.rows.append(row)
+        self.cols.append(col)
+
+    def matrix(self):
+        """
+        Разреженная матрица взаимодействий
+        :return: `scipy.sparse.csr_matrix` размера лиды × группы
+        """
+        rows = np.frombuffer(self.rows, dtype=np.int64) if len(self.rows) else np.zeros(0, dtype=np.int64)
+        cols = np.frombuffer(self.cols, dtype=np.int64) if len(self.cols) else np.zeros(0, dtype=np.int64)
+        data = np.ones(len(rows), dtype=np.int32)
+        # coo → csr суммирует повторы: в ячейке остается число взаимодействий лида в группе
+        return sp.coo_matrix((data, (rows, cols)), shape=(len(self.leads), len(self.groups))).tocsr()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "Incidence":
+        """
+        Построить матрицу из строк взаимодействий
+        :param rows: Строки `export_leads.iter_interactions` (без группы или лида — пропускаются)
+        :return: Матрица инцидентности
+        """
+        incidence = cls()
+        for row in rows:
+            if row["lead_id"] is not None and row["group_id"] is not None:
+                incidence.add(row["lead_id"], row["group_id"])
+        return incidence
+
+
+def lead_url(lead_id: int) -> str:
+    return f"{vk_p.URI}/id{lead_id}" if lead_id > 0 else f"{vk_p.URI}/club{-lead_id}"
+
+
+def analyze_sparse(incidence: Incidence, min_groups: int = MIN_GROUPS,
+                   top_pairs: int = TOP_PAIRS) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Горячие лиды и пересечения аудиторий групп на разреженной матрице
+    :param incidence: Матрица инцидентности
+    :param min_groups: Минимум групп у лида для таблицы лидов
+    :param top_pairs: Сколько пар групп с наибольшей общей аудиторией вернуть
+    :return: Строки лидов (`LEAD_COLUMNS`) и пар групп (`OVERLAP_COLUMNS`)
+    """
+    counts = incidence.matrix()
+    binary = counts.copy()
+    binary.data[:] = 1  # лид либо есть в аудитории группы, либо нет
+    lead_groups = np.asarray(binary.sum(axis=1)).ravel()
+    lead_interactions = np.asarray(counts.sum(axis=1)).ravel()
+    group_sizes = np.asarray(binary.sum(axis=0)).ravel()
+
+    hot = np.flatnonzero(lead_groups >= min_groups)
+    hot = hot[np.lexsort((-lead_interactions[hot], -lead_groups[hot]))]
+    leads = [{"lead_id": incidence.leads[i], "lead_url": lead_url(incidence.leads[i]),
+              "groups": int(lead_groups[i]), "interactions": int(lead_interactions[i])} for i in hot]
+
+    shared = (binary.T @ binary).tocoo()  # общие лиды всех пар групп одним произведением
+    upper = shared.row < shared.col
+    a, c, n = shared.row[upper], shared.col[upper], shared.data[upper].astype(np.int64)
+    if top_pairs and len(n) > top_pairs:
+        keep = np.argpartition(-n, top_pairs - 1)[:top_pairs]
+        a, c, n = a[keep], c[keep], n[keep]
+    jaccard = n / (group_sizes[a] + group_sizes[c] - n)
+    order = np.lexsort((-jaccard, -n))
+    pairs = [{"group_a": incidence.groups[a[i]], "group_b": incidence.groups[c[i]], "shared": int(n[i]),
+              "size_a": int(group_sizes[a[i]]), "size_b": int(group_sizes[c[i]]), "jaccard": round(float(jaccard[i]), 6)}
+             for i in order]
+    return leads, pairs
+
+
+def analyze_python(incidence: Incidence, min_groups: int = MIN_GROUPS,
+                   top_pairs: int = TOP_PAIRS) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    То же, что `analyze_sparse`, на множествах Python (без `scipy`)
+    :param incidence: Матрица инцидентности
+    :param min_groups: Минимум групп у лида для таблицы лидов
+    :param top_pairs: Сколько пар групп с наибольшей общей аудиторией вернуть
+    :return: Строки лидов (`LEAD_COLUMNS`) и пар групп (`OVERLAP_COLUMNS`)
+    """
+    lead_groups: Dict[int, set] = {}
+    lead_interactions: Counter = Counter()
+    for row, col in zip(incidence.rows, incidence.cols):
+        lead_groups.setdefault(row, set()).add(col)
+        lead_interactions[row] += 1
+    group_sizes: Counter = Counter()
+    shared: Counter = Counter()
+    for cols in lead_groups.values():
+        group_sizes.update(cols)
+        shared.update(combinations(sorted(cols), 2))
+
+    leads = [{"lead_id": incidence.leads[r], "lead_url": lead_url(incidence.leads[r]),
+              "groups": len(cols), "interactions": lead_interactions[r]}
+             for r, cols in lead_groups.items() if len(cols) >= min_groups]
+    leads.sort(key=lambda x: (-x["groups"], -x["interactions"]))
+
+    pairs = []
+    for (a, c), n in shared.most_common(top_pairs or None):
+        pairs.append({"group_a": incidence.groups[a], "group_b": incidence.groups[c], "shared": n,
+                      "size_a": group_sizes[a], "size_b": group_sizes[c],
+                      "jaccard": round(n / (group_sizes[a] + group_sizes[c] - n), 6)})
+    pairs.sort(key=lambda x: (-x["shared"], -x["jaccard"]))
+    return leads, pairs
+
+
+def main_analytics(ctx: RunContext = DEFAULT_CONTEXT, export_format: str = FORMAT_AUTO,
+                   min_groups: int = MIN_GROUPS, top_pairs: int = TOP_PAIRS) -> Dict[str, Any]:
+    """
+    Найти лидов, активных в нескольких группах, и пересечения аудиторий групп
+    :param ctx: Контекст запуска (каталог и пути файлов)
+    :param export_format: auto (Parquet, если установлен pyarrow, иначе CSV), parquet или csv
+    :param min_groups: Минимум групп у лида для таблицы горячих лидов
+    :param top_pairs: Сколько пар групп с наибольшей общей аудиторией сохранить (0 — все)
+    :return: Пути к файлам и сводка
+    """
+    files = ctx.makedirs().files
+    export_format = export_leads.resolve_format(export_format)
+    ext = "." + export_format
+    leads_file = os.path.splitext(files.ANALYTICS_LEADS)[0] + ext
+    overlap_file = os.path.splitext(files.ANALYTICS_OVERLAP)[0] + ext
+
+    incidence = Incidence.from_rows(export_leads.iter_interactions(ctx))
+    analyze = analyze_sparse if sp is not None else analyze_python
+    leads, pairs = analyze(incidence, min_groups, top_pairs)
+    export_leads.write_table(leads, leads_file, LEAD_COLUMNS, export_format, LEAD_SCHEMA)
+    export_leads.write_table(pairs, overlap_file, OVERLAP_COLUMNS, export_format, OVERLAP_SCHEMA)
+
+    result = {"backend": "scipy" if sp is not None else "python", "format": export_format,
+              "interactions": len(incidence), "leads": len(incidence.leads), "groups": len(incidence.groups),
+              "hot_leads": len(leads), "min_groups": min_groups, "pairs": len(pairs),
+              "top_shared": pairs[:TOP_PRINT], "leads_file": leads_file, "overlap_file": overlap_file}
+    ctx.record_stage("analytics", **result)
+    events.info(f"{b.GREEN}Лиды, активные в {min_groups}+ группах ({len(leads)} из {len(incidence.leads)}), "
+                f"сохранены в{b.END} {b.BLUE}{leads_file}{b.END}")
+    events.info(f"{b.GREEN}Пересечения аудиторий ({len(pairs)} пар групп) сохранены в{b.END} {b.BLUE}{overlap_file}{b.END}")
+    for p in pairs[:TOP_PRINT]:
+        events.info(f"  {vk_p.URI}/club{p['group_a']} ∩ {vk_p.URI}/club{p['group_b']}: "
+                    f"{b.YELLOW}{p['shared']}{b.END} общих, Жаккар {p['jaccard']:.3f}", event="shared_audience", **p)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Найти лидов из нескольких групп и пересечения аудиторий групп")
+    parser.add_argument("--out_dir", help="Каталог файлов запуска", default=DEFAULT_CONTEXT.out_dir, type=str)
+    parser.add_argument("--format", dest="export_format", help="Формат выгрузки", default=FORMAT_AUTO, choices=FORMATS)
+    parser.add_argument("--min_groups", help="Минимум групп у лида", default=MIN_GROUPS, type=int)
+    parser.add_argument("--top_pairs", help="Сколько пар групп сохранить (0 — все)", default=TOP_PAIRS, type=int)
+    args = parser.parse_args()
+    main_analytics(RunContext(args.out_dir), args.export_format, args.min_groups, args.top_pairs)
@@ -0,0 +1,113 @@
+"""
+intent_index_benchmark.py
+
+Бенчмарк разметки комментариев интентами.
+
+Содержит:
+- Генерацию синтетических комментариев (часть из них содержит фразы из файла интентов).
+- Замер времени компиляции индекса и скорости разметки за один проход.
+- Сравнение с наивным поиском (`phrase in text` для каждой фразы) на части выборки.
+  При десятках фраз наивный поиск на C сопоставим с автоматом на Python; с ростом словаря
+  (`--synthetic_phrases`) время наивного поиска растет линейно, а время автомата почти не меняется.
+
+Запуск из корня репозитория:
+    python benchmarks/intent_index_benchmark.py --comments 2000000 --synthetic_phrases 1000
+
+Автор: sergiomarotco, https://github.com/sergiomarotco/vk_lead_searcher
+Дата: 2026-10-19
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes import intent_index  # noqa: E402  (путь к корню репозитория добавлен выше)
+from classes.intent_index import IntentIndex, normalize, read_phrases, INTENTS_FILE  # noqa: E402
+
+
+FILLER = ("отличные фото", "очень красиво", "спасибо большое", "супер", "класс", "какая прелесть",
+          "вау", "лучший фотограф", "а где это снимали", "мы тоже были на этой свадьбе", "нравится стиль")
+INTENT_SHARE = 0.05  # доля комментариев с фразой интента
+
+
+def generate_comments(count: int, phrases: list, seed: int = 1) -> list:
+    """
+    Сгенерировать синтетические комментарии
+    :param count: Количество комментариев
+    :param phrases: Фразы интентов (интент, фраза)
+    :param seed: Зерно генератора случайных чисел
+    :return: Список текстов
+    """
+    rnd = random.Random(seed)
+    plain = [p for _, p in phrases if not p.startswith(intent_index.REGEX_PREFIX)]
+    comments = []
+    for _ in range(count):
+        words = [rnd.choice(FILLER) for _ in range(rnd.randint(1, 4))]
+        if plain and rnd.random() < INTENT_SHARE:
+            words.insert(rnd.randint(0, len(words)), rnd.choice(plain).capitalize())
+        comments.append(", ".join(words) + rnd.choice(("", "!", "?", ")))")))
+    return comments
+
+
+def synthetic_phrases(count: int, seed: int = 2) -> list:
+    """
+    Сгенерировать случайные фразы для проверки масштабирования по размеру словаря
+    :param count: Количество фраз
+    :param seed: Зерно генератора случайных чисел
+    :return: Пары (интент, фраза)
+    """
+    rnd = random.Random(seed)
+    alphabet = "абвгдежзийклмнопрстуфхцчшщыэюя"
+    return [("noise", "".join(rnd.choice(alphabet) for _ in range(rnd.randint(6, 14)))) for _ in range(count)]
+
+
+def main_benchmark(comments_count: int, phrases_file: str = INTENTS_FILE, naive_sample: int = 100000,
+                   extra_phrases: int = 0) -> None:
+    """
+    Выполнить бенчмарк
+    :param comments_count: Количество синтетических комментариев
+    :param phrases_file: Файл фраз интентов
+    :param naive_sample: Сколько комментариев проверить наивным поиском для сравнения
+    :param extra_phrases: Сколько случайных фраз добавить в словарь
+    """
+    phrases = read_phrases(phrases_file)
+    comment_phrases = list(phrases)
+    phrases += synthetic_phrases(extra_phrases)
+    print(f"Бэкенд автомата: {'pyahocorasick' if intent_index.ahocorasick is not None else 'python'}, фраз: {len(phrases)}")
+
+    started = time.perf_counter()
+    comments = generate_comments(comments_count, comment_phrases)
+    print(f"Сгенерировано комментариев: {len(comments)} за {time.perf_counter() - started:.1f} с")
+
+    started = time.perf_counter()
+    index = IntentIndex(phrases)
+    print(f"Компиляция индекса: {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    started = time.perf_counter()
+    tagged = sum(1 for text in comments if index.classify(text))
+    elapsed = time.perf_counter() - started
+    print(f"Индекс: {len(comments) / elapsed:,.0f} комментариев/с, {elapsed:.1f} с, с интентами: {tagged}")
+
+    sample = comments[:naive_sample]
+    plain = [normalize(p) for _, p in phrases if not p.startswith(intent_index.REGEX_PREFIX)]
+    started = time.perf_counter()
+    naive_tagged = 0
+    for text in sample:
+        normalized = normalize(text)
+        naive_tagged += any(p in normalized for p in plain)
+    naive_elapsed = time.perf_counter() - started
+    print(f"Наивный поиск (выборка {len(sample)}): {len(sample) / naive_elapsed:,.0f} комментариев/с, "
+          f"с интентами: {naive_tagged}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк разметки комментариев интентами")
+    parser.add_argument("--comments", "-n", type=int, help="Количество синтетических комментариев", default=1000000)
+    parser.add_argument("--phrases", "-p", help="Файл фраз интентов", default=INTENTS_FILE)
+    parser.add_argument("--naive_sample", type=int, help="Размер выборки для наивного поиска", default=100000)
+    parser.add_argument("--synthetic_phrases", type=int, help="Сколько случайных фраз добавить в словарь", default=0)
+    args = parser.parse_args()
+    main_benchmark(args.comments, args.phrases, args.naive_sample, args.synthetic_phrases)
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import Counter
+from typing import Callable
+from classes import vk_api_params as vk_p
+
+
+class ApiBudget:
+    """Класс бюджета запросов.
+    Описание:
+
+        - считает вызовы VK API и ограничивает их числом (`max_calls`) и временем работы (`deadline_minutes`), 0 — без ограничения.
+    """
+
+    def __init__(self, max_calls: int = 0, deadline_minutes: float = 0):
+        self.max_calls = max_calls
+        self.started_ts = time.time()
+        self.deadline_ts = self.started_ts + deadline_minutes * 60 if deadline_minutes else 0
+        self.calls = 0
+        self.calls_by_method: Counter = Counter()
+        self._lock = threading.Lock()
+        self.seconds_per_call: Callable[[], float] = lambda: vk_p.API_SLEEP  # текущий темп задает общий клиент
+
+    @property
+    def limited(self) -> bool:
+        """
+        Задано ли ограничение по числу вызовов или по времени
+        :return: True, если бюджет ограничен
+        """
+        return bool(self.max_calls or self.deadline_ts)
+
+    def spend(self, method: str, n: int = 1) -> None:
+        """
+        Учесть вызов метода API
+        :param method: Имя метода, например `wall.get`
+        :param n: Количество вызовов
+        """
+        with self._lock:
+            self.calls += n
+            self.calls_by_method[method] += n
+
+    def remaining_calls(self) -> float:
+        """
+        Сколько вызовов еще можно сделать
+        :return: Остаток вызовов (бесконечность, если ограничения нет)
+        """
+        calls_left = self.max_calls - self.calls if self.max_calls else float("inf")
+        if self.deadline_ts:
+            time_left = max(0.0, self.deadline_ts - time.time())
+            calls_left = min(calls_left, time_left / self.seconds_per_call())
+        return max(0.0, calls_left)
+
+    def can_afford(self, calls: int) -> bool:
+        """
+        Хватит ли бюджета на задачу
+        :param calls: Оценка числа вызовов задачи
+        :return: True, если бюджета хватает
+        """
+        return self.remaining_calls() >= calls
+
+    def exhausted(self) -> bool:
+        """
+        Исчерпан ли бюджет
+        :return: True, если больше вызовов делать нельзя
+        """
+        return self.remaining_calls() < 1
+
+    def summary(self) -> dict:
+        """
+        Сводка по расходу бюджета
+        :return: Словарь со статистикой
+        """
+        return {
+            "calls": self.calls,
+            "max_calls": self.max_calls,
+            "elapsed_sec": round(time.time() - self.started_ts, 1),
+            "calls_by_method": dict(self.calls_by_method),
+        }
+
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+from classes import serializer
+from classes.file_lock import file_lock
+
+
+ENGAGEMENT_INDEX_FILE_NAME = "engagement_index.json"  # общий для всех запусков в out_dir
+SAMPLE_POSTS = 20  # постов в запросе wall.get фильтра групп (тот же один вызов, что и для последнего поста)
+MIN_SPAN_DAYS = 1.0  # не считать темп публикаций по интервалу короче суток
+SMOOTHING = 0.5  # вес новой оценки при сглаживании с сохраненной
+MIN_YIELD = 0.0  # порог ожидаемого выхода по умолчанию: группы не отбрасываются
+_SMOOTHED = ("posts_per_day", "avg_likes", "avg_comments", "expected_yield")
+
+
+def engagement_from_posts(posts: Iterable[Dict[str, Any]], members_count: Optional[int] = None,
+                          now: float = None) -> Dict[str, Any]:
+    """
+    Оценить вовлеченность группы по последним постам
+    :param posts: Посты из ответа `wall.get` (закрепленный пост не учитывается в темпе публикаций)
+    :param members_count: Число участников группы (если известно)
+    :param now: Текущее время (unix timestamp)
+    :return: Постов в день, лайков и комментариев на пост, участников, ожидаемый выход лидов в день
+    """
+    now = now or time.time()
+    posts = [p for p in posts if not p.get("is_pinned")]
+    stats = {"posts_per_day": 0.0, "avg_likes": 0.0, "avg_comments": 0.0, "members_count": members_count,
+             "expected_yield": 0.0, "sampled": len(posts)}
+    if not posts:
+        return stats
+    oldest = min(p.get("date", now) for p in posts)
+    stats["posts_per_day"] = len(posts) / max(MIN_SPAN_DAYS, (now - oldest) / (24 * 60 * 60))
+    stats["avg_likes"] = sum(p.get("likes", {}).get("count", 0) for p in posts) / len(posts)
+    stats["avg_comments"] = sum(p.get("comments", {}).get("count", 0) for p in posts) / len(posts)
+    stats["expected_yield"] = stats["posts_per_day"] * (stats["avg_likes"] + stats["avg_comments"])
+    return stats
+
+
+class EngagementIndex:
+    """Класс индекса вовлеченности групп.
+    Описание:
+
+        - хранит сглаженные оценки групп (`update`) и ожидаемый выход лидов в день (`expected_yield`).
+    """
+
+    def __init__(self, path: str = "", entries: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = entries or {}
+        self.updated = 0  # оценок, записанных за этот запуск
+        self.dropped = 0  # групп, отброшенных по порогу за этот запуск
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def update(self, group_id: int, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Записать оценку группы
+        :param group_id: id группы (знак не важен)
+        :param stats: Оценка `engagement_from_posts`
+        :return: Сглаженная оценка, сохраненная в индексе
+        """
+        key = str(abs(int(group_id)))
+        with self._lock:
+            previous = self.entries.get(key)
+            entry = dict(stats)
+            if previous is not None:
+                for name in _SMOOTHED:
+                    entry[name] = SMOOTHING * stats[name] + (1 - SMOOTHING) * previous.get(name, 0.0)
+                if entry.get("members_count") is None:
+                    entry["members_count"] = previous.get("members_count")
+            entry = {k: round(v, 3) if isinstance(v, float) else v for k, v in entry.items()}
+            entry["updated"] = int(time.time())
+            self.entries[key] = entry
+            self.updated += 1
+        return entry
+
+    def expected_yield(self, group_id: int) -> Optional[float]:
+        """
+        Ожидаемый выход лидов группы
+        :param group_id: id группы (знак не важен)
+        :return: Взаимодействий в день или None, если группа не оценивалась
+        """
+        entry = self.entries.get(str(abs(int(group_id))))
+        return entry["expected_yield"] if entry else None
+
+    def below(self, group_id: int, min_yield: float) -> bool:
+        """
+        Проверить, нужно ли отбросить группу по порогу
+        :param group_id: id группы (знак не важен)
+        :param min_yield: Порог ожидаемого выхода лидов в день (0 — не отбрасывать)
+        :return: True, если группа оценена и ее выход ниже порога
+        """
+        if min_yield <= 0:
+            return False
+        value = self.expected_yield(group_id)
+        if value is None or value >= min_yield:
+            return False
+        with self._lock:
+            self.dropped += 1
+        return True
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Сводка для метаданных запуска
+        :return: Размер индекса, обновлено оценок и отброшено групп за запуск
+        """
+        return {"size": len(self.entries), "updated": self.updated, "dropped": self.dropped}
+
+    @classmethod
+    def load(cls, path: str) -> "EngagementIndex":
+        """
+        Прочитать индекс из файла
+        :param path: Путь к файлу
+        :return: Индекс (пустой, если файла нет)
+        """
+        entries = serializer.load(path) if os.path.exists(serializer.resolve_path(path)) else {}
+        return cls(path, entries)
+
+    def save(self, path: str = "") -> None:
+        """
+        Сохранить индекс в файл
+        :param path: Путь к файлу (по умолчанию — путь, из которого индекс загружен); оценки в файле объединяются с текущими
+        """
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with file_lock(path), self._lock:  # индекс общий для запусков: оценки других запусков не теряются
+            entries = EngagementIndex.load(path).entries
+            for key, entry in self.entries.items():
+                if key not in entries or entries[key].get("updated", 0) <= entry.get("updated", 0):
+                    entries[key] = entry
+            self.entries = entries
+            serializer.dump(self.entries, path)
@@ -0,0 +1,182 @@
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, IO, Optional
+from classes import serializer
+
+
+DEBUG = "debug"
+INFO = "info"
+WARNING = "warning"
+ERROR = "error"
+LEVELS = {DEBUG: 10, INFO: 20, WARNING: 30, ERROR: 40}
+
+MODE_TEXT = "text"
+MODE_QUIET = "quiet"
+MODE_JSON = "json"
+MODES = [MODE_TEXT, MODE_QUIET, MODE_JSON]
+
+PROGRESS_INTERVAL = 1.0  # секунд между выводами строки прогресса
+_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+
+_config: Dict[str, Any] = {"mode": MODE_TEXT, "level": LEVELS[INFO], "interval": PROGRESS_INTERVAL, "stream": None}
+_drawn = {"line": False}  # в терминале выведена строка прогресса без перевода строки
+_lock = threading.Lock()
+
+
+def configure(mode: str = None, level: str = None, progress_interval: float = None, stream: IO = None) -> None:
+    """
+    Настроить вывод событий
+    :param mode: text, quiet или json
+    :param level: Минимальный уровень событий: debug, info, warning, error
+    :param progress_interval: Секунд между выводами строки прогресса
+    :param stream: Поток вывода (по умолчанию — stdout)
+    """
+    if mode is not None:
+        if mode not in MODES:
+            raise ValueError(f"Неизвестный режим вывода {mode}: ожидается один из {MODES}")
+        _config["mode"] = mode
+    if level is not None:
+        _config["level"] = LEVELS[level]
+    if progress_interval is not None:
+        _config["interval"] = max(0.0, progress_interval)
+    if stream is not None:
+        _config["stream"] = stream
+
+
+def _stream() -> IO:
+    return _config["stream"] or sys.stdout
+
+
+def _is_tty() -> bool:
+    isatty = getattr(_stream(), "isatty", None)
+    return bool(isatty and isatty())
+
+
+def enabled(level: str) -> bool:
+    """
+    Будет ли выведено событие уровня
+    :param level: Уровень события
+    :return: True, если событие проходит фильтр режима и уровня
+    """
+    value = LEVELS[level]
+    if _config["mode"] == MODE_QUIET and value < LEVELS[WARNING]:
+        return False
+    return value >= _config["level"]
+
+
+def _write(line: str, progress: bool = False) -> None:
+    with _lock:
+        stream = _stream()
+        if _drawn["line"] and not progress:  # событие не должно дописываться в строку прогресса
+            stream.write("\n")
+        _drawn["line"] = progress
+        stream.write(line)
+        stream.flush()
+
+
+def emit(event: str, message: str = "", level: str = INFO, **fields) -> None:
+    """
+    Вывести событие
+    :param event: Имя события, например `stage_error`
+    :param message: Текст для режима text (может содержать цвета `classes.bcolors`)
+    :param level: Уровень события
+    :param fields: Поля события (в режиме json выводятся как есть)
+    """
+    if not enabled(level):
+        return
+    if _config["mode"] == MODE_JSON:
+        record = {"ts": round(time.time(), 3), "level": level, "event": event}
+        if message:
+            record["msg"] = _ANSI.sub("", message)
+        record.update(fields)
+        _write(serializer.dumps(record, indent=False).decode("utf-8") + "\n")
+        return
+    line = message or f"{event}: " + ", ".join(f"{k}={v}" for k, v in fields.items())
+    _write((line if _is_tty() else _ANSI.sub("", line)) + "\n")
+
+
+def info(message: str, event: str = "message", **fields) -> None:
+    """Событие уровня info"""
+    emit(event, message, INFO, **fields)
+
+
+def warning(message: str, event: str = "warning", **fields) -> None:
+    """Событие уровня warning"""
+    emit(event, message, WARNING, **fields)
+
+
+def error(message: str, event: str = "error", **fields) -> None:
+    """Событие уровня error"""
+    emit(event, message, ERROR, **fields)
+
+
+class Progress:
+    """Класс прогресса этапа.
+    Описание:
+
+        - копит счетчики этапа (`update`) и выводит прогресс не чаще `PROGRESS_INTERVAL` секунд;
+        - при закрытии выводит итог и предупреждение `stage_errors`, если были ошибки.
+    """
+
+    def __init__(self, stage: str, total: Optional[int] = None, unit: str = "", name: str = ""):
+        self.stage = stage
+        self.name = name or stage  # имя этапа в событиях (`wall_posts`, `remove_old` и т.п.)
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.counters: Counter = Counter()
+        self.started = time.monotonic()
+        self._last = self.started
+
+    def __enter__(self) -> "Progress":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def update(self, n: int = 1, **counts: int) -> None:
+        """
+        Учесть обработанные элементы и счетчики
+        :param n: Сколько элементов обработано
+        :param counts: Приращения счетчиков
+        """
+        self.done += n
+        if counts:
+            self.counters.update(counts)
+        now = time.monotonic()
+        if now - self._last >= _config["interval"]:
+            self._render(now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Текущее состояние для событий и метаданных запуска
+        :return: Обработано, всего, секунд с начала и счетчики
+        """
+        return {"stage": self.stage, "done": self.done, "total": self.total,
+                "elapsed": round(time.monotonic() - self.started, 1), **self.counters}
+
+    def _render(self, now: float, final: bool = False) -> None:
+        self._last = now
+        if not enabled(INFO):
+            return
+        if _config["mode"] == MODE_JSON:
+            emit("progress", level=INFO, final=final, **self.snapshot())
+            return
+        elapsed = max(now - self.started, 1e-9)
+        done = f"{self.done}/{self.total}" if self.total else str(self.done)
+        counts = " ".join(f"{k}={v}" for k, v in self.counters.items())
+        line = f"{self.stage}: {done}{self.unit} [{elapsed:.0f} с, {self.done / elapsed:.1f}/с] {counts}".rstrip()
+        if _is_tty():
+            _write("\r\x1b[2K" + line + ("\n" if final else ""), progress=not final)
+        else:
+            _write(line + "\n")
+
+    def close(self) -> None:
+        """Вывести итог этапа и предупреждение об ошибках запросов"""
+        self._render(time.monotonic(), final=True)
+        if self.counters["errors"]:
+            warning(f"{self.stage}: ошибок запросов {self.counters['errors']} (подробности — в событиях уровня debug)",
+                    event="stage_errors", stage=self.name, errors=self.counters["errors"])
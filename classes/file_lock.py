@@ -0,0 +1,41 @@
+import contextlib
+import os
+from typing import Iterator
+
+if os.name == "nt":
+    import msvcrt  # pylint: disable=import-error
+
+    def _lock(f) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock(f) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(f) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock(f) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+LOCK_SUFFIX = ".lock"
+
+
+@contextlib.contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """
+    Держать исключительную блокировку файла между процессами (и потоками: каждый вход открывает файл заново)
+    :param path: Путь к защищаемому файлу или каталогу; замок — файл `path + LOCK_SUFFIX` рядом с ним
+    """
+    lock_path = path + LOCK_SUFFIX
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    with open(lock_path, "a+b") as f:
+        _lock(f)
+        try:
+            yield
+        finally:
+            _unlock(f)
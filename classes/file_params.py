@@ -1,9 +1,14 @@
+import os
+
+
 class FileParams:
     """Класс с параметрами путей файлов.
     Описание:
 
-        - объявляет константы с путями к файлам отчетов в формате JSON и TXT.
+        - объявляет константы с путями к файлам отчетов в формате JSON и TXT;
+        - экземпляр хранит те же пути внутри другого каталога (например, каталога кампании).
     """
+    REPORTS_DIR = "reports"
     PHOTOS_LIKES_FILE = "reports/photos_likes.json"
     PHOTOS_COMMENTS_FILE = "reports/photos_comments.json"
     GROUPS_SEARCH_FILE = "reports/groups_search.json"
@@ -13,7 +18,43 @@ class FileParams:
     WALL_POSTS = "reports/wall_posts.json"
     REPORT_FILE = "reports/report.txt"
     REPORT_UNIC_USERS = "reports/report_unic_users.txt"
+    PLAN_FILE = "reports/plan.json"
+    REPORT_INTENTS = "reports/report_intents.txt"
+    REPORT_NEW_LEADS = "reports/report_new_leads.txt"
+    EXPORT_INTERACTIONS = "reports/export_interactions.parquet"  # расширение меняется на .csv при выгрузке в CSV
+    EXPORT_LEADS = "reports/export_leads.parquet"
+    ANALYTICS_LEADS = "reports/analytics_leads.parquet"  # расширение меняется на .csv при выгрузке в CSV
+    ANALYTICS_OVERLAP = "reports/analytics_overlap.parquet"
+    HISTORY_LEADS = "reports/history_leads.parquet"  # расширение меняется на .csv при выгрузке в CSV
+
+    def __init__(self, reports_dir: str = REPORTS_DIR):
+        """
+        Пути к файлам отчетов внутри каталога reports_dir
+        :param reports_dir: Каталог для файлов отчетов
+        """
+        self.REPORTS_DIR = reports_dir
+        for name in self.file_names():
+            file_name = os.path.basename(getattr(FileParams, name))
+            setattr(self, name, os.path.join(reports_dir, file_name))
+
+    @staticmethod
+    def file_names() -> list:
+        """
+        Имена констант с путями к файлам
+        :return: Список имен констант
+        """
+        return [name for name, value in vars(FileParams).items() if name.isupper() and name != "REPORTS_DIR" and isinstance(value, str)]
+
+    def makedirs(self) -> "FileParams":
+        """
+        Создать каталог отчетов, если его нет
+        :return: Этот же объект
+        """
+        os.makedirs(self.REPORTS_DIR, exist_ok=True)
+        return self
+
 
+REPORTS_DIR = FileParams.REPORTS_DIR
 PHOTOS_LIKES_FILE = FileParams.PHOTOS_LIKES_FILE
 PHOTOS_COMMENTS_FILE = FileParams.PHOTOS_COMMENTS_FILE
 GROUPS_SEARCH_FILE = FileParams.GROUPS_SEARCH_FILE
@@ -23,3 +64,11 @@ WALL_LIKES_FILE = FileParams.WALL_LIKES_FILE
 WALL_POSTS = FileParams.WALL_POSTS
 REPORT_FILE = FileParams.REPORT_FILE
 REPORT_UNIC_USERS = FileParams.REPORT_UNIC_USERS
+PLAN_FILE = FileParams.PLAN_FILE
+REPORT_INTENTS = FileParams.REPORT_INTENTS
+REPORT_NEW_LEADS = FileParams.REPORT_NEW_LEADS
+EXPORT_INTERACTIONS = FileParams.EXPORT_INTERACTIONS
+EXPORT_LEADS = FileParams.EXPORT_LEADS
+ANALYTICS_LEADS = FileParams.ANALYTICS_LEADS
+ANALYTICS_OVERLAP = FileParams.ANALYTICS_OVERLAP
+HISTORY_LEADS = FileParams.HISTORY_LEADS
@@ -0,0 +1,81 @@
+import os
+from typing import Any, Dict, Iterator, Optional, Tuple
+from classes import serializer
+from classes.engagement_index import EngagementIndex
+from classes.negative_cache import SCOPE_ALL, NegativeCache
+
+
+GROUPS_KEY = "groups"
+
+
+def parse_shard(value: str) -> Optional[Tuple[int, int]]:
+    """
+    Разобрать шард из строки
+    :param value: Строка вида `i/n` (шард i из n, нумерация с 0) или пустая строка
+    :return: (i, n) или None, если шард не задан
+    """
+    if not value:
+        return None
+    index, count = (int(x) for x in value.split("/", 1))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Неверный шард {value}: ожидается i/n, где 0 <= i < n")
+    return index, count
+
+
+def group_id(group: Dict[str, Any]) -> Optional[int]:
+    """
+    Получить id группы из данных группы
+    :param group: Группа
+    :return: id группы или None, если его нет
+    """
+    for key in ("id", "gid", "group_id"):
+        if key in group:
+            return abs(int(group[key]))
+    return None
+
+
+class GroupReader:
+    """Класс потокового чтения групп из файла.
+    Описание:
+
+        - возвращает группы по одной из JSON или JSONL, отбрасывая повторы, кэш, чужой шард и низкий выход лидов.
+    """
+
+    def __init__(self, path: str, neg_cache: NegativeCache = None,
+                 scope: str = SCOPE_ALL, shard: Optional[Tuple[int, int]] = None, unique: bool = True,
+                 engagement: EngagementIndex = None, min_yield: float = 0):
+        self.path = serializer.resolve_path(path)
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Файл не найден: {path}")
+        self.neg_cache = neg_cache
+        self.scope = scope
+        self.shard = shard
+        self.unique = unique
+        self.engagement = engagement
+        self.min_yield = min_yield
+        self.meta: Dict[str, Any] = {}
+        self.read = 0  # групп прочитано из файла
+        self.skipped = 0  # групп отброшено фильтрами
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        seen = set()
+        for group in serializer.iter_array(self.path, GROUPS_KEY, self.meta):
+            self.read += 1
+            gid = group_id(group)
+            if gid is not None and (
+                    (self.unique and gid in seen)
+                    or (self.shard is not None and gid % self.shard[1] != self.shard[0])
+                    or (self.neg_cache is not None and self.neg_cache.blocked(gid, self.scope))
+                    or (self.engagement is not None and self.engagement.below(gid, self.min_yield))):
+                self.skipped += 1
+                continue
+            if gid is not None and self.unique:
+                seen.add(gid)
+            yield group
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Сводка для метаданных запуска
+        :return: Прочитано и отброшено групп
+        """
+        return {"read": self.read, "skipped": self.skipped}
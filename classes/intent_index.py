@@ -0,0 +1,179 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick не установлен — используем реализацию на Python
+    ahocorasick = None
+
+
+INTENTS_FILE = "intents.txt"  # файл фраз по умолчанию
+REGEX_PREFIX = "re:"
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """
+    Нормализовать текст для поиска фраз (и фразы, и комментарии)
+    :param text: Исходный текст
+    :return: Текст в нижнем регистре, «ё» заменена на «е», пробелы схлопнуты
+    """
+    return _SPACES.sub(" ", (text or "").lower().replace("ё", "е")).strip()
+
+
+class AhoCorasick:
+    """Класс автомата Ахо — Корасик.
+    Описание:
+
+        - находит все фразы (`add`) в тексте за один проход (`values`) после сборки (`build`).
+    """
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]  # переходы по символам для каждого узла
+        self.fail: List[int] = [0]  # суффиксные ссылки
+        self.out: List[Set[str]] = [set()]  # значения фраз, заканчивающихся в узле (с учетом суффиксов)
+        self._automaton = ahocorasick.Automaton() if ahocorasick is not None else None
+
+    def add(self, phrase: str, value: str) -> None:
+        """
+        Добавить фразу в автомат
+        :param phrase: Фраза (уже нормализованная)
+        :param value: Значение, возвращаемое при совпадении
+        """
+        if not phrase:
+            return
+        if self._automaton is not None:
+            values = self._automaton.get(phrase, frozenset())
+            self._automaton.add_word(phrase, values | {value})
+            return
+        node = 0
+        for ch in phrase:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(set())
+            node = nxt
+        self.out[node].add(value)
+
+    def build(self) -> "AhoCorasick":
+        """
+        Построить суффиксные ссылки и развернуть переходы: при поиске — один поиск в словаре на символ
+        :return: Этот же автомат
+        """
+        if self._automaton is not None:
+            self._automaton.make_automaton()
+            return self
+        queue = deque(self.goto[0].values())
+        order = []
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[child] = self.goto[f].get(ch, 0) if self.goto[f].get(ch, 0) != child else 0
+                self.out[child] |= self.out[self.fail[child]]
+        # узлы обходятся в порядке BFS: переходы суффиксной ссылки (она ближе к корню) уже развернуты
+        for node in order:
+            self.goto[node] = {**self.goto[self.fail[node]], **self.goto[node]}
+        return self
+
+    def values(self, text: str) -> Set[str]:
+        """
+        Найти значения всех фраз, встречающихся в тексте
+        :param text: Текст (уже нормализованный)
+        :return: Множество значений
+        """
+        found: Set[str] = set()
+        if self._automaton is not None:
+            if len(self._automaton):
+                for _, values in self._automaton.iter(text):
+                    found |= values
+            return found
+        goto, out = self.goto, self.out
+        node = 0
+        for ch in text:
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found |= out[node]
+        return found
+
+
+class IntentIndex:
+    """Класс индекса интентов.
+    Описание:
+
+        - компилируется один раз из файла фраз (`from_file`), `classify` размечает текст интентами.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[str, str]] = ()):
+        self.automaton = AhoCorasick()
+        self.regexes: List[Tuple[str, re.Pattern]] = []
+        self.intents: Set[str] = set()
+        for intent, phrase in phrases:
+            self.add(intent, phrase)
+        self.automaton.build()
+
+    def add(self, intent: str, phrase: str) -> None:
+        """
+        Добавить фразу интента (до сборки индекса)
+        :param intent: Название интента
+        :param phrase: Фраза или регулярное выражение с префиксом `re:`
+        """
+        self.intents.add(intent)
+        if phrase.startswith(REGEX_PREFIX):
+            self.regexes.append((intent, re.compile(phrase[len(REGEX_PREFIX):].strip(), re.IGNORECASE)))
+        else:
+            self.automaton.add(normalize(phrase), intent)
+
+    @classmethod
+    def from_file(cls, path: str = INTENTS_FILE) -> "IntentIndex":
+        """
+        Скомпилировать индекс из файла фраз
+        :param path: Путь к файлу фраз
+        :return: Индекс интентов
+        """
+        return cls(read_phrases(path))
+
+    def classify(self, text: str) -> List[str]:
+        """
+        Определить интенты текста
+        :param text: Текст комментария
+        :return: Отсортированный список интентов (пустой, если ничего не найдено)
+        """
+        if not text:
+            return []
+        normalized = normalize(text)
+        found = self.automaton.values(normalized)
+        for intent, regex in self.regexes:
+            if intent not in found and regex.search(normalized):
+                found.add(intent)
+        return sorted(found)
+
+
+def read_phrases(path: str) -> List[Tuple[str, str]]:
+    """
+    Прочитать файл фраз: строки `интент: фраза` или `re:интент: регулярное выражение`, `#` — комментарий
+    :param path: Путь к файлу
+    :return: Пары (интент, фраза); для регулярных выражений фраза начинается с `re:`
+    """
+    phrases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            prefix = ""
+            if line.startswith(REGEX_PREFIX):
+                prefix, line = REGEX_PREFIX, line[len(REGEX_PREFIX):]
+            intent, sep, phrase = line.partition(":")
+            if not sep or not phrase.strip():
+                raise ValueError(f"Строка файла {path} не в формате `интент: фраза`: {line}")
+            phrases.append((intent.strip(), prefix + phrase.strip()))
+    return phrases
@@ -0,0 +1,117 @@
+import os
+import re
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional, Set
+
+
+_LEAD_URL = re.compile(r"(?:^|/)(id|club|public)(\d+)/?$")
+_TYPECODE = "q"  # int64, в файле little-endian: 8 байт на лида
+
+
+def lead_id_from_url(url: str) -> Optional[int]:
+    """
+    Получить числовой id лида из ссылки или строки с числом
+    :param url: Ссылка вида https://vk.com/id123, https://vk.com/club123 или число
+    :return: id пользователя (положительный) или группы (отрицательный); None, если распознать не удалось
+    """
+    url = str(url).strip()
+    if re.fullmatch(r"-?\d+", url):
+        return int(url)
+    m = _LEAD_URL.search(url)
+    if not m:
+        return None
+    return int(m.group(2)) if m.group(1) == "id" else -int(m.group(2))
+
+
+def read_id_list(path: str) -> Set[int]:
+    """
+    Прочитать список лидов из текстового файла (по одному id или ссылке в строке, `#` — комментарий)
+    :param path: Путь к файлу
+    :return: Множество id (пустое, если файла нет)
+    """
+    ids: Set[int] = set()
+    if not path or not os.path.exists(path):
+        return ids
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            lead_id = lead_id_from_url(line) if line else None
+            if lead_id is not None:
+                ids.add(lead_id)
+    return ids
+
+
+class LeadSet:
+    """Класс компактного множества id лидов.
+    Описание:
+
+        - хранит id в отсортированном массиве int64 и в таком же двоичном файле (`load`/`save`).
+    """
+
+    def __init__(self, values: Iterable[int] = ()):
+        self._values = array(_TYPECODE, sorted(set(values)))
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __contains__(self, value: int) -> bool:
+        i = bisect_left(self._values, value)
+        return i < len(self._values) and self._values[i] == value
+
+    def update(self, values: Iterable[int]) -> int:
+        """
+        Добавить id в множество
+        :param values: Добавляемые id
+        :return: Количество действительно новых id
+        """
+        new = sorted(v for v in set(values) if v not in self)
+        if not new:
+            return 0
+        merged = array(_TYPECODE)
+        old, i, j = self._values, 0, 0
+        while i < len(old) and j < len(new):  # слияние двух отсортированных последовательностей
+            if old[i] < new[j]:
+                merged.append(old[i])
+                i += 1
+            else:
+                merged.append(new[j])
+                j += 1
+        merged.extend(old[i:])
+        merged.extend(new[j:])
+        self._values = merged
+        return len(new)
+
+    @classmethod
+    def load(cls, path: str) -> "LeadSet":
+        """
+        Прочитать множество из файла
+        :param path: Путь к файлу
+        :return: Множество (пустое, если файла нет)
+        """
+        lead_set = cls()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                lead_set._values.frombytes(f.read())
+            if sys.byteorder != "little":
+                lead_set._values.byteswap()
+        return lead_set
+
+    def save(self, path: str) -> None:
+        """
+        Атомарно сохранить множество в файл
+        :param path: Путь к файлу
+        """
+        values = array(_TYPECODE, self._values)
+        if sys.byteorder != "little":
+            values.byteswap()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{time.time_ns()}.tmp"  # одновременные сохранения не пишут в один файл
+        with open(tmp_path, "wb") as f:
+            values.tofile(f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+from vk_api.exceptions import ApiError
+from classes import serializer
+from classes.file_lock import file_lock
+from classes.vk_client import ERROR_ACCESS, ERROR_DEAD, error_kind
+
+
+NEGATIVE_CACHE_FILE_NAME = "negative_cache.json"  # общий для всех запусков в out_dir
+DEAD_TTL_DAYS = 30  # удаленные и заблокированные группы редко возвращаются
+ACCESS_TTL_DAYS = 7  # закрытую группу или стену могут открыть
+SCOPE_ALL = "*"  # запись действует для всех этапов
+SCOPE_WALL = "wall"
+SCOPE_PHOTOS = "photos"
+TTL_DAYS: Dict[str, int] = {ERROR_DEAD: DEAD_TTL_DAYS, ERROR_ACCESS: ACCESS_TTL_DAYS}
+
+
+def _key(group_id: int, scope: str) -> str:
+    return str(abs(int(group_id))) if scope == SCOPE_ALL else f"{abs(int(group_id))}:{scope}"
+
+
+class NegativeCache:
+    """Класс негативного кэша групп.
+    Описание:
+
+        - хранит группы, запросы к которым заведомо завершатся ошибкой (удалена, закрыт раздел), до истечения срока.
+    """
+
+    def __init__(self, path: str = "", entries: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = entries or {}
+        self.added = 0  # записей, добавленных за этот запуск
+        self.hits = 0  # запросов, сэкономленных за этот запуск
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def blocked(self, group_id: int, scope: str = SCOPE_ALL) -> bool:
+        """
+        Проверить, нужно ли пропустить группу
+        :param group_id: id группы (знак не важен)
+        :param scope: Раздел группы, к которому обращается этап
+        :return: True, если для группы есть действующая запись
+        """
+        now = time.time()
+        keys = (_key(group_id, SCOPE_ALL),) if scope == SCOPE_ALL else (_key(group_id, SCOPE_ALL), _key(group_id, scope))
+        for key in keys:
+            entry = self.entries.get(key)
+            if entry and entry["expires"] > now:
+                with self._lock:
+                    self.hits += 1
+                return True
+        return False
+
+    def add(self, group_id: int, error: Exception, scope: str = SCOPE_ALL) -> bool:
+        """
+        Записать группу по ошибке запроса
+        :param group_id: id группы (знак не важен)
+        :param error: Исключение запроса
+        :param scope: Раздел группы, при обращении к которому произошла ошибка
+        :return: True, если группа записана (ошибка означает удаленную группу или закрытый доступ)
+        """
+        kind = error_kind(error)
+        if kind not in TTL_DAYS:  # временные ошибки, ошибки и права токена не кэшируются: они не зависят от группы
+            return False
+        if kind == ERROR_DEAD:  # удаленная группа недоступна целиком
+            scope = SCOPE_ALL
+        now = int(time.time())
+        entry = {
+            "group_id": abs(int(group_id)),
+            "scope": scope,
+            "reason": kind,
+            "error_code": error.code if isinstance(error, ApiError) else None,
+            "error": str(error)[:200],
+            "added": now,
+            "expires": now + TTL_DAYS[kind] * 24 * 60 * 60,
+        }
+        with self._lock:
+            self.entries[_key(group_id, scope)] = entry
+            self.added += 1
+        return True
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Сводка для метаданных запуска
+        :return: Размер кэша, добавлено и сэкономлено запросов за запуск
+        """
+        return {"size": len(self.entries), "added": self.added, "hits": self.hits}
+
+    @classmethod
+    def load(cls, path: str) -> "NegativeCache":
+        """
+        Прочитать кэш из файла
+        :param path: Путь к файлу
+        :return: Кэш без просроченных записей (пустой, если файла нет)
+        """
+        entries = {}
+        if os.path.exists(serializer.resolve_path(path)):
+            now = time.time()
+            entries = {k: v for k, v in serializer.load(path).items() if v.get("expires", 0) > now}
+        return cls(path, entries)
+
+    def save(self, path: str = "") -> None:
+        """
+        Сохранить кэш в файл
+        :param path: Путь к файлу (по умолчанию — путь, из которого кэш загружен); записи в файле объединяются с текущими
+        """
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with file_lock(path), self._lock:  # кэш общий для запусков: записи других запусков не теряются
+            entries = NegativeCache.load(path).entries
+            for key, entry in self.entries.items():
+                if key not in entries or entries[key]["added"] <= entry["added"]:
+                    entries[key] = entry
+            self.entries = entries
+            serializer.dump(self.entries, path)
@@ -0,0 +1,117 @@
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from vk_api.exceptions import VkApiError
+from classes.vk_client import API_ERRORS
+from classes.vk_execute import EXECUTE_MAX_CALLS, execute_batch
+
+
+def call_method(vk, method: str, params: Dict[str, Any]) -> Any:
+    """
+    Вызвать метод VK API по имени
+    :param vk: VK API объект
+    :param method: Имя метода, например `likes.getList`
+    :param params: Параметры вызова
+    :return: Ответ метода
+    """
+    target = vk
+    for part in method.split("."):
+        target = getattr(target, part)
+    return target(**params)
+
+
+def _replay_page(vk, method: str, params: Dict[str, Any], stop: Optional[Callable[[Any], bool]],
+                 on_retry: Callable[[List[Any]], Any]) -> Callable[[], Any]:
+    """Функция повтора одной страницы для очереди повторов"""
+    def replay():
+        items = []
+        for item in call_method(vk, method, params).get("items", []):
+            if stop is not None and stop(item):
+                break
+            items.append(item)
+        on_retry(items)
+    return replay
+
+
+def calls_needed(count: int, page_size: int, pages_per_call: int = EXECUTE_MAX_CALLS) -> int:
+    """
+    Оценить количество запросов для выгрузки списка
+    :param count: Размер списка
+    :param page_size: Размер страницы
+    :param pages_per_call: Сколько страниц помещается в один execute
+    :return: Количество запросов: первая страница + пачки execute для остальных
+    """
+    pages = math.ceil(count / page_size) if count > 0 else 1
+    return 1 + math.ceil((pages - 1) / max(1, pages_per_call))
+
+
+def fetch_all(vk, method: str, params: Dict[str, Any], page_size: int,
+              stop: Optional[Callable[[Any], bool]] = None, max_items: int = 0,
+              pages_per_call: int = EXECUTE_MAX_CALLS,
+              retry=None, on_retry: Optional[Callable[[List[Any]], Any]] = None) -> Tuple[List[Any], int]:
+    """
+    Выгрузить список целиком: первая страница — обычным вызовом, остальные — пачками execute
+    :param vk: VK API объект
+    :param method: Имя метода, например `likes.getList`
+    :param params: Параметры вызова без `count` и `offset`
+    :param page_size: Размер страницы (максимальный `count` метода)
+    :param stop: Условие ранней остановки: выгрузка прекращается на первом элементе, для которого оно истинно
+        (сам элемент в результат не попадает)
+    :param max_items: Максимум элементов (0 — без ограничения)
+    :param pages_per_call: Сколько страниц упаковывать в один execute (1 — без execute)
+    :param retry: Очередь повторов (`classes.retry_queue.RetryQueue`): неудавшиеся страницы записываются в нее
+        с точным offset; без нее страница, не полученная внутри execute, запрашивается сразу, ошибка пробрасывается
+    :param on_retry: Куда передать элементы страницы, полученной при повторе
+    :return: Элементы в порядке offset и значение `count` из первого ответа
+    """
+    first = call_method(vk, method, {**params, "count": page_size, "offset": 0})
+    total = first.get("count", 0)
+    if max_items:
+        total = min(total, max_items)
+    result: List[Any] = []
+
+    def consume(items: List[Any]) -> bool:
+        """Добавить элементы страницы; True — выгрузку нужно прекратить"""
+        for item in items:
+            if stop is not None and stop(item):
+                return True
+            result.append(item)
+            if max_items and len(result) >= max_items:
+                return True
+        return False
+
+    if consume(first.get("items", [])) or len(first.get("items", [])) < page_size:
+        return result, first.get("count", 0)
+
+    offsets = list(range(page_size, total, page_size))
+    batches = [offsets[i:i + pages_per_call] for i in range(0, len(offsets), max(1, pages_per_call))]
+
+    def run_batch(batch: List[int]) -> List[Any]:
+        calls = [(method, {**params, "count": page_size, "offset": offset}) for offset in batch]
+        if len(calls) > 1:
+            try:
+                return execute_batch(vk, calls)
+            except VkApiError:  # execute недоступен для токена или пачка слишком велика — запрашиваем страницы по одной
+                pass
+        pages: List[Any] = []
+        for _, p in calls:
+            try:
+                pages.append(call_method(vk, method, p))
+            except API_ERRORS as e:
+                if retry is None or on_retry is None:
+                    raise
+                pages.append(e)  # страница уйдет в очередь повторов вместе с ошибкой
+        return pages
+
+    for batch in batches:
+        for offset, page in zip(batch, run_batch(batch)):
+            if not page or isinstance(page, API_ERRORS):
+                page_params = {**params, "count": page_size, "offset": offset}
+                if retry is None or on_retry is None:  # неполный список не возвращается: страница запрашивается еще раз
+                    page = call_method(vk, method, page_params)
+                else:
+                    error = page if isinstance(page, API_ERRORS) else None
+                    retry.add(method, page_params, error, _replay_page(vk, method, page_params, stop, on_retry))
+                    continue
+            if consume(page.get("items", [])):
+                return result, first.get("count", 0)
+    return result, first.get("count", 0)
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict
+from vk_api.exceptions import ApiError
+from classes import events
+from classes import vk_api_params as vk_p
+
+
+MAX_RPS = 20.0  # запросов в секунду: лимит ключа доступа сообщества
+RPS_STEP = 0.5  # на сколько увеличить темп после окна без перегрузки
+SLOW_START_FACTOR = 1.25  # до первой перегрузки темп растет не на шаг, а в это число раз
+DECREASE_FACTOR = 0.5  # во сколько раз снизить темп и число одновременных запросов при перегрузке
+WINDOW = 20  # успешных запросов в окне, после которого темп увеличивается
+LATENCY_SPIKE = 2.0  # всплеск: быстрая средняя задержки больше медленной во столько раз
+LATENCY_MIN_SPIKE = 0.2  # и больше нее хотя бы на столько секунд (шум коротких ответов не считается)
+LATENCY_FAST = 0.3  # вес нового замера в быстрой средней задержки
+LATENCY_SLOW = 0.05  # вес нового замера в медленной (опорной) средней задержки
+WARMUP = 10  # замеров до того, как всплески задержки начинают учитываться
+OVERLOAD_REASONS = {6: "flood", 9: "flood", 29: "rate_limit"}  # коды ошибок VK API, означающие перегрузку
+
+
+class RateController:
+    """Класс адаптивного регулятора темпа запросов.
+    Описание:
+
+        - AIMD: темп и число одновременных запросов растут после `WINDOW` успешных запросов (`on_success`)
+          и снижаются вдвое при перегрузке (`on_overload`), темп — от `1 / max_rps` до `min_delay`.
+    """
+
+    def __init__(self, min_delay: float = vk_p.API_SLEEP, max_rps: float = MAX_RPS, max_in_flight: int = 1):
+        self.min_rps = 1 / min_delay if min_delay > 0 else max_rps
+        self.max_rps = max(max_rps, self.min_rps)
+        self.max_in_flight = max(1, max_in_flight)
+        self.rps = self.min_rps
+        self.limit = 1
+        self.in_flight = 0
+        self.peak_rps = self.rps
+        self.latency_fast = 0.0
+        self.latency_slow = 0.0
+        self.samples = 0
+        self.increases = 0
+        self.slow_start = True
+        self.decreases: Counter = Counter()  # причина снижения -> сколько раз
+        self._window = 0
+        self._last_cut = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def delay(self) -> float:
+        return 1 / self.rps
+
+    def acquire(self) -> None:
+        """Дождаться, пока число одновременных запросов станет меньше `limit`"""
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        """Запрос завершен"""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self, latency: float, started: float) -> None:
+        """
+        Учесть успешный запрос
+        :param latency: Длительность запроса в секундах
+        :param started: Время начала запроса (`time.monotonic()`)
+        """
+        with self._cond:
+            self.samples += 1
+            if self.samples == 1:
+                self.latency_fast = self.latency_slow = latency
+            else:
+                self.latency_fast += LATENCY_FAST * (latency - self.latency_fast)
+                self.latency_slow += LATENCY_SLOW * (latency - self.latency_slow)
+            spike = (self.samples > WARMUP and self.latency_fast > self.latency_slow * LATENCY_SPIKE
+                     and self.latency_fast - self.latency_slow > LATENCY_MIN_SPIKE)
+            if spike:
+                self._decrease("latency", started)
+                return
+            self._window += 1
+            if self._window < WINDOW:
+                return
+            self._window = 0
+            if self.rps < self.max_rps or self.limit < self.max_in_flight:
+                self.rps = min(self.max_rps, self.rps * SLOW_START_FACTOR if self.slow_start else self.rps + RPS_STEP)
+                self.limit = min(self.max_in_flight, self.limit + 1)
+                self.peak_rps = max(self.peak_rps, self.rps)
+                self.increases += 1
+                self._cond.notify_all()
+
+    def on_overload(self, reason: str, started: float) -> None:
+        """
+        Учесть перегрузку
+        :param reason: Причина: flood, rate_limit или latency
+        :param started: Время начала запроса, получившего ошибку (`time.monotonic()`)
+        """
+        with self._cond:
+            self._decrease(reason, started)
+
+    def _decrease(self, reason: str, started: float) -> None:
+        self._window = 0
+        if started < self._last_cut:  # запрос ушел до предыдущего снижения — эта перегрузка уже учтена
+            return
+        self._last_cut = time.monotonic()
+        self.slow_start = False
+        self.rps = max(self.min_rps, self.rps * DECREASE_FACTOR)
+        self.limit = max(1, int(self.limit * DECREASE_FACTOR))
+        self.latency_fast = self.latency_slow  # всплеск учтен: новая средняя считается заново
+        self.decreases[reason] += 1
+        events.emit("rate_decrease", f"Темп запросов снижен ({reason}): {self.rps:.1f}/с, одновременно {self.limit}",
+                    events.DEBUG, reason=reason, rps=round(self.rps, 2), limit=self.limit)
+
+    def state(self) -> Dict[str, Any]:
+        """
+        Состояние регулятора для метаданных запуска
+        :return: Текущий и наибольший темп, границы, число одновременных запросов, задержки и счетчики изменений
+        """
+        with self._cond:
+            return {
+                "rps": round(self.rps, 2),
+                "delay_ms": round(1000 * self.delay),
+                "min_rps": round(self.min_rps, 2),
+                "max_rps": round(self.max_rps, 2),
+                "peak_rps": round(self.peak_rps, 2),
+                "in_flight_limit": self.limit,
+                "max_in_flight": self.max_in_flight,
+                "latency_ms": round(1000 * self.latency_fast),
+                "baseline_latency_ms": round(1000 * self.latency_slow),
+                "slow_start": self.slow_start,
+                "increases": self.increases,
+                "decreases": dict(self.decreases),
+            }
+
+
+def overload_reason(error: Exception) -> str:
+    """
+    Означает ли ошибка перегрузку
+    :param error: Исключение
+    :return: Причина (flood, rate_limit) или пустая строка
+    """
+    return OVERLOAD_REASONS.get(error.code, "") if isinstance(error, ApiError) else ""
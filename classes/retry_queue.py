@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from vk_api.exceptions import ApiError
+from classes import serializer, events
+from classes.vk_client import API_ERRORS, ERROR_TRANSIENT, RETRYABLE_KINDS, error_kind
+
+
+DEAD_LETTER_FILE_NAME = "dead_letter.json"  # в каталоге запуска
+RETRY_ATTEMPTS = 2  # сколько раз повторять запрос в конце этапа
+
+
+class RetryQueue:
+    """Класс очереди повторов.
+    Описание:
+
+        - копит неудавшиеся запросы с функцией повтора `replay` и повторяет их пачкой в конце этапа (`drain`);
+        - постоянные ошибки и запросы после `max_attempts` попыток попадают в dead letter.
+    """
+
+    def __init__(self, stage: str, max_attempts: int = RETRY_ATTEMPTS):
+        self.stage = stage
+        self.max_attempts = max_attempts
+        self.pending: List[Tuple[Dict[str, Any], Callable[[], Any]]] = []
+        self.dead: List[Dict[str, Any]] = []
+        self.added = 0  # запросов записано за этап
+        self.retried = 0  # повторов выполнено
+        self.recovered = 0  # повторов без ошибки
+        self._attempt = 0  # номер попытки повторяемого сейчас запроса
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def add(self, method: str, params: Dict[str, Any], error: Optional[Exception],
+            replay: Callable[[], Any]) -> bool:
+        """
+        Записать неудавшийся запрос
+        :param method: Имя метода, например `wall.getComments`
+        :param params: Параметры неудавшегося вызова (с `offset`, с которого нужно продолжить)
+        :param error: Исключение; None — вызов внутри execute вернул false
+        :param replay: Функция повтора
+        :return: True, если запрос будет повторен; False, если он записан в dead letter
+        """
+        kind = error_kind(error) if error is not None else ERROR_TRANSIENT
+        entry = {
+            "stage": self.stage,
+            "method": method,
+            "params": params,
+            "offset": params.get("offset", 0),
+            "kind": kind,
+            "error_code": error.code if isinstance(error, ApiError) else None,
+            "error": str(error)[:200] if error is not None else "execute: false",
+            "attempts": self._attempt,
+            "time": int(time.time()),
+        }
+        with self._lock:
+            self.added += 1
+            if kind not in RETRYABLE_KINDS or self._attempt >= self.max_attempts:
+                self.dead.append(entry)
+                return False
+            self.pending.append((entry, replay))
+        return True
+
+    def drain(self, budget=None) -> int:
+        """
+        Повторить накопленные запросы. Повторы, записанные во время повтора, выполняются следующей пачкой
+        :param budget: Бюджет запросов; при его исчерпании оставшиеся запросы попадают в dead letter
+        :return: Количество повторов, которые не записали в очередь новых ошибок
+        """
+        recovered = 0
+        while self.pending:
+            with self._lock:
+                batch, self.pending = self.pending, []
+            for entry, replay in batch:
+                if budget is not None and budget.exhausted():
+                    self.dead.append({**entry, "error": "бюджет запросов исчерпан"})
+                    continue
+                self._attempt = entry["attempts"] + 1
+                self.retried += 1
+                added = self.added
+                try:
+                    replay()
+                    if self.added == added:  # повтор мог сам записать свою ошибку в очередь и вернуться без исключения
+                        recovered += 1
+                except API_ERRORS as e:
+                    self.add(entry["method"], entry["params"], e, replay)
+                finally:
+                    self._attempt = 0
+        self.recovered += recovered
+        return recovered
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Сводка для метаданных запуска
+        :return: Записано, повторено, восстановлено запросов и размер dead letter
+        """
+        return {"added": self.added, "retried": self.retried, "recovered": self.recovered, "dead": len(self.dead)}
+
+    def save(self, path: str) -> None:
+        """
+        Дописать dead letter в файл (записи предыдущих этапов запуска сохраняются)
+        :param path: Путь к файлу
+        """
+        if not self.dead:
+            return
+        entries = serializer.load(path) if os.path.exists(serializer.resolve_path(path)) else []
+        path = serializer.dump(entries + self.dead, path)
+        events.warning(f"{self.stage}: не удалось выполнить запросов {len(self.dead)}, они записаны в {path}",
+                       event="dead_letter", stage=self.stage, dead=len(self.dead), path=path)
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any
+from classes import file_params as f_p, serializer
+
+
+RUN_METADATA_FILE_NAME = "run.json"  # метаданные запуска в каталоге отчетов
+
+
+def new_run_id() -> str:
+    """
+    Сгенерировать идентификатор запуска
+    :return: Строка вида 20250110_153000_12345 (дата, время, pid процесса)
+    """
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+
+
+class RunContext:
+    """Класс контекста запуска.
+    Описание:
+
+        - каталог (`out_dir`, с `run_id` — `out_dir/run_id`), пути файлов (`files`) и метаданные запуска (`run.json`).
+    """
+
+    def __init__(self, out_dir: str = f_p.REPORTS_DIR, run_id: str = ""):
+        self.base_dir = out_dir
+        self.run_id = run_id
+        self.out_dir = os.path.join(out_dir, run_id) if run_id else out_dir
+        self.files = f_p.FileParams(self.out_dir)
+        self.metadata_file = os.path.join(self.out_dir, RUN_METADATA_FILE_NAME)
+        self.metadata = {"run_id": run_id, "out_dir": self.out_dir, "stages": {}}
+        self._lock = threading.Lock()
+
+    def path(self, file_name: str) -> str:
+        """
+        Путь к произвольному файлу в каталоге запуска
+        :param file_name: Имя файла
+        :return: Путь
+        """
+        return os.path.join(self.out_dir, file_name)
+
+    def shared_path(self, file_name: str) -> str:
+        """
+        Путь к файлу, общему для всех запусков в out_dir (например, множество уже виденных лидов)
+        :param file_name: Имя файла
+        :return: Путь
+        """
+        return os.path.join(self.base_dir, file_name)
+
+    def makedirs(self) -> "RunContext":
+        """
+        Создать каталог запуска, если его нет
+        :return: Этот же контекст
+        """
+        os.makedirs(self.out_dir, exist_ok=True)
+        return self
+
+    def record(self, key: str, value: Any) -> None:
+        """
+        Записать значение в метаданные запуска и сохранить их
+        :param key: Ключ
+        :param value: Значение (сериализуемое в JSON)
+        """
+        with self._lock:
+            self.metadata[key] = value
+            self.save()
+
+    def record_stage(self, stage: str, **values: Any) -> None:
+        """
+        Записать сведения об этапе (время окончания и произвольные значения)
+        :param stage: Название этапа
+        :param values: Значения для записи
+        """
+        with self._lock:
+            self.metadata["stages"].setdefault(stage, {}).update(values, finished=int(time.time()))
+            self.save()
+
+    def save(self) -> None:
+        """
+        Сохранить метаданные запуска в каталог запуска
+        """
+        self.makedirs()
+        serializer.dump(self.metadata, self.metadata_file)
+
+
+DEFAULT_CONTEXT = RunContext()  # контекст по умолчанию: каталог reports/ без идентификатора запуска
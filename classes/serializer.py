@@ -0,0 +1,283 @@
+import gzip
+import io
+import json
+import os
+import time
+from typing import Any, Dict, IO, Iterator
+
+try:
+    import orjson
+except ImportError:  # бэкенд не установлен — попробуем следующий
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+GZIP_EXT = ".gz"
+ZSTD_EXT = ".zst"
+COMPRESSION_EXTS = (ZSTD_EXT, GZIP_EXT)
+ZSTD_LEVEL = 3  # уровень сжатия zstd: быстрый и достаточно компактный
+GZIP_LEVEL = 6
+JSONL_EXT = ".jsonl"
+READ_SIZE = 1 << 16  # символов за одно чтение при потоковом разборе
+_WHITESPACE = " \t\r\n"
+_DECODER = json.JSONDecoder()
+
+if orjson is not None:
+    BACKEND = "orjson"
+elif msgspec is not None:
+    BACKEND = "msgspec"
+else:
+    BACKEND = "json"
+
+_default_compression: str = ""  # расширение сжатия для новых JSON файлов, например ".zst"
+
+
+def set_default_compression(ext: str) -> None:
+    """
+    Задать сжатие по умолчанию для всех записываемых JSON файлов
+    :param ext: Расширение сжатия: "", "gz", ".gz", "zst" или ".zst"
+    """
+    global _default_compression
+    ext = ext or ""
+    if ext and not ext.startswith("."):
+        ext = "." + ext
+    if ext and ext not in COMPRESSION_EXTS:
+        raise ValueError(f"Неизвестный формат сжатия: {ext}")
+    if ext == ZSTD_EXT and zstandard is None:
+        raise ValueError("Для сжатия zstd установите пакет `zstandard`")
+    _default_compression = ext
+
+
+def compressed_path(path: str) -> str:
+    """
+    Получить путь с учетом сжатия по умолчанию
+    :param path: Исходный путь к файлу
+    :return: Путь с расширением сжатия, если оно задано и еще не указано
+    """
+    if _default_compression and not path.endswith(COMPRESSION_EXTS):
+        return path + _default_compression
+    return path
+
+
+def resolve_path(path: str) -> str:
+    """
+    Найти существующий файл: сам путь или его сжатый вариант (самый свежий из найденных)
+    :param path: Путь к файлу без учета сжатия
+    :return: Путь к существующему файлу (или исходный путь, если ничего не найдено)
+    """
+    if path.endswith(COMPRESSION_EXTS):
+        return path
+    candidates = [p for p in [path] + [path + ext for ext in COMPRESSION_EXTS] if os.path.exists(p)]
+    if not candidates:
+        return path
+    return max(candidates, key=os.path.getmtime)
+
+
+def open_file(path: str, mode: str = "rb") -> IO:
+    """
+    Открыть файл с прозрачным сжатием по расширению
+    :param path: Путь к файлу
+    :param mode: Режим открытия: "rb", "wb", "ab", "r", "w" или "a"
+    :return: Файловый объект
+    """
+    binary_mode = mode if "b" in mode else mode + "b"
+    if path.endswith(ZSTD_EXT):
+        if zstandard is None:
+            raise RuntimeError(f"Для работы с {path} установите пакет `zstandard`")
+        if binary_mode.startswith("r"):
+            raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        else:
+            raw = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, binary_mode), closefd=True)
+    elif path.endswith(GZIP_EXT):
+        raw = gzip.open(path, binary_mode, compresslevel=GZIP_LEVEL)
+    else:
+        raw = open(path, binary_mode)
+    if "b" in mode:
+        return raw
+    return io.TextIOWrapper(raw, encoding="utf-8")
+
+
+def dumps(obj: Any, indent: bool = True) -> bytes:
+    """
+    Сериализовать объект в JSON (UTF-8, без экранирования кириллицы)
+    :param obj: Сериализуемый объект
+    :param indent: Форматировать с отступами (как `indent=2`)
+    :return: JSON в байтах
+    """
+    # pylint: disable=no-member  # атрибуты C-расширения orjson pylint не видит
+    if BACKEND == "orjson":
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if BACKEND == "msgspec":
+        data = msgspec.json.encode(obj)
+        return msgspec.json.format(data, indent=2) if indent else data
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    """
+    Десериализовать JSON
+    :param data: JSON в байтах или строке
+    :return: Объект
+    """
+    # pylint: disable=no-member
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    if BACKEND == "msgspec":
+        return msgspec.json.decode(data)
+    return json.loads(data)
+
+
+def dump(obj: Any, path: str, indent: bool = True) -> str:
+    """
+    Сохранить объект в JSON файл
+    :param obj: Сохраняемый объект
+    :param path: Путь к файлу (сжатие определяется по расширению или по умолчанию)
+    :param indent: Форматировать с отступами
+    :return: Фактический путь к записанному файлу
+    """
+    path = compressed_path(path)
+    # сжатые файлы никто не читает глазами — отступы там только занимают место
+    data = dumps(obj, indent=indent and not path.endswith(COMPRESSION_EXTS))
+    # файл заменяется целиком: параллельный запуск не прочитает недописанный JSON
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.getpid()}_{time.time_ns()}_{os.path.basename(path)}")
+    with open_file(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load(path: str) -> Any:
+    """
+    Прочитать JSON файл (в том числе сжатый)
+    :param path: Путь к файлу
+    :return: Содержимое файла
+    """
+    with open_file(resolve_path(path), "rb") as f:
+        return loads(f.read())
+
+
+class _JsonStream:
+    """Последовательное чтение значений JSON из текстового потока с буфером ограниченного размера."""
+
+    def __init__(self, f: IO):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(READ_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Следующий значащий символ (пустая строка — конец файла)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Ожидался символ {char!r} в позиции {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Прочитать очередное значение JSON"""
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():  # значение не поместилось в буфер — дочитываем
+                    raise
+                continue
+            # число в конце буфера может быть обрезано — дочитываем и разбираем снова
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+    def array(self) -> Iterator[Any]:
+        """Элементы массива по одному"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Ожидался символ ',' или ']' в позиции {self.pos - 1}")
+
+
+def is_jsonl(path: str) -> bool:
+    """
+    Является ли файл JSONL (одно значение в строке), с учетом расширения сжатия
+    :param path: Путь к файлу
+    :return: True для `.jsonl`, `.jsonl.gz`, `.jsonl.zst`
+    """
+    for ext in COMPRESSION_EXTS:
+        if path.endswith(ext):
+            path = path[:-len(ext)]
+    return path.endswith(JSONL_EXT)
+
+
+def iter_array(path: str, key: str = "", meta: Dict[str, Any] = None) -> Iterator[Any]:
+    """
+    Читать элементы массива из файла по одному
+    :param path: Путь к JSON или JSONL файлу (в том числе сжатому)
+    :param key: Поле объекта верхнего уровня с массивом; если в файле массив верхнего уровня — не используется
+    :param meta: Словарь, куда записываются остальные поля объекта верхнего уровня
+    :return: Элементы массива (для JSONL — значения строк)
+    """
+    path = resolve_path(path)
+    meta = {} if meta is None else meta
+    with open_file(path, "r") as f:
+        if is_jsonl(path):
+            for line in f:
+                if line.strip():
+                    yield loads(line)
+            return
+        stream = _JsonStream(f)
+        if stream.peek() == "[":
+            yield from stream.array()
+            return
+        stream.expect("{")
+        found = False
+        while stream.peek() != "}":
+            name = stream.value()
+            stream.expect(":")
+            if key and name == key and stream.peek() == "[":
+                found = True
+                yield from stream.array()
+            else:
+                meta[name] = stream.value()
+            if stream.peek() == ",":
+                stream.pos += 1
+        if not found:
+            raise ValueError(f"Файл {path} не содержит список в поле `{key}`")
@@ -0,0 +1,206 @@
+import contextlib
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict
+import requests
+import vk_api
+from requests.adapters import HTTPAdapter
+from vk_api.exceptions import ApiError, ApiHttpError, VkApiError
+from classes import vk_api_params as vk_p
+from classes.api_budget import ApiBudget
+from classes.rate_controller import MAX_RPS, RateController, overload_reason
+
+
+POOL_SIZE = 8  # соединений в пуле keep-alive
+MAX_RETRIES = 3  # повторов временной ошибки
+BACKOFF_BASE = 1.0  # базовая пауза перед повтором в секундах, растет экспоненциально
+BACKOFF_MAX = 30.0
+FLOOD_BACKOFF_FACTOR = 4  # флуд-контроль снимается дольше — паузы перед повтором длиннее
+
+# Таксономия ошибок VK API: https://dev.vk.com/ru/reference/errors
+ERROR_TRANSIENT = "transient"  # временная ошибка — можно повторить
+ERROR_FLOOD = "flood"  # флуд-контроль — повторять после паузы
+ERROR_RATE_LIMIT = "rate_limit"  # исчерпан суточный лимит метода — повторять бессмысленно
+ERROR_AUTH = "auth"  # токен недействителен — продолжать бессмысленно
+ERROR_PERMISSION = "permission"  # токену не хватает прав на метод — не зависит от группы
+ERROR_ACCESS = "access"  # нет доступа к объекту (закрытая группа, отключенная стена)
+ERROR_DEAD = "dead"  # объект удален или заблокирован
+ERROR_NETWORK = "network"  # сетевая ошибка или ошибка HTTP
+ERROR_OTHER = "other"
+
+ERROR_KINDS: Dict[int, str] = {
+    1: ERROR_TRANSIENT,  # неизвестная ошибка
+    6: ERROR_FLOOD,  # слишком много запросов в секунду
+    9: ERROR_FLOOD,  # слишком много однотипных действий
+    10: ERROR_TRANSIENT,  # внутренняя ошибка сервера
+    29: ERROR_RATE_LIMIT,  # достигнут количественный лимит на вызов метода
+    5: ERROR_AUTH,  # авторизация не удалась
+    17: ERROR_AUTH,  # требуется валидация пользователя
+    7: ERROR_PERMISSION,  # нет прав для выполнения действия
+    15: ERROR_PERMISSION,  # доступ запрещен
+    30: ERROR_ACCESS,  # профиль приватный
+    200: ERROR_ACCESS,  # доступ к альбому запрещен
+    203: ERROR_ACCESS,  # доступ к группе запрещен
+    18: ERROR_DEAD,  # страница удалена или заблокирована
+    100: ERROR_OTHER,  # неверный параметр
+    113: ERROR_DEAD,  # неверный идентификатор пользователя
+    125: ERROR_DEAD,  # неверный идентификатор группы
+}
+RETRYABLE_KINDS = (ERROR_TRANSIENT, ERROR_NETWORK, ERROR_FLOOD)
+# Ошибки вызова, которые этапы перехватывают и отправляют в очередь повторов: ошибки VK API
+# и сетевые ошибки requests, которые клиент пробрасывает после исчерпания повторов
+API_ERRORS = (VkApiError, requests.RequestException)
+
+
+def error_kind(error: Exception) -> str:
+    """
+    Определить вид ошибки VK API
+    :param error: Исключение
+    :return: Одна из констант ERROR_*
+    """
+    if isinstance(error, ApiError):
+        return ERROR_KINDS.get(error.code, ERROR_OTHER)
+    if isinstance(error, (ApiHttpError, requests.RequestException)):
+        return ERROR_NETWORK
+    return ERROR_OTHER
+
+
+def backoff_delay(attempt: int, kind: str = ERROR_TRANSIENT) -> float:
+    """
+    Пауза перед повтором: экспоненциальная с полным джиттером
+    :param attempt: Номер повтора, начиная с 0
+    :param kind: Вид ошибки (для флуд-контроля пауза длиннее)
+    :return: Пауза в секундах
+    """
+    base = BACKOFF_BASE * (FLOOD_BACKOFF_FACTOR if kind == ERROR_FLOOD else 1)
+    return random.uniform(0, min(BACKOFF_MAX, base * 2 ** attempt))
+
+
+class VkClient(vk_api.VkApi):
+    """Класс общего клиента VK API.
+    Описание:
+
+        - создается один раз и передается всем этапам: пул keep-alive соединений, общий темп запросов;
+        - повторяет временные ошибки и флуд-контроль с паузой, учитывает вызовы в бюджете `budget`.
+    """
+
+    def __init__(self, token: str, budget: ApiBudget = None, pool_size: int = POOL_SIZE, use_gzip: bool = True,
+                 max_retries: int = MAX_RETRIES, rps_delay: float = vk_p.API_SLEEP, adaptive: bool = True,
+                 max_rps: float = MAX_RPS):
+        super().__init__(token=token, api_version=vk_p.API_VERSION)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.http.mount("https://", adapter)
+        self.http.headers["Connection"] = "keep-alive"
+        if use_gzip:
+            self.http.headers["Accept-Encoding"] = "gzip, deflate"
+        # VkApi держит блокировку на все время HTTP запроса; темп запросов выдерживает сам клиент,
+        # поэтому блокировка родителя отключается, а его пауза обнуляется
+        self.lock = contextlib.nullcontext()
+        self.RPS_DELAY = 0
+        # встроенный обработчик ошибки 6 ждет полсекунды и повторяет запрос в обход регулятора и повторов;
+        # флуд-контроль должен снижать темп и повторяться с паузой, как остальные перегрузки
+        self.error_handlers.pop(6, None)
+        self.rps_delay = rps_delay
+        self.max_retries = max_retries
+        self.budget = budget or ApiBudget()
+        self.controller = RateController(rps_delay, max_rps, pool_size) if adaptive else None
+        self.budget.seconds_per_call = self.delay  # остаток времени бюджета считается по текущему темпу
+        self._pace_lock = threading.Lock()
+        self._next_slot = 0.0
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, Any] = {"requests": 0, "retries": 0, "latency_sum": 0.0, "errors": Counter()}
+
+    def delay(self) -> float:
+        """
+        Текущая пауза между запросами
+        :return: Пауза регулятора (или `rps_delay`) в секундах
+        """
+        return self.controller.delay if self.controller is not None else self.rps_delay
+
+    def _pace(self) -> None:
+        """
+        Дождаться своей очереди: запросы выходят не чаще одного за текущую паузу регулятора (или `rps_delay`)
+        """
+        delay = self.delay()
+        with self._pace_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + delay
+        if slot > now:
+            time.sleep(slot - now)
+
+    def method(self, method, values=None, **kwargs):
+        attempt = 0
+        while True:
+            if self.controller is not None:
+                self.controller.acquire()
+            try:
+                self._pace()
+                self.budget.spend(method)
+                started = time.monotonic()
+                response, error = super().method(method, values, **kwargs), None
+            except (ApiError, ApiHttpError, requests.RequestException) as e:
+                response, error = None, e
+            finally:
+                if self.controller is not None:  # пауза перед повтором не занимает место одновременного запроса
+                    self.controller.release()
+            latency = time.monotonic() - started
+            if error is None:
+                self._record(latency)
+                if self.controller is not None:
+                    self.controller.on_success(latency, started)
+                return response
+            kind = error_kind(error)
+            self._record(latency, kind)
+            reason = overload_reason(error)
+            if reason and self.controller is not None:
+                self.controller.on_overload(reason, started)
+            if kind not in RETRYABLE_KINDS or attempt >= self.max_retries:
+                raise error
+            time.sleep(backoff_delay(attempt, kind))
+            attempt += 1
+            with self._stats_lock:
+                self.stats["retries"] += 1
+
+    def _record(self, latency: float, error: str = "") -> None:
+        """
+        Учесть запрос в статистике
+        :param latency: Длительность запроса в секундах
+        :param error: Вид ошибки (пусто, если запрос успешен)
+        """
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats["latency_sum"] += latency
+            if error:
+                self.stats["errors"][error] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Статистика клиента для метаданных запуска
+        :return: Словарь со статистикой
+        """
+        with self._stats_lock:
+            requests_count = self.stats["requests"]
+            return {
+                "requests": requests_count,
+                "retries": self.stats["retries"],
+                "avg_latency_ms": round(1000 * self.stats["latency_sum"] / requests_count) if requests_count else 0,
+                "errors": dict(self.stats["errors"]),
+                "budget": self.budget.summary(),
+                "rate_control": self.controller.state() if self.controller is not None else {"delay_ms": round(1000 * self.rps_delay)},
+            }
+
+
+def create_client(token: str, budget: ApiBudget = None, **kwargs) -> VkClient:
+    """
+    Создать общий клиент VK API
+    :param token: VK access token
+    :param budget: Бюджет запросов
+    :param kwargs: Параметры VkClient (pool_size, use_gzip, max_retries, rps_delay, adaptive, max_rps)
+    :return: Клиент
+    """
+    if not token:
+        raise SystemExit("Требуется VK token через --token или переменную окружения VK_TOKEN")
+    return VkClient(token, budget=budget, **kwargs)
@@ -0,0 +1,34 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+
+EXECUTE_MAX_CALLS = 25  # максимум обращений к API внутри одного execute
+
+
+def build_code(calls: List[Tuple[str, Dict[str, Any]]]) -> str:
+    """
+    Сформировать код VKScript, возвращающий массив результатов вызовов
+    :param calls: Вызовы: (имя метода, параметры), например ("wall.getComments", {"owner_id": -1, "post_id": 2})
+    :return: Код для параметра `code` метода execute
+    """
+    parts = [f"API.{method}({json.dumps(params, ensure_ascii=False)})" for method, params in calls]
+    return f"return [{', '.join(parts)}];"
+
+
+def execute_batch(vk, calls: List[Tuple[str, Dict[str, Any]]], batch_size: int = EXECUTE_MAX_CALLS) -> List[Any]:
+    """
+    Выполнить вызовы пачками через execute
+    :param vk: VK API объект
+    :param calls: Вызовы: (имя метода, параметры)
+    :param batch_size: Сколько вызовов помещать в один execute (не больше 25)
+    :return: Результаты в порядке вызовов; для неудавшихся вызовов — False
+    """
+    batch_size = max(1, min(batch_size, EXECUTE_MAX_CALLS))
+    results: List[Any] = []
+    for start in range(0, len(calls), batch_size):
+        chunk = calls[start:start + batch_size]
+        response = vk.execute(code=build_code(chunk))
+        if not isinstance(response, list):  # execute вернул не массив — считаем всю пачку неудавшейся
+            response = [False] * len(chunk)
+        results.extend(response + [False] * (len(chunk) - len(response)))
+    return results
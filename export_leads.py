@@ -0,0 +1,268 @@
+"""
+export_leads.py
+
+Модуль выгрузки лидов в табличные форматы для аналитики.
+
+Содержит:
+- Потоковое чтение выгрузок сборщиков в строки взаимодействий и агрегаты по лидам.
+- Запись пачками в Parquet (если установлен `pyarrow`) или в CSV.
+
+Автор: sergiomarotco, https://github.com/sergiomarotco/vk_lead_searcher
+Дата: 2026-10-19
+"""
+import argparse
+import csv
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import classes.bcolors as b
+from classes import serializer, events
+from classes.run_context import RunContext, DEFAULT_CONTEXT
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # без pyarrow выгрузка пишется в CSV
+    pa = None
+    pq = None
+
+
+BATCH_ROWS = 100_000  # строк в одной пачке записи
+FORMAT_AUTO = "auto"
+FORMAT_PARQUET = "parquet"
+FORMAT_CSV = "csv"
+FORMATS = [FORMAT_AUTO, FORMAT_PARQUET, FORMAT_CSV]
+
+TYPE_PHOTO_LIKE = "photo_like"
+TYPE_PHOTO_COMMENT = "photo_comment"
+TYPE_WALL_LIKE = "wall_like"
+TYPE_WALL_COMMENT = "wall_comment"
+TYPE_WALL_REPLY = "wall_reply"
+
+INTERACTION_COLUMNS = ["lead_id", "lead_url", "type", "group_id", "item_url", "timestamp", "text"]
+LEAD_COLUMNS = ["lead_id", "lead_url", "interactions", "likes", "comments", "groups", "first_ts", "last_ts"]
+_OWNER_IN_URL = re.compile(r"(?:wall|photo)(-?\d+)_\d+")
+
+INTERACTION_SCHEMA = LEAD_SCHEMA = None
+if pa is not None:
+    INTERACTION_SCHEMA = pa.schema([
+        ("lead_id", pa.int64()), ("lead_url", pa.string()), ("type", pa.string()), ("group_id", pa.int64()),
+        ("item_url", pa.string()), ("timestamp", pa.int64()), ("text", pa.string()),
+    ])
+    LEAD_SCHEMA = pa.schema([
+        ("lead_id", pa.int64()), ("lead_url", pa.string()), ("interactions", pa.int64()), ("likes", pa.int64()),
+        ("comments", pa.int64()), ("groups", pa.int64()), ("first_ts", pa.int64()), ("last_ts", pa.int64()),
+    ])
+
+
+def group_id_from_url(url: str) -> Optional[int]:
+    """
+    Получить id группы из ссылки на пост или фото
+    :param url: Ссылка вида https://vk.com/wall-123_45 или https://vk.com/photo-123_45
+    :return: id группы (положительный); None, если владелец — пользователь или ссылка не распознана
+    """
+    m = _OWNER_IN_URL.search(url or "")
+    if not m or int(m.group(1)) >= 0:
+        return None
+    return -int(m.group(1))
+
+
+def to_timestamp(value: Any) -> Optional[int]:
+    """
+    Привести время к unix timestamp
+    :param value: unix timestamp или строка ISO (так даты комментариев к фото сохраняет сборщик)
+    :return: unix timestamp или None
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def _iter_file(path: str) -> Iterator[Dict[str, Any]]:
+    if not os.path.exists(serializer.resolve_path(path)):
+        return iter(())
+    return serializer.iter_array(path)
+
+
+def iter_interactions(ctx: RunContext) -> Iterator[Dict[str, Any]]:
+    """
+    Прочитать взаимодействия лидов из выгрузок сборщиков
+    :param ctx: Контекст запуска (пути файлов выгрузок)
+    :return: Строки взаимодействий с полями `INTERACTION_COLUMNS`
+    """
+    files = ctx.files
+    for photo in _iter_file(files.PHOTOS_LIKES_FILE):
+        group_id = group_id_from_url(photo["photo_url"])
+        for like in photo["likes"]:
+            yield {"lead_id": like["user_id"], "lead_url": like["user_link"], "type": TYPE_PHOTO_LIKE,
+                   "group_id": group_id, "item_url": photo["photo_url"], "timestamp": None, "text": None}
+    for photo in _iter_file(files.PHOTOS_COMMENTS_FILE):
+        group_id = group_id_from_url(photo["photo_url"])
+        for c in photo["comments"]:
+            yield {"lead_id": c["author_id"], "lead_url": c["author_link"], "type": TYPE_PHOTO_COMMENT,
+                   "group_id": group_id, "item_url": photo["photo_url"], "timestamp": to_timestamp(c.get("date")),
+                   "text": c.get("text")}
+    for like in _iter_file(files.WALL_LIKES_FILE):
+        yield {"lead_id": like["liker_id"], "lead_url": like["liker_url"], "type": TYPE_WALL_LIKE,
+               "group_id": -like["owner_id"] if like["owner_id"] < 0 else None, "item_url": like["post_url"],
+               "timestamp": None, "text": None}
+    for c in _iter_file(files.WALL_COMMENTS_FILE):
+        yield {"lead_id": c["author_id"], "lead_url": c["author_url"],
+               "type": TYPE_WALL_REPLY if c.get("parent_comment_id") else TYPE_WALL_COMMENT,
+               "group_id": -c["owner_id"] if c["owner_id"] < 0 else None, "item_url": c["post_url"],
+               "timestamp": to_timestamp(c.get("date")), "text": c.get("text")}
+
+
+def batches(rows: Iterable[Dict[str, Any]], size: int = BATCH_ROWS) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Разбить строки на пачки
+    :param rows: Строки
+    :param size: Размер пачки
+    :return: Пачки строк
+    """
+    batch: List[Dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class LeadAggregator:
+    """Класс агрегатов по лидам: число взаимодействий, лайков, комментариев, групп и время первого и последнего."""
+
+    def __init__(self):
+        self.leads: Dict[int, Dict[str, Any]] = {}
+        self.groups: Dict[int, set] = {}
+
+    def add(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Учесть взаимодействие
+        :param row: Строка взаимодействия
+        :return: Эта же строка (для использования в потоке)
+        """
+        lead = self.leads.get(row["lead_id"])
+        if lead is None:
+            lead = self.leads[row["lead_id"]] = {"lead_id": row["lead_id"], "lead_url": row["lead_url"], "interactions": 0,
+                                                 "likes": 0, "comments": 0, "groups": 0, "first_ts": None, "last_ts": None}
+            self.groups[row["lead_id"]] = set()
+        lead["interactions"] += 1
+        lead["likes" if row["type"].endswith("like") else "comments"] += 1
+        if row["group_id"] is not None:
+            self.groups[row["lead_id"]].add(row["group_id"])
+        ts = row["timestamp"]
+        if ts is not None:
+            lead["first_ts"] = ts if lead["first_ts"] is None else min(lead["first_ts"], ts)
+            lead["last_ts"] = ts if lead["last_ts"] is None else max(lead["last_ts"], ts)
+        return row
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """
+        Агрегаты по лидам, самые активные — первыми
+        :return: Строки с полями `LEAD_COLUMNS`
+        """
+        for lead in sorted(self.leads.values(), key=lambda x: (-x["interactions"], x["lead_id"])):
+            yield {**lead, "groups": len(self.groups[lead["lead_id"]])}
+
+    def records(self) -> List[Dict[str, Any]]:
+        """
+        Агрегаты для сохранения между запусками (вместо числа групп — их id)
+        :return: Список агрегатов
+        """
+        return [{**lead, "groups": sorted(self.groups[lead_id])} for lead_id, lead in self.leads.items()]
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "LeadAggregator":
+        """
+        Восстановить агрегаты, сохраненные `records()`
+        :param records: Список агрегатов
+        :return: Агрегатор
+        """
+        aggregator = cls()
+        for record in records:
+            aggregator.leads[record["lead_id"]] = {**record, "groups": 0}
+            aggregator.groups[record["lead_id"]] = set(record["groups"])
+        return aggregator
+
+
+def resolve_format(export_format: str) -> str:
+    """
+    Выбрать формат выгрузки
+    :param export_format: auto, parquet или csv
+    :return: parquet или csv
+    """
+    if export_format == FORMAT_AUTO:
+        return FORMAT_PARQUET if pa is not None else FORMAT_CSV
+    if export_format == FORMAT_PARQUET and pa is None:
+        raise SystemExit("Для выгрузки в Parquet установите пакет `pyarrow` или используйте --export_format csv")
+    return export_format
+
+
+def write_table(rows: Iterable[Dict[str, Any]], path: str, columns: List[str], export_format: str,
+                schema=None, batch_rows: int = BATCH_ROWS) -> int:
+    """
+    Записать строки в файл пачками
+    :param rows: Строки
+    :param path: Путь к файлу
+    :param columns: Колонки
+    :param export_format: parquet или csv
+    :param schema: Схема Arrow (для Parquet)
+    :param batch_rows: Строк в одной пачке
+    :return: Количество записанных строк
+    """
+    written = 0
+    if export_format == FORMAT_PARQUET:
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            for batch in batches(rows, batch_rows):
+                writer.write_batch(pa.RecordBatch.from_pydict({c: [r[c] for r in batch] for c in columns}, schema=schema))
+                written += len(batch)
+        return written
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for batch in batches(rows, batch_rows):
+            writer.writerows(batch)
+            written += len(batch)
+    return written
+
+
+def main_export(ctx: RunContext = DEFAULT_CONTEXT, export_format: str = FORMAT_AUTO,
+                batch_rows: int = BATCH_ROWS) -> Dict[str, Any]:
+    """
+    Выгрузить взаимодействия и агрегаты по лидам в Parquet или CSV
+    :param ctx: Контекст запуска (каталог и пути файлов)
+    :param export_format: auto (Parquet, если установлен pyarrow, иначе CSV), parquet или csv
+    :param batch_rows: Строк в одной пачке записи
+    :return: Пути к файлам и количество строк
+    """
+    files = ctx.makedirs().files
+    export_format = resolve_format(export_format)
+    ext = "." + export_format
+    interactions_file = os.path.splitext(files.EXPORT_INTERACTIONS)[0] + ext
+    leads_file = os.path.splitext(files.EXPORT_LEADS)[0] + ext
+
+    leads = LeadAggregator()
+    rows = (leads.add(row) for row in iter_interactions(ctx) if row["lead_id"] is not None)
+    interactions = write_table(rows, interactions_file, INTERACTION_COLUMNS, export_format,
+                               INTERACTION_SCHEMA, batch_rows)
+    lead_count = write_table(leads.rows(), leads_file, LEAD_COLUMNS, export_format, LEAD_SCHEMA, batch_rows)
+
+    result = {"format": export_format, "interactions": interactions, "leads": lead_count,
+              "interactions_file": interactions_file, "leads_file": leads_file}
+    ctx.record_stage("export", **result)
+    events.info(f"{b.GREEN}Взаимодействия ({interactions}) выгружены в{b.END} {b.BLUE}{interactions_file}{b.END}")
+    events.info(f"{b.GREEN}Лиды ({lead_count}) выгружены в{b.END} {b.BLUE}{leads_file}{b.END}")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Выгрузить лидов в Parquet или CSV")
+    parser.add_argument("--out_dir", help="Каталог файлов запуска", default=DEFAULT_CONTEXT.out_dir, type=str)
+    parser.add_argument("--format", dest="export_format", help="Формат выгрузки", default=FORMAT_AUTO, choices=FORMATS)
+    args = parser.parse_args()
+    main_export(RunContext(args.out_dir), args.export_format)
@@ -6,48 +6,40 @@ filter_groups.py
 Содержит:
 - функции для получения групп из файла
 - функции для сохранения групп в файл
+- оценку вовлеченности групп по тем же постам `wall.get` (`classes.engagement_index`): актуальные группы
+  сохраняются в порядке ожидаемого выхода лидов, группы ниже порога отбрасываются
 
 Автор: sergiomarotco, https://github.com/sergiomarotco/vk_lead_searcher
 Дата: 2025-01-10
 """
 import argparse
-import json
-import time
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
-import vk_api
-from vk_api.exceptions import VkApiError
-from tqdm import tqdm
+from typing import Any, Dict, Iterable, List, Tuple
 import classes.bcolors as b
 import classes.vk_api_params as vk_api_params
 import classes.file_params as file_params
+from classes import serializer, events
+from classes.engagement_index import ENGAGEMENT_INDEX_FILE_NAME, MIN_YIELD, SAMPLE_POSTS, EngagementIndex, engagement_from_posts
+from classes.group_reader import GroupReader
+from classes.negative_cache import NEGATIVE_CACHE_FILE_NAME, SCOPE_WALL, NegativeCache
+from classes.run_context import RunContext, DEFAULT_CONTEXT
+from classes.vk_client import API_ERRORS, VkClient
 
 
-API_SLEEP = vk_api_params.API_SLEEP  # пауза между запросами
 GROUPS_SEARCH_FILE = file_params.GROUPS_SEARCH_FILE
 GROUPS_SEARCH_ACTUAL_FILE = file_params.GROUPS_SEARCH_ACTUAL_FILE
 
 
-def load_groups_from_file(path: str) -> Dict[str, Any]:
-    """
-    Загрузить группы из файла
-    :param path: Путь к файлу
-    :return: Группы
-    """
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def save_groups_to_file(path: str, query: str, groups: List[Dict[str, Any]]) -> None:
+def save_groups_to_file(path: str, query: str, groups: List[Dict[str, Any]]) -> str:
     """
     Сохранить группы в файл
     :param path: Путь к файлу
     :param query: Фраза для поиска групп
     :param groups: Сохраняемые группы
+    :return: Фактический путь к файлу (с учетом сжатия)
     """
     out_data = {"query": query, "found": len(groups), "groups": groups}
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(out_data, f, ensure_ascii=False, indent=2)
+    return serializer.dump(out_data, path)
 
 
 def get_group_id(group: Dict[str, Any]) -> int:
@@ -74,41 +66,63 @@ def generate_post_link(group_id: int, post_id: int) -> str:
     return f"{vk_api_params.URI}/wall-{group_id}_{post_id}"
 
 
-def filter_recent_groups(vk, groups: List[Dict[str, Any]], months_max: int = 3) -> List[Dict[str, Any]]:
+def filter_recent_groups(vk, groups: Iterable[Dict[str, Any]], months_max: int = 3, budget=None,
+                         neg_cache: NegativeCache = None, engagement: EngagementIndex = None,
+                         min_yield: float = MIN_YIELD) -> List[Dict[str, Any]]:
     """
     Удалить из списка группы последний пост которых старше заданного порога в месяцах
     :param vk: объект VK API
-    :param groups: Фильтруемые группы
+    :param groups: Фильтруемые группы (список или поток `classes.group_reader.GroupReader`)
     :param months_max: Количество месяцев для порога
-    :return: Группы с последним постом не старше порога
+    :param budget: Бюджет запросов; при его исчерпании непроверенные группы отбрасываются
+    :param neg_cache: Негативный кэш: группы из него отбрасываются без запроса, недоступные группы записываются в него
+    :param engagement: Индекс вовлеченности: оценка группы по последним постам записывается в него
+    :param min_yield: Порог ожидаемого выхода лидов в день: группы ниже него отбрасываются (0 — не отбрасывать)
+    :return: Группы с последним постом не старше порога (с оценкой вовлеченности в поле `engagement`)
     """
     cutoff = datetime.now() - timedelta(days=30 * months_max)
     active_groups: List[Dict[str, Any]] = []  # Группы, которые прошли фильтр по дате последнего поста
 
-    with tqdm(groups, desc="Обработка групп", unit="группа") as pbar:
-        for g in pbar:
+    with events.Progress("Обработка групп", unit=" групп", name="remove_old") as progress:
+        for g in groups:
+            if budget is not None and budget.exhausted():
+                events.warning(f"{b.YELLOW}Бюджет запросов исчерпан{b.END}: остальные группы не проверены",
+                               event="budget_exhausted", stage="remove_old")
+                break
             try:
                 gid = get_group_id(g)  # получить id группы
             except KeyError:  # пропустить группы без id
+                progress.update(skipped=1)
+                continue
+            if neg_cache is not None and neg_cache.blocked(gid, SCOPE_WALL):  # группа удалена или стена закрыта
+                progress.update(skipped=1)
                 continue
             owner_id = -abs(gid)  # owner_id для группы — отрицательный
-            pbar.set_postfix({"id группы": b.YELLOW + g['name'] + b.END})
 
             try:
-                resp = vk.wall.get(owner_id=owner_id, count=1)  # получить последний пост
-            except VkApiError:  # при ошибке API — пропустить (или можно логировать)
-                time.sleep(API_SLEEP)  #  пауза между запросами для защиты от блокировки
+                # последние посты: по ним же оценивается вовлеченность группы, запрос тот же один
+                resp = vk.wall.get(owner_id=owner_id, count=SAMPLE_POSTS)
+            except API_ERRORS as e:  # при ошибке API — пропустить, удаленную или закрытую группу запомнить
+                if neg_cache is not None:
+                    neg_cache.add(gid, e, SCOPE_WALL)
+                progress.update(errors=1)
                 continue
             items = resp.get("items", [])
             if not items:
                 # нет постов — считаем старой/неактуальной и пропускаем
-                time.sleep(API_SLEEP)
+                progress.update(old=1)
                 continue
 
-            post = items[0]  # последний пост
+            stats = engagement_from_posts(items, g.get("members_count"))
+            if engagement is not None:
+                stats = engagement.update(gid, stats)
+            post = max(items, key=lambda p: p.get("date", 0))  # последний пост (закрепленный может быть старым)
             post_date = datetime.fromtimestamp(post.get("date", 0))  # дата поста
             if post_date < cutoff:  # последний пост старше порога — пропускаем
-                time.sleep(API_SLEEP)
+                progress.update(old=1)
+                continue
+            if engagement is not None and engagement.below(gid, min_yield):  # активна, но лидов почти не дает
+                progress.update(low_yield=1)
                 continue
 
             # группа актуальна — добавляем информацию по последнему посту и сохраняем
@@ -120,39 +134,60 @@ def filter_recent_groups(vk, groups: List[Dict[str, Any]], months_max: int = 3)
             g = dict(g)  # не менять оригинал
             g["last_post"] = last_post_info
             g["group_link"] = f"{vk_api_params.URI}/club{gid}"  # ссылка на группу для удобства открытия группы из JSON файла
+            g["engagement"] = stats
             active_groups.append(g)
-            time.sleep(API_SLEEP)  # пауза между запросами для защиты от блокировки
+            progress.update(actual=1)
     return active_groups
 
 
-def main_filter_groups(access_token: str, file: str = GROUPS_SEARCH_FILE, out_file: str = GROUPS_SEARCH_ACTUAL_FILE, months_max: int = 3) -> None:
+def main_filter_groups(access_token: str, file: str = None, out_file: str = None, months_max: int = 3, vk=None, budget=None,
+                       ctx: RunContext = DEFAULT_CONTEXT, shard: Tuple[int, int] = None,
+                       min_yield: float = MIN_YIELD) -> None:
     """
     Функция фильтрации групп по дате последнего поста
     :param access_token: VK access token
-    :param file: Файл с исходным списком групп
-    :param out_file: Файл для записи актуальных групп
+    :param file: Файл с исходным списком групп (по умолчанию — файл поиска в каталоге запуска)
+    :param out_file: Файл для записи актуальных групп (по умолчанию — в каталоге запуска)
     :param months_max: Порог в месяцах для старости постов
+    :param vk: Готовый объект VK API (общий для нескольких кампаний); если не передан — создается новая сессия
+    :param budget: Бюджет запросов (`classes.api_budget.ApiBudget`)
+    :param ctx: Контекст запуска (каталог и пути файлов)
+    :param shard: Обрабатывать только шард (i, n) входного списка
+    :param min_yield: Порог ожидаемого выхода лидов в день: группы ниже него не сохраняются (0 — не отбрасывать)
     :rtype: None
     """
-    if not access_token:
+    if vk is None and not access_token:
         raise SystemExit("Требуется VK token через --token или переменную окружения VK_TOKEN")
+    file = file or ctx.files.GROUPS_SEARCH_FILE
+    out_file = out_file or ctx.makedirs().files.GROUPS_SEARCH_ACTUAL_FILE
 
-    try:
-        data = load_groups_from_file(file)
+    neg_cache = NegativeCache.load(ctx.shared_path(NEGATIVE_CACHE_FILE_NAME))
+    engagement = EngagementIndex.load(ctx.shared_path(ENGAGEMENT_INDEX_FILE_NAME))
+    try:  # группы читаются из файла по одной, группы из негативного кэша отбрасываются без запроса
+        groups = GroupReader(file, neg_cache=neg_cache, scope=SCOPE_WALL, shard=shard)
     except Exception as e:
         raise SystemExit(f"Не удалось загрузить {b.BLUE}{file}{b.END}: {b.RED}{e}{b.END}")
 
-    groups = data.get("groups") if isinstance(data, dict) else data
-    if not isinstance(groups, list):
-        raise SystemExit(b.END + "Входной файл не содержит список групп в поле `groups`" + b.END)
-
-    vk_session = vk_api.VkApi(token=access_token)
-    vk = vk_session.get_api()
+    if vk is None:
+        vk = VkClient(access_token, budget=budget).get_api()
 
-    actual = filter_recent_groups(vk, groups, months_max=months_max)
-    query = data.get("query", "")
-    save_groups_to_file(out_file, query, actual)
-    print(f"\n{b.GREEN}Итог: сохранено {len(actual)} актуальных групп{b.END} в {b.BLUE}{out_file}{b.END}")
+    try:
+        actual = filter_recent_groups(vk, groups, months_max=months_max, budget=budget, neg_cache=neg_cache,
+                                      engagement=engagement, min_yield=min_yield)
+    except ValueError as e:
+        raise SystemExit(f"Не удалось загрузить {b.BLUE}{file}{b.END}: {b.RED}{e}{b.END}")
+    neg_cache.save()
+    engagement.save()
+    # группы с наибольшим ожидаемым выходом лидов — первыми (при равном — более крупные и с самой свежей активностью):
+    # сборщики лидов обходят их в этом порядке
+    actual.sort(key=lambda g: (g["engagement"]["expected_yield"], g["engagement"]["members_count"] or 0,
+                               g["last_post"]["date"]), reverse=True)
+    query = groups.meta.get("query", "")
+    out_file = save_groups_to_file(out_file, query, actual)
+    ctx.record_stage("remove_old", months=months_max, groups_in=groups.read, groups_actual=len(actual),
+                     input=groups.summary(), negative_cache=neg_cache.summary(), min_yield=min_yield,
+                     engagement=engagement.summary())
+    events.info(f"\n{b.GREEN}Итог: сохранено {len(actual)} актуальных групп{b.END} в {b.BLUE}{out_file}{b.END}")
 
 
 if __name__ == "__main__":
@@ -6,35 +6,134 @@ generate_report.py
 Содержит:
 - Функцию для чтения JSON файлов.
 - Основную функцию для генерации и сохранения отчета в текстовый файл.
+- Разметку комментариев интентами (`classes.intent_index`) и рейтинг лидов по интентам.
+- Отчет о новых лидах: сверку с множеством уже виденных лидов и списком исключений.
 
 Автор: sergiomarotco, https://github.com/sergiomarotco/vk_lead_searcher
 Дата: 2025-01-10
 """
-import json
+import hashlib
+import os
+from array import array
+from collections import Counter, defaultdict
 import classes.bcolors as b
-import classes.file_params as file_params
+from classes import serializer, events
+from classes.file_lock import file_lock
+from classes.intent_index import IntentIndex, INTENTS_FILE
+from classes.lead_set import LeadSet, lead_id_from_url, read_id_list
+from classes.run_context import RunContext, DEFAULT_CONTEXT
+from group_members import load_members
 
 
-def read_json(path: str) -> dict:
+SEEN_LEADS_FILE_NAME = "seen_leads.bin"  # множество уже попадавших в отчеты лидов, общее для всех запусков
+EXCLUDE_LEADS_FILE_NAME = "exclude_leads.txt"  # лиды, которых не нужно включать в новые (id или ссылки)
+
+
+def read_json(path: str, default=None):
     """
-    Прочитать json файл
+    Прочитать json файл (в том числе сжатый .gz/.zst)
     :param path: Путь к файлу
+    :param default: Значение, если файла нет (этап не нашел данных); по умолчанию пустой список
     :return: Содержимое файла в виде словаря
     """
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    if not os.path.exists(serializer.resolve_path(path)):
+        return [] if default is None else default
+    return serializer.load(path)
+
+
+def intent_tag(intents: list) -> str:
+    """
+    Сформировать метку интентов для строки отчета
+    :param intents: Интенты комментария
+    :return: Метка вида ` [интент: price, booking]` или пустая строка
+    """
+    return f" [интент: {', '.join(intents)}]" if intents else ""
+
+
+def leads_digest(lead_ids: list) -> str:
+    """
+    Отпечаток набора лидов отчета
+    :param lead_ids: id лидов
+    :return: Хеш отсортированных id (hex)
+    """
+    return hashlib.blake2b(array("q", sorted(set(lead_ids))).tobytes(), digest_size=8).hexdigest()
 
-photos_likes_array = read_json(file_params.PHOTOS_LIKES_FILE)
-photos_comments_array = read_json(file_params.PHOTOS_COMMENTS_FILE)
-wall_comments_array = read_json(file_params.WALL_COMMENTS_FILE)
-wall_likes_array = read_json(file_params.WALL_LIKES_FILE)
 
-def main_generate_report() -> None:
+def recorded_new_leads(ctx: RunContext) -> dict:
+    """
+    Счетчики новых лидов, уже записанные в метаданные запуска (`run.json`) предыдущим отчетом
+    :param ctx: Контекст запуска
+    :return: Счетчики или пустой словарь, если отчет в этом каталоге еще не строился
+    """
+    metadata = read_json(ctx.metadata_file, default={})
+    return metadata.get("stages", {}).get("report", {}).get("new_leads", {})
+
+
+def write_new_leads(ctx: RunContext, unic_users: list, exclude_file: str = None, update_seen: bool = True,
+                    previous: dict = None) -> dict:
+    """
+    Сохранить лидов, которых не было в предыдущих отчетах и нет в списке исключений
+    :param ctx: Контекст запуска
+    :param unic_users: Ссылки на уникальных лидов текущего отчета
+    :param exclude_file: Файл исключений (по умолчанию exclude_leads.txt в каталоге отчетов)
+    :param update_seen: Добавить лидов текущего отчета в множество виденных
+    :param previous: Счетчики предыдущего отчета этого запуска (`recorded_new_leads`); если отпечаток лидов
+        совпадает, отчет повторный: лиды уже в множестве виденных, новыми остаются лиды из прошлого отчета
+    :return: Счетчики изменений
+    """
+    urls = {url: lead_id_from_url(url) for url in unic_users}
+    digest = leads_digest([lead_id for lead_id in urls.values() if lead_id is not None])
+    rerun = bool(previous) and previous.get("digest") == digest
+    # лиды, уже показанные новыми этим запуском (файл читается до перезаписи)
+    reported = read_id_list(ctx.files.REPORT_NEW_LEADS) if rerun else set()
+    excluded = read_id_list(exclude_file or ctx.shared_path(EXCLUDE_LEADS_FILE_NAME))  # set: O(1) на лида
+    new_leads = []
+    counts = {"total": len(unic_users), "new": 0, "seen_before": 0, "excluded": 0}
+    seen_file = ctx.shared_path(SEEN_LEADS_FILE_NAME)
+    with file_lock(seen_file):  # множество общее для запусков: чтение, сверка и запись — без чужих изменений между ними
+        seen = LeadSet.load(seen_file)
+        for url, lead_id in urls.items():
+            if lead_id is None:
+                continue
+            if lead_id in excluded:
+                counts["excluded"] += 1
+            elif lead_id in seen and lead_id not in reported:
+                counts["seen_before"] += 1
+            else:
+                new_leads.append(url)
+        if update_seen and not rerun:
+            seen.update(lead_id for lead_id in urls.values() if lead_id is not None)
+            seen.save(seen_file)
+    counts["new"] = len(new_leads)
+    with open(ctx.files.REPORT_NEW_LEADS, "w", encoding="utf-8") as f:
+        for url in new_leads:
+            f.write(f"{url}\n")
+    counts["seen_total"] = len(seen)
+    counts["digest"] = digest
+    return counts
+
+
+def main_generate_report(ctx: RunContext = DEFAULT_CONTEXT, intents_file: str = INTENTS_FILE,
+                         exclude_file: str = None, my_group_id: str = "") -> None:
     """
     Сохранить отчет по лайкам и комментариям в файл
+    :param ctx: Контекст запуска (каталог и пути файлов)
+    :param intents_file: Файл фраз интентов; если файла нет — комментарии не размечаются
+    :param exclude_file: Файл лидов-исключений (по умолчанию exclude_leads.txt в каталоге отчетов)
+    :param my_group_id: Id своей группы: ее участники (множество из `group_members`) не считаются лидами
     :rtype: None
     :return: Файл с отчетом
     """
+    files = ctx.makedirs().files
+    previous = recorded_new_leads(ctx)  # до первой записи метаданных этим отчетом
+    index = IntentIndex.from_file(intents_file) if os.path.exists(intents_file) else None  # компилируется один раз
+    lead_intents = defaultdict(Counter)  # лид -> сколько комментариев с каждым интентом
+    lead_activity = Counter()  # лид -> количество взаимодействий
+    # файлы читаются при вызове, а не при импорте: сжатие задается уже после импорта модуля
+    photos_likes_array = read_json(files.PHOTOS_LIKES_FILE)
+    photos_comments_array = read_json(files.PHOTOS_COMMENTS_FILE)
+    wall_comments_array = read_json(files.WALL_COMMENTS_FILE)
+    wall_likes_array = read_json(files.WALL_LIKES_FILE)
     report = []
     unic_leads = []
     for photos_like in photos_likes_array:
@@ -47,30 +146,59 @@ def main_generate_report() -> None:
         photos_comments = photos_comment['comments']
         photo_url = photos_comment['photo_url']
         for comment in photos_comments:
-            report.append(f"{comment['author_link']} оставил комментарий '{comment['text']}' к фото {photo_url}")
+            intents = index.classify(comment['text']) if index else []
+            lead_intents[comment['author_link']].update(intents)
+            report.append(f"{comment['author_link']} оставил комментарий '{comment['text']}' к фото {photo_url}{intent_tag(intents)}")
             unic_leads.append(comment['author_link'])
     for wall_like in wall_likes_array:
         report.append(f"{wall_like['liker_url']} лайкнул пост {wall_like['post_url']}")
         unic_leads.append(wall_like['liker_url'])
     for wall_comment in wall_comments_array:
-        report.append(f"{wall_comment['author_url']} оставил комментарий к посту на стене {wall_comment['post_url']}")
+        intents = index.classify(wall_comment.get('text')) if index else []
+        lead_intents[wall_comment['author_url']].update(intents)
+        action = "ответил в ветке комментариев к посту" if wall_comment.get('parent_comment_id') else "оставил комментарий к посту на стене"
+        report.append(f"{wall_comment['author_url']} {action} {wall_comment['post_url']}{intent_tag(intents)}")
         unic_leads.append(wall_comment['author_url'])
+    lead_activity.update(unic_leads)
 
     # Записываем в файл активность лидов в группах
     result = list(dict.fromkeys(report))  # Удаление дубликатов
     result = sorted(result)
-    with open(file_params.REPORT_FILE, "w", encoding="utf-8") as f:
+    with open(files.REPORT_FILE, "w", encoding="utf-8") as f:
         for item in result:
             f.write(f"{item}\n")
-        print(f"{b.GREEN}Отчет сохранен в файл:{b.END} {b.BLUE}{file_params.REPORT_FILE}{b.END}")
+        events.info(f"{b.GREEN}Отчет сохранен в файл:{b.END} {b.BLUE}{files.REPORT_FILE}{b.END}")
 
     # Записываем в файл уникальных пользователей
     unic_users = list(dict.fromkeys(unic_leads))  # Удаление дубликатов
     unic_users = sorted(unic_users)
-    with open(file_params.REPORT_UNIC_USERS, "w", encoding="utf-8") as f:
+    members = load_members(ctx, my_group_id)  # участники своей группы уже наши — не лиды
+    if members is not None:
+        found = len(unic_users)
+        unic_users = [u for u in unic_users if lead_id_from_url(u) not in members]
+        ctx.record_stage("report", members_excluded=found - len(unic_users), members=len(members))
+    ctx.record_stage("report", interactions=len(result), unic_users=len(unic_users))
+    with open(files.REPORT_UNIC_USERS, "w", encoding="utf-8") as f:
         for unic_user in unic_users:
             f.write(f"{unic_user}\n")
-        print(f"{b.GREEN}Уникальные лиды сохранены в :{b.END} {b.BLUE}{file_params.REPORT_UNIC_USERS}{b.END}")
+        events.info(f"{b.GREEN}Уникальные лиды сохранены в :{b.END} {b.BLUE}{files.REPORT_UNIC_USERS}{b.END}")
+
+    # Записываем в файл только новых лидов (не попадавших в прошлые отчеты и не исключенных)
+    delta = write_new_leads(ctx, unic_users, exclude_file, previous=previous)
+    ctx.record_stage("report", new_leads=delta)
+    events.info(f"{b.GREEN}Новые лиды ({delta['new']} из {delta['total']}, ранее виденных {delta['seen_before']}, "
+          f"исключено {delta['excluded']}) сохранены в :{b.END} {b.BLUE}{files.REPORT_NEW_LEADS}{b.END}")
+
+    # Рейтинг лидов с интентами: больше комментариев с интентами, затем больше взаимодействий — выше
+    if index is not None:
+        ranked = sorted((lead for lead, c in lead_intents.items() if c and (members is None or lead_id_from_url(lead) not in members)),
+                        key=lambda lead: (-sum(lead_intents[lead].values()), -lead_activity[lead], lead))
+        with open(files.REPORT_INTENTS, "w", encoding="utf-8") as f:
+            for lead in ranked:
+                intents = ", ".join(f"{intent}×{n}" for intent, n in lead_intents[lead].most_common())
+                f.write(f"{lead}\t{intents}\tвзаимодействий: {lead_activity[lead]}\n")
+        ctx.record_stage("report", leads_with_intents=len(ranked))
+        events.info(f"{b.GREEN}Лиды с интентами ({len(ranked)}) сохранены в :{b.END} {b.BLUE}{files.REPORT_INTENTS}{b.END}")
 
 if __name__ == "__main__":
     main_generate_report()
@@ -4,7 +4,9 @@ get_leads_from_photos.py
 Модуль для выгрузки лидов из фото групп VK за последние дни.
 
 Содержит:
-- Функции для получения альбомов, фото, комментариев и лайков.
+- Сканирование всех фото владельца (`photos.getAll`, включая фото со стены и фото профиля)
+  одним потоком от новых к старым с остановкой на границе окна анализа.
+- Функции для получения комментариев и лайков фото.
 - Основную функцию для обработки групп и сохранения результатов в файлы.
 
 Автор: sergiomarotco, https://github.com/sergiomarotco/vk_lead_searcher
@@ -14,210 +16,291 @@ import os
 import classes.bcolors as b
 import classes.vk_api_params as vk_p
 import classes.file_params as file_params
-import vk_api
-import json
 import argparse
-import time
 from datetime import datetime, timedelta
-from typing import Dict, Any
-from tqdm import tqdm
-
-from classes.vk_api_params import API_VERSION
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+from classes import serializer, events
+from classes.engagement_index import ENGAGEMENT_INDEX_FILE_NAME, MIN_YIELD, EngagementIndex
+from classes.group_reader import GroupReader
+from classes.negative_cache import NEGATIVE_CACHE_FILE_NAME, SCOPE_PHOTOS, NegativeCache
+from classes.retry_queue import DEAD_LETTER_FILE_NAME, RetryQueue
+from classes.run_context import RunContext, DEFAULT_CONTEXT
+from classes.vk_client import API_ERRORS, VkClient
+from classes import paginator
 
 PHOTOS_COMMENTS_FILE: str = file_params.FileParams.PHOTOS_COMMENTS_FILE
 PHOTOS_LIKES_FILE: str = file_params.FileParams.PHOTOS_LIKES_FILE
 GROUPS_SEARCH_ACTUAL_FILE: str = file_params.GROUPS_SEARCH_ACTUAL_FILE
-
-
-def load_groups_from_file(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+PHOTOS_PAGE = 200  # максимальный count метода photos.getAll
+PHOTOS_PAGES_PER_CALL = 5  # фото отсортированы по дате: небольшие пачки execute, чтобы не выгружать лишнее
+COMMENTS_PAGE = 100  # максимальный count метода photos.getComments
+LIKES_PAGE = 1000  # максимальный count метода likes.getList
 
 
 def unix_days_ago(days):
     return int((datetime.now() - timedelta(days=days)).timestamp())
 
 
-def get_all_albums(vk, owner_id, since_ts):
-    albums = []
-    offset = 0
-    while True:
-        response = vk.photos.getAlbums(
-            owner_id=owner_id,
-            offset=offset#,
-            #count=100
-        )
-        alb_good: list = []
-        for alb in response["items"]:
-            if alb['size'] > 0 and alb["updated"] >= since_ts:
-                alb_good.append(
-                    {
-                        "id": alb["id"],
-                        "title": alb["title"],
-                        "size": alb["size"],
-                        "link": f"{vk_p.URI}/album{owner_id}_{alb['id']}",
-                        "created_norm": datetime.fromtimestamp(alb["created"]).isoformat(),
-                        "created": alb["created"],
-                        "updated_norm": datetime.fromtimestamp(alb["updated"]).isoformat(),
-                        "updated": alb["updated"]
-                    }
-                )
-        if len(alb_good) > 0:
-            albums.extend(alb_good)
-
-        if offset + 100 >= response["count"]:
-            break
-        offset += 100
-        time.sleep(0.34)
-    return albums
+def photo_count(photo: Dict[str, Any], key: str) -> int:
+    """
+    Количество лайков или комментариев фото из расширенного ответа
+    :param photo: Фото из ответа `photos.getAll` с `extended=1`
+    :param key: `likes` или `comments`
+    :return: Количество; 1, если счетчика в ответе нет (тогда список запрашивается)
+    """
+    value = photo.get(key)
+    return value.get("count", 1) if isinstance(value, dict) else 1
 
 
-def get_photos_from_album(vk, owner_id, album_id, since_ts):
-    photos = []
-    offset = 0
-    while True:
-        response = vk.photos.get(
-            owner_id=owner_id,
-            album_id=album_id,
-            offset=offset,
-            count=10,
-            extended=1,
-            photo_sizes=0,
-            rev=1
-        )
-        for photo in response["items"]:
-            if photo["date"] >= since_ts:
-                photos.append(photo)  # собираем фото, если дата подходит
-        if offset + 100 >= response["count"]:
-            break
-        offset += 100
-        time.sleep(0.34)
+def scan_owner_photos(vk, owner_id: int, since_ts: int, retry: RetryQueue = None,
+                      on_retry: Callable[[list], Any] = None) -> List[Dict[str, Any]]:
+    """
+    Получить все фото владельца за окно анализа одним потоком: все альбомы,
+    включая служебные (фото со стены, фото профиля), от новых к старым
+    :param vk: VK API объект
+    :param owner_id: id владельца (для группы — отрицательный)
+    :param since_ts: Начало окна анализа (unix timestamp); выгрузка останавливается на первом фото старше
+    :param retry: Очередь повторов: неудавшиеся страницы записываются в нее, а не теряются
+    :param on_retry: Куда передать фото, полученные при повторе
+    :return: Фото со счетчиками лайков и комментариев
+    """
+    photos, _ = paginator.fetch_all(
+        vk, "photos.getAll",
+        {"owner_id": owner_id, "extended": 1, "photo_sizes": 0, "no_service_albums": 0, "skip_hidden": 0},
+        PHOTOS_PAGE, stop=lambda photo: photo.get("date", 0) < since_ts, pages_per_call=PHOTOS_PAGES_PER_CALL,
+        retry=retry, on_retry=on_retry)
     return photos
 
 
-def get_comments(vk, owner_id, photo_id, since_ts):
+def build_author_link(from_id: int) -> str:
+    """
+    Сгенерировать ссылку на автора по from_id
+    :param from_id: id автора комментария или лайка
+    :return: ссылка на автора
+    """
+    if from_id < 0:
+        return f"{vk_p.URI}/club{abs(from_id)}"
+    return f"{vk_p.URI}/id{from_id}"
+
+
+def get_comments(vk, owner_id, photo_id, since_ts, retry: RetryQueue = None, on_retry: Callable[[list], Any] = None,
+                 offset: int = 0):
     comments = []
-    offset = 0
     while True:
-        response = vk.photos.getComments(
-            owner_id=owner_id,
-            photo_id=photo_id,
-            offset=offset,
-            count=100,
-            sort='desc'
-        )
+        params = {"owner_id": owner_id, "photo_id": photo_id, "offset": offset, "count": COMMENTS_PAGE, "sort": "desc"}
+        try:
+            response = vk.photos.getComments(**params)
+        except API_ERRORS as e:
+            if retry is None or on_retry is None:
+                raise
+            # оставшиеся страницы повторяются в конце этапа с того же offset
+            retry.add("photos.getComments", params, e, lambda start=offset: on_retry(
+                get_comments(vk, owner_id, photo_id, since_ts, retry, on_retry, start)))
+            break
+        reached_cutoff = False
         for c in response["items"]:
-            if c["date"] >= since_ts:  # собираем комментарии, если дата подходит
-                comments.append({
-                    "comment_id": c["id"],
-                    "text": c["text"],
-                    "author_id": c["from_id"],
-                    "author_link": f"{vk_p.URI}/id{c['from_id']}",
-                    "date": c["date"]
-                })
-        if offset + 100 >= response["count"]:
+            if c["date"] < since_ts:  # комментарии идут от новых к старым: дальше только более старые
+                reached_cutoff = True
+                break
+            comments.append({
+                "comment_id": c["id"],
+                "text": c["text"],
+                "author_id": c["from_id"],
+                "author_link": build_author_link(c["from_id"]),  # автор может быть сообществом
+                "date": c["date"]
+            })
+        if reached_cutoff or offset + COMMENTS_PAGE >= response["count"]:
             break
-        offset += 100
-        time.sleep(0.34)
+        offset += COMMENTS_PAGE
     return comments
 
 
-def get_likes(vk, owner_id, photo_id):
-    likes = []
-    offset = 0
-    while True:
-        response = vk.likes.getList(
-            type="photo",
-            owner_id=owner_id,
-            item_id=photo_id,
-            offset=offset,
-            count=100,
-            skip_own=True
-        )
-        for uid in response["items"]:
-            likes.append({
-                "user_id": uid,
-                "user_link": f"{vk_p.URI}/id{uid}"
-            })
-        if offset + 100 >= response["count"]:
-            break
-        offset += 100
-        time.sleep(0.34)
-    return likes
-
+def like_records(uids: List[int]) -> List[Dict[str, Any]]:
+    return [{"user_id": uid, "user_link": build_author_link(uid)} for uid in uids]
 
-def main_get_leads_from_photos(token: str, infile=GROUPS_SEARCH_ACTUAL_FILE, days: int = 2):
-    vk_session = vk_api.VkApi(token=token, api_version=API_VERSION)
-    vk = vk_session.get_api()
 
+def get_likes(vk, owner_id, photo_id, retry: RetryQueue = None, on_retry: Callable[[list], Any] = None):
+    params = {"type": "photo", "owner_id": owner_id, "item_id": photo_id, "skip_own": True}
     try:
-        groups_actual = load_groups_from_file(infile)
+        likers, _ = paginator.fetch_all(
+            vk, "likes.getList", params, LIKES_PAGE, retry=retry,
+            on_retry=(lambda uids: on_retry(like_records(uids))) if on_retry is not None else None)
+    except API_ERRORS as e:
+        if retry is None or on_retry is None:
+            raise
+        retry.add("likes.getList", {**params, "count": LIKES_PAGE, "offset": 0}, e,
+                  lambda: on_retry(get_likes(vk, owner_id, photo_id, retry, on_retry)))
+        return []
+    return like_records(likers)
+
+
+class PhotoCollector:
+    """Класс сбора комментариев и лайков фото групп.
+    Описание:
+
+        - собирает комментарии и лайки фото групп в `comments` и `likes`, неудачные запросы — в очередь `retry`;
+        - с `defer` копит фото и выгружает их в `run_deferred` по числу лидов на вызов, пока хватает бюджета.
+    """
+
+    def __init__(self, vk, since_ts: int, neg_cache: NegativeCache, retry: RetryQueue = None, budget=None,
+                 counters: Counter = None, defer: bool = False):
+        self.vk = vk
+        self.since_ts = since_ts
+        self.neg_cache = neg_cache
+        self.retry = retry
+        self.budget = budget
+        self.comments: List[Dict[str, Any]] = []
+        self.likes: List[Dict[str, Any]] = []
+        self.counters: Counter = counters if counters is not None else Counter()
+        self.deferred: List[Tuple[int, Dict[str, Any]]] = []
+        self.defer = defer
+
+    def group(self, group: Dict[str, Any]) -> None:
+        """
+        Собрать комментарии и лайки фото группы
+        :param group: Группа
+        """
+        owner_id = -group['id']
+        try:
+            photos = scan_owner_photos(self.vk, owner_id, self.since_ts, self.retry,
+                                       lambda items: self.photos(owner_id, items))
+        except API_ERRORS as e:
+            self.counters["errors"] += 1
+            # группа удалена или фото закрыты — запоминаем, чтобы не запрашивать снова; временную ошибку — повторяем
+            if not self.neg_cache.add(group['id'], e, SCOPE_PHOTOS) and self.retry is not None:
+                self.retry.add("photos.getAll", {"owner_id": owner_id, "offset": 0}, e, lambda: self.group(group))
+            return
+        self.photos(owner_id, photos)
+
+    def photos(self, owner_id: int, photos: List[Dict[str, Any]]) -> None:
+        """
+        Собрать комментарии и лайки фото
+        :param owner_id: id владельца
+        :param photos: Фото из ответа `photos.getAll` с `extended=1`
+        """
+        self.counters["photos"] += len(photos)
+        if self.defer:
+            self.deferred.extend((owner_id, photo) for photo in photos)
+            return
+        for photo in photos:
+            if self.budget is not None and self.budget.exhausted():
+                break
+            self.safe_photo(owner_id, photo)
+
+    def run_deferred(self) -> int:
+        """
+        Выгрузить накопленные фото в порядке выгоды в рамках бюджета
+        :return: Количество фото, пропущенных из-за бюджета
+        """
+        import planner  # локальный импорт: planner сам импортирует этот модуль
+        tasks = planner.build_photo_tasks(self.deferred)
+        self.deferred = []
+        skipped = 0
+        for t in tasks:
+            if self.budget is not None and not self.budget.can_afford(t["calls"]):
+                skipped += 1
+                continue  # дорогое фото пропускаем, более дешевые после него еще могут поместиться
+            self.safe_photo(t["owner_id"], t["photo"])
+        return skipped
+
+    def safe_photo(self, owner_id: int, photo: Dict[str, Any]) -> None:
+        """
+        Собрать комментарии и лайки фото, ошибку — учесть в счетчиках
+        :param owner_id: id владельца
+        :param photo: Фото
+        """
+        try:
+            self.photo(owner_id, photo)
+        except API_ERRORS as e:
+            self.counters["errors"] += 1
+            events.emit("photo_error", f"Ошибка для фото {owner_id}_{photo['id']}: {b.RED}{e}{b.END}", events.DEBUG,
+                        owner_id=owner_id, photo_id=photo["id"], error=str(e))
+
+    def photo(self, owner_id: int, photo: Dict[str, Any]) -> None:
+        """
+        Собрать комментарии и лайки одного фото
+        :param owner_id: id владельца
+        :param photo: Фото
+        """
+        photo_url = f"{vk_p.URI}/photo{owner_id}_{photo['id']}"
+
+        def add_comments(comments: list) -> None:
+            for comment in comments:
+                comment['date'] = datetime.fromtimestamp(comment['date']).isoformat()
+            if comments:
+                self.comments.append({"photo_url": photo_url, "album_id": photo.get("album_id"), "comments": comments})
+                self.counters["comments"] += len(comments)
+
+        def add_likes(likes: list) -> None:
+            if likes:
+                self.likes.append({"photo_url": photo_url, "album_id": photo.get("album_id"), "likes": likes})
+                self.counters["likes"] += len(likes)
+
+        # счетчики из расширенного ответа: фото без комментариев и лайков не стоят запросов
+        if photo_count(photo, "comments") > 0:
+            add_comments(get_comments(self.vk, owner_id, photo["id"], self.since_ts, self.retry, add_comments))
+        if photo_count(photo, "likes") > 0:
+            add_likes(get_likes(self.vk, owner_id, photo["id"], self.retry, add_likes))
+
+
+def main_get_leads_from_photos(token: str, infile: str = None, days: int = 2, vk=None, budget=None,
+                               ctx: RunContext = DEFAULT_CONTEXT, shard: Tuple[int, int] = None,
+                               min_yield: float = MIN_YIELD):
+    files = ctx.makedirs().files
+    infile = infile or files.GROUPS_SEARCH_ACTUAL_FILE
+    if vk is None:
+        vk = VkClient(token, budget=budget).get_api()
+
+    neg_cache = NegativeCache.load(ctx.shared_path(NEGATIVE_CACHE_FILE_NAME))
+    engagement = EngagementIndex.load(ctx.shared_path(ENGAGEMENT_INDEX_FILE_NAME))  # группы ниже порога не обходятся
+    try:  # группы читаются из файла по одной, группы из негативного кэша отбрасываются без запроса
+        groups = GroupReader(infile, neg_cache=neg_cache, scope=SCOPE_PHOTOS, shard=shard,
+                             engagement=engagement, min_yield=min_yield)
     except Exception as e:
         raise SystemExit(f"Не удалось загрузить {b.BLUE}{infile}{b.END}: {b.RED}{e}{b.END}")
-
-    groups = groups_actual.get("groups") if isinstance(groups_actual, dict) else groups_actual
-    if not isinstance(groups, list):
-        raise SystemExit(b.END + "Входной файл не содержит список групп в поле `groups`" + b.END)
     since_ts = unix_days_ago(days)
 
-    all_comments = []
-    all_likes = []
-
-    with tqdm(groups, desc="Обработка групп", unit=" группа ") as pbar_groups:
-        for group in pbar_groups:
-            try:
-                pbar_groups.set_postfix({"группа": b.YELLOW + group['group_link'] + b.END})
-                owner_id = -group['id']
-                albums = get_all_albums(vk, owner_id, since_ts)
-                #albums.append({"id": 0, "title": "Фотографии со стены"})  # альбом со стены
-                with tqdm(albums, desc="  Обработка альбомов", unit=" альбом ") as pbar_albums:
-                    for album in pbar_albums:
-                        album['link'] = f"{vk_p.URI}/album{owner_id}_{album['id']}"
-                        pbar_albums.set_postfix({"альбом": b.YELLOW + album['link'] + b.END})
-                        photos = get_photos_from_album(vk, owner_id, album["id"], since_ts)
-                        if len(photos) > 0:
-                            print(f"    найдено фото: {b.GREEN}{len(photos)}{b.END} шт.")
-                        with tqdm(photos, desc="    Обработка фото", unit=" фото ") as pbar_photo:
-                            for photo in pbar_photo:
-                                photo_url = f"{vk_p.URI}/photo{owner_id}_{photo['id']}"
-
-                                comments = get_comments(vk, owner_id, photo["id"], since_ts)
-                                for comment in comments:
-                                    if 'date' in comment:
-                                        comment['date'] = datetime.fromtimestamp(comment['date']).isoformat()
-                                if len(comments) > 0:
-                                    print(f"      найдено комментариев: {b.GREEN}{len(comments)}{b.END} шт.")
-                                if comments:
-                                    all_comments.append({
-                                        "photo_url": photo_url,
-                                        "comments": comments
-                                    })
-
-                                likes = get_likes(vk, owner_id, photo["id"])
-                                if len(likes) > 0:
-                                    print(f"      найдено лайков: {b.GREEN}{len(likes)}{b.END} шт.")
-                                if likes:
-                                    all_likes.append({
-                                        "photo_url": photo_url,
-                                        "likes": likes
-                                    })
-
-            except Exception as e:
-                print(f"    Ошибка в группе {group['group_link']}: {b.RED}{e}{b.END}")
-                continue
+    retry = RetryQueue("inspect_photos")  # неудавшиеся запросы повторяются в конце этапа, а не теряются
+    with events.Progress("Обработка групп", unit=" групп", name="inspect_photos") as progress:
+        # прогресс — счетчики сборщика, а не строка на каждое фото
+        # с ограниченным бюджетом фото сначала сканируются во всех группах, а выгружаются по выгоде
+        limited = budget is not None and budget.limited
+        collector = PhotoCollector(vk, since_ts, neg_cache, retry, budget, progress.counters, defer=limited)
+        counters = collector.counters
+        for group in groups:
+            if budget is not None and budget.exhausted():
+                counters["budget_stop"] = 1
+                break
+            collector.group(group)
+            progress.update()
+        counters["skipped"] += collector.run_deferred()
+        if len(retry):
+            counters["recovered"] += retry.drain(budget)
+            counters["skipped"] += collector.run_deferred()  # фото групп, просканированных при повторе
+    all_comments, all_likes = collector.comments, collector.likes
+    if counters["budget_stop"] or counters["skipped"]:
+        events.warning(f"{b.YELLOW}Бюджет запросов исчерпан{b.END}: пропущено фото {counters['skipped']}"
+                       + (", остальные группы пропущены" if counters["budget_stop"] else ""),
+                       event="budget_exhausted", stage="inspect_photos", skipped=counters["skipped"])
+    neg_cache.save()
+    ctx.record_stage("inspect_photos", days=days, since_ts=since_ts, comments_since_ts=since_ts,
+                     groups=groups.read, photos=counters["photos"], photos_with_comments=len(all_comments), photos_with_likes=len(all_likes),
+                     comments=counters["comments"], likes=counters["likes"], errors=counters["errors"],
+                     input=groups.summary(), negative_cache=neg_cache.summary(), retry=retry.summary(),
+                     min_yield=min_yield, engagement_dropped=engagement.dropped)
+    retry.save(ctx.path(DEAD_LETTER_FILE_NAME))
     if len(all_comments) > 0:
-        with open(PHOTOS_COMMENTS_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_comments, f, ensure_ascii=False, indent=2)
-            print(f"{b.GREEN}Итого: Комментарии к фото сохранены{b.END} в {b.BLUE}{PHOTOS_COMMENTS_FILE}{b.END}")
+        comments_file = serializer.dump(all_comments, files.PHOTOS_COMMENTS_FILE)
+        events.info(f"{b.GREEN}Итого: Комментарии к фото сохранены{b.END} в {b.BLUE}{comments_file}{b.END}")
     else:
-        print(f"Комментарии к фото {b.RED}не сохранены{b.END} в {b.BLUE}{PHOTOS_COMMENTS_FILE}{b.END} так как {b.RED}не были найдены{b.END}.")
+        events.info(f"Комментарии к фото {b.RED}не сохранены{b.END} в {b.BLUE}{files.PHOTOS_COMMENTS_FILE}{b.END} так как {b.RED}не были найдены{b.END}.")
 
     if len(all_likes) > 0:
-        with open(PHOTOS_LIKES_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_likes, f, ensure_ascii=False, indent=2)
-            print(f"{b.GREEN}Лайки фото сохранены{b.END} в {b.BLUE}{PHOTOS_LIKES_FILE}{b.END}")
+        likes_file = serializer.dump(all_likes, files.PHOTOS_LIKES_FILE)
+        events.info(f"{b.GREEN}Лайки фото сохранены{b.END} в {b.BLUE}{likes_file}{b.END}")
     else:
-        print(f"Лайки к фото {b.RED}не сохранены{b.END} в {b.BLUE}{PHOTOS_LIKES_FILE}{b.END} так как {b.RED}не были найдены{b.END}.")
+        events.info(f"Лайки к фото {b.RED}не сохранены{b.END} в {b.BLUE}{files.PHOTOS_LIKES_FILE}{b.END} так как {b.RED}не были найдены{b.END}.")
 
 
 if __name__ == "__main__":
@@ -4,9 +4,9 @@ get_leads_from_wall.py
 Модуль для выгрузки постов, комментариев и лайков стены ВКонтакте.
 
 Содержит:
-- Загрузку групп из файла.
+- Потоковое чтение групп из файла (`classes.group_reader`).
 - Получение постов из стен групп за последние N дней.
-- Получение комментариев и пользователей оставивших лайк для каждого поста.
+- Получение комментариев (включая ответы в ветках) и пользователей оставивших лайк для каждого поста.
 - Сохранение результатов в JSON файлы.
 
 Автор: sergiomarotco, https://github.com/sergiomarotco/vk_lead_searcher
@@ -15,30 +15,29 @@ get_leads_from_wall.py
 import argparse
 import os
 import time
-import json
-from typing import List, Dict, Any
-import vk_api
-from tqdm import tqdm
-from vk_api.exceptions import ApiError
-from classes import vk_api_params as vk_p, bcolors as b, file_params as f_p
-from get_leads_from_photos import get_comments
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+from classes import vk_api_params as vk_p, bcolors as b, file_params as f_p, serializer, events
+from classes.engagement_index import ENGAGEMENT_INDEX_FILE_NAME, MIN_YIELD, EngagementIndex
+from classes.group_reader import GroupReader
+from classes.negative_cache import NEGATIVE_CACHE_FILE_NAME, SCOPE_WALL, NegativeCache
+from classes.retry_queue import DEAD_LETTER_FILE_NAME, RetryQueue
+from classes.run_context import RunContext, DEFAULT_CONTEXT
+from classes.vk_client import API_ERRORS, VkClient
+from classes.vk_execute import execute_batch
+from classes import paginator
+from get_leads_from_photos import build_author_link
 
 VK_TOKEN_ENV = "VK_API_TOKEN"
 POSTS_FILE = f_p.WALL_POSTS
 WALL_COMMENTS_FILE = f_p.WALL_COMMENTS_FILE
 WALL_LIKES_FILE = f_p.WALL_LIKES_FILE
 GROUPS_SEARCH_ACTUAL_FILE = f_p.GROUPS_SEARCH_ACTUAL_FILE
-REQUEST_COUNT = 20
-
-
-def load_groups_from_file(path: str) -> Dict[str, Any]:
-    """
-        Загрузить группы из файла
-        :param path: Путь к файлу
-        :return: Группы
-        """
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+REQUEST_COUNT = 100  # максимальный count метода wall.getComments
+THREAD_ITEMS_COUNT = 10  # ответов в ветке, приходящих вместе с комментарием (максимум API)
+THREAD_PAGE = 100  # размер страницы при дозагрузке ветки
+POSTS_PAGE = 100  # максимальный count метода wall.get
+POSTS_PAGES_PER_CALL = 5  # посты объемные и отсортированы по дате: небольшие пачки execute
+LIKES_PAGE = 1000  # максимальный count метода likes.getList
 
 
 def is_int_like(x: str) -> bool:
@@ -69,48 +68,59 @@ def owner_arg_from_identifier(identifier: Any) -> Dict[str, Any]:
     return {"domain": str(identifier)}
 
 
-def fetch_wall_posts(vk, identifier: Any, cutoff_ts: int):
+def post_record(identifier: Dict[str, Any], post: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Сформировать запись поста для выгрузки
+    :param identifier: Группа
+    :param post: Пост из ответа API
+    :return: Минимальная информация о посте + raw
+    """
+    return {
+        "group": identifier,
+        "post_id": post.get("id"),
+        "owner_id": post.get("owner_id"),
+        "date": post.get("date"),
+        "text": post.get("text"),
+        "raw": post
+    }
+
+
+def fetch_wall_posts(vk, identifier: Any, cutoff_ts: int, neg_cache: NegativeCache = None,
+                     retry: RetryQueue = None, on_retry: Callable[[list], Any] = None):
     """
     Получить посты со стены группы до cutoff_ts
     :param vk: VK API объект
     :param identifier: Идентификатор группы
     :param cutoff_ts: Пороговое время в формате unix timestamp
+    :param neg_cache: Негативный кэш: удаленная группа или закрытая стена записывается в него
+    :param retry: Очередь повторов: неудавшиеся страницы записываются в нее, а не теряются
+    :param on_retry: Куда передать посты, полученные при повторе
     :return: Список постов
     """
-    wall_posts = []
-    offset = 0
-    while True:
-        params = {"count": REQUEST_COUNT, "offset": offset, "filter": "owner", "domain": identifier['id']}
-        params.update(owner_arg_from_identifier(identifier['screen_name']))
-        resp: dict = {}
-        try:
-            resp = vk.wall.get(**params)
-        except ApiError as e:
-            print(f"Ошибка получения постов группы {identifier['id']}: {b.RED}{e}{b.END}")
-            # if 'error' in e and 'error_code' in e['error'] and e['error']['error_code'] == 18:  # Пользователь или группа удалены, или заблокированы
-            #bad_users.append(identifier['id'])
-        posts_array = resp.get("items", [])
-        if not posts_array:
-            break
-        for post_i in posts_array:
-            if post_i.get("date", 0) < cutoff_ts:
-                # посты идут от новых к старым — можно закончить для этой группы
-                return wall_posts
-            # сохраняем минимальную информацию + raw
-            wall_posts.append({
-                "group": identifier,
-                "post_id": post_i.get("id"),
-                "owner_id": post_i.get("owner_id"),
-                "date": post_i.get("date"),
-                "text": post_i.get("text"),
-                "raw": post_i
-            })
-        offset += len(posts_array)
-        # защитимся от бесконечного цикла
-        if offset >= resp.get("count", 0):
-            break
-        time.sleep(0.34)  # небольшой throttle
-    return wall_posts
+    params = {"filter": "owner", "domain": identifier['id']}
+    params.update(owner_arg_from_identifier(identifier['screen_name']))
+
+    def records(posts: list) -> list:  # закрепленный пост может быть старше порога
+        return [post_record(identifier, p) for p in posts if p.get("date", 0) >= cutoff_ts]
+
+    try:
+        # посты идут от новых к старым — выгрузка останавливается на первом непривязанном посте старше порога
+        posts_array, _ = paginator.fetch_all(
+            vk, "wall.get", params, POSTS_PAGE,
+            stop=lambda post: not post.get("is_pinned") and post.get("date", 0) < cutoff_ts,
+            pages_per_call=POSTS_PAGES_PER_CALL,
+            retry=retry, on_retry=(lambda items: on_retry(records(items))) if on_retry is not None else None)
+    except API_ERRORS as e:
+        events.emit("group_error", f"Ошибка получения постов группы {identifier['id']}: {b.RED}{e}{b.END}", events.DEBUG,
+                    group_id=identifier['id'], error_code=getattr(e, "code", None))
+        # группа удалена или заблокирована (ошибка 18), закрыта или стена отключена — повторять бессмысленно
+        if neg_cache is not None and neg_cache.add(identifier['id'], e, SCOPE_WALL):
+            return []
+        if retry is not None and on_retry is not None:
+            retry.add("wall.get", {**params, "count": POSTS_PAGE, "offset": 0}, e,
+                      lambda: on_retry(fetch_wall_posts(vk, identifier, cutoff_ts, neg_cache, retry, on_retry)))
+        return []
+    return records(posts_array)
 
 
 def build_post_link(owner_id: int, post_id: int) -> str:
@@ -124,210 +134,371 @@ def build_post_link(owner_id: int, post_id: int) -> str:
     return f"{vk_p.URI}/wall{owner_id}_{post_id}"
 
 
-def build_author_link(from_id: int) -> str:
+def comment_record(owner_id: int, post_id: int, c: Dict[str, Any], parent_id: Any = None) -> Dict[str, Any]:
     """
-    Сгенерировать ссылку на автора по from_id
-    :param from_id: id автора комментария или лайка
-    :return: ссылка на автора
+    Сформировать запись комментария для выгрузки
+    :param owner_id: id владельца стены
+    :param post_id: id поста
+    :param c: Комментарий из ответа API
+    :param parent_id: id комментария, в ветке которого находится ответ (None для комментария верхнего уровня)
+    :return: Запись комментария
     """
-    if from_id < 0:
-        return f"{vk_p.URI}/club{abs(from_id)}"
-    return f"{vk_p.URI}/id{from_id}"
-
-
-def fetch_comments_for_post(vk, owner_id: int, post_id: int) -> List[Dict[str, Any]]:
+    from_id = c.get("from_id", 0)
+    return {
+        "owner_id": owner_id,
+        "post_id": post_id,
+        "comment_id": c.get("id"),
+        "parent_comment_id": parent_id,
+        "date": c.get("date"),
+        "text": c.get("text"),
+        "post_url": build_post_link(owner_id, post_id),
+        "author_id": from_id,
+        "author_url": build_author_link(from_id),
+        "raw": c
+    }
+
+
+def thread_replies(owner_id: int, post_id: int, thread: Dict[str, Any], resp: Any,
+                   since_ts: int = 0) -> List[Dict[str, Any]]:
     """
-    Получить комментарии для поста
+    Отобрать из страницы ветки еще не полученные ответы
+    :param owner_id: id владельца стены
+    :param post_id: id поста
+    :param thread: Ветка: {"comment_id", "count", "known" — id уже полученных ответов}
+    :param resp: Ответ `wall.getComments` для ветки
+    :param since_ts: Начало окна анализа: более старые ответы отбрасываются
+    :return: Новые ответы
+    """
+    replies = []
+    for r in (resp or {}).get("items", []):
+        if r.get("date", 0) < since_ts:
+            continue
+        if r.get("id") not in thread["known"]:
+            thread["known"].add(r.get("id"))
+            replies.append(comment_record(owner_id, post_id, r, thread["comment_id"]))
+    return replies
+
+
+def expand_threads(vk, owner_id: int, post_id: int, threads: List[Dict[str, Any]],
+                   retry: RetryQueue = None, on_retry: Callable[[list], Any] = None,
+                   since_ts: int = 0) -> List[Dict[str, Any]]:
+    """
+    Дозагрузить ветки, в которых ответов больше, чем пришло вместе с комментарием.
+    Страницы всех веток упаковываются в пачки execute (до 25 страниц за один запрос).
+    Ветки дозагружаются только у комментариев из окна анализа, а ответ не старше комментария,
+    поэтому страницы веток не отсекаются по `since_ts` — им фильтруются только сами ответы
     :param vk: VK API объект
     :param owner_id: id владельца стены
     :param post_id: id поста
-    :return: Список комментариев к посту
+    :param threads: Ветки: {"comment_id", "count", "known" — id уже полученных ответов}
+    :param retry: Очередь повторов: неудавшиеся страницы веток записываются в нее, а не теряются
+    :param on_retry: Куда передать ответы, полученные при повторе
+    :param since_ts: Начало окна анализа (unix timestamp); 0 — все ответы
+    :return: Недостающие ответы
+    """
+    calls, parents = [], []
+    for t in threads:
+        for offset in range(0, t["count"], THREAD_PAGE):
+            calls.append(("wall.getComments", {"owner_id": owner_id, "post_id": post_id, "comment_id": t["comment_id"],
+                                               "count": THREAD_PAGE, "offset": offset, "need_likes": 0}))
+            parents.append(t)
+    replies = []
+    can_retry = retry is not None and on_retry is not None
+    try:
+        results = execute_batch(vk, calls)
+    except API_ERRORS as e:
+        events.emit("post_error", f"Ошибка API при дозагрузке веток поста {post_id} (владелец {owner_id}): {b.RED}{e}{b.END}",
+                    events.DEBUG, owner_id=owner_id, post_id=post_id, error_code=getattr(e, "code", None))
+        if can_retry:
+            retry.add("execute", {"owner_id": owner_id, "post_id": post_id, "comment_ids": [t["comment_id"] for t in threads]}, e,
+                      lambda: on_retry(expand_threads(vk, owner_id, post_id, threads, retry, on_retry, since_ts)))
+        return replies
+    for t, (method, params), resp in zip(parents, calls, results):
+        if resp is False and can_retry:  # страница ветки не получена внутри execute
+            retry.add(method, params, None, lambda t=t, method=method, params=params: on_retry(
+                thread_replies(owner_id, post_id, t, paginator.call_method(vk, method, params), since_ts)))
+            continue
+        replies.extend(thread_replies(owner_id, post_id, t, resp, since_ts))
+    return replies
+
+
+def fetch_comments_for_post(vk, owner_id: int, post_id: int, retry: RetryQueue = None,
+                            on_retry: Callable[[list], Any] = None, offset: int = 0,
+                            since_ts: int = 0) -> List[Dict[str, Any]]:
+    """
+    Получить комментарии для поста вместе с ответами в ветках.
+    Комментарии запрашиваются от новых к старым, выгрузка останавливается на первом комментарии старше `since_ts`.
+    Первые ответы каждой ветки приходят в том же запросе (`thread_items_count`),
+    дозагружаются через execute только ветки, где ответов больше
+    :param vk: VK API объект
+    :param owner_id: id владельца стены
+    :param post_id: id поста
+    :param retry: Очередь повторов: при ошибке оставшиеся страницы записываются в нее с точным offset
+    :param on_retry: Куда передать комментарии, полученные при повторе
+    :param offset: С какого комментария верхнего уровня начинать (для повтора)
+    :param since_ts: Начало окна анализа (unix timestamp); 0 — все комментарии
+    :return: Список комментариев к посту (ответы помечены `parent_comment_id`)
     """
     comments = []
-    offset = 0
+    threads_to_expand = []
     while True:
+        params = {"owner_id": owner_id, "post_id": post_id, "need_likes": 0, "count": REQUEST_COUNT,
+                  "offset": offset, "extended": 0, "thread_items_count": THREAD_ITEMS_COUNT, "sort": "desc"}
         try:
-            resp = vk.wall.getComments(
-                owner_id=owner_id,
-                post_id=post_id,
-                need_likes=0,
-                count=REQUEST_COUNT,
-                offset=offset, extended=0
-            )
-        except ApiError as e:
-            print(f"API error while fetching comments for post {post_id} (owner {owner_id}): {e}")
+            resp = vk.wall.getComments(**params)
+        except API_ERRORS as e:
+            events.emit("post_error", f"Ошибка API при получении комментариев к посту {post_id} (владелец {owner_id}): {b.RED}{e}{b.END}",
+                        events.DEBUG, owner_id=owner_id, post_id=post_id, error_code=getattr(e, "code", None))
+            if retry is not None and on_retry is not None:
+                retry.add("wall.getComments", params, e, lambda start=offset: on_retry(
+                    fetch_comments_for_post(vk, owner_id, post_id, retry, on_retry, start, since_ts)))
             break
         items = resp.get("items", [])
         if not items:
             break
+        reached_cutoff = False
         for c in items:
-            from_id = c.get("from_id", 0)
-            comments.append({
-                "owner_id": owner_id,
-                "post_id": post_id,
-                "comment_id": c.get("id"),
-                "date": c.get("date"),
-                "text": c.get("text"),
-                "post_url": build_post_link(owner_id, post_id),
-                "author_id": from_id,
-                "author_url": build_author_link(from_id),
-                "raw": c
-            })
+            thread = c.get("thread") or {}
+            inline = thread.get("items", [])
+            if c.get("date", 0) < since_ts:  # дальше только более старые комментарии
+                reached_cutoff = True
+                # свежие ответы в ветке старого комментария пришли в этом же ответе — их сохраняем без дозагрузки
+                comments.extend(comment_record(owner_id, post_id, r, c.get("id")) for r in inline
+                                if r.get("date", 0) >= since_ts)
+                break
+            comments.append(comment_record(owner_id, post_id, c))
+            for r in inline:
+                comments.append(comment_record(owner_id, post_id, r, c.get("id")))
+            if thread.get("count", 0) > len(inline):
+                threads_to_expand.append({"comment_id": c.get("id"), "count": thread["count"],
+                                          "known": {r.get("id") for r in inline}})
         offset += len(items)
-        if offset >= resp.get("count", 0):
+        # offset считается по комментариям верхнего уровня, count включает и ответы в ветках
+        if reached_cutoff or offset >= resp.get("current_level_count", resp.get("count", 0)):
             break
-        time.sleep(0.34)
+    if threads_to_expand:
+        comments.extend(expand_threads(vk, owner_id, post_id, threads_to_expand, retry, on_retry, since_ts))
     return comments
 
 
-def fetch_likes_from_post(vk, owner_id: int, post_id: int) -> List[Dict[str, Any]]:
+def like_records(owner_id: int, post_id: int, likers: List[int]) -> List[Dict[str, Any]]:
+    """
+    Сформировать записи лайков поста для выгрузки
+    :param owner_id: id владельца стены
+    :param post_id: id поста
+    :param likers: id пользователей, поставивших лайк
+    :return: Записи лайков
+    """
+    post_url = build_post_link(owner_id, post_id)
+    return [{
+        "owner_id": owner_id,
+        "post_id": post_id,
+        "liker_id": uid,
+        "liker_url": build_author_link(uid),
+        "post_url": post_url,
+        "raw": uid
+    } for uid in likers]
+
+
+def fetch_likes_from_post(vk, owner_id: int, post_id: int, retry: RetryQueue = None,
+                          on_retry: Callable[[list], Any] = None) -> List[Dict[str, Any]]:
     """
     Получить пользователей, поставивших лайк посту
     :param vk: VK API объект
     :param owner_id: id владельца стены
     :param post_id: id поста
+    :param retry: Очередь повторов: неудавшиеся страницы записываются в нее, а не теряются
+    :param on_retry: Куда передать лайки, полученные при повторе
     :return: Список пользователей, поставивших лайк посту
     """
-    users_liked_post = []
-    offset = 0
-    while True:
-        try:
-            resp = vk.likes.getList(type="post", owner_id=owner_id, item_id=post_id, count=REQUEST_COUNT, offset=offset)
-        except ApiError as e:
-            print(f"Ошибка API при получении данных о пользователях, поставивших лайк к посту {post_id} (владелец {owner_id}): {e}")
-            break
-        items = resp.get("items", [])
-        if not items:
-            break
-        for uid in items:
-            users_liked_post.append({
-                "owner_id": owner_id,
-                "post_id": post_id,
-                "liker_id": uid,
-                "liker_url": build_author_link(uid),
-                "post_url": build_post_link(owner_id, post_id),
-                "raw": uid
-            })
-        offset += len(items)
-        if offset >= resp.get("count", 0):
-            break
-        time.sleep(0.35)
-    return users_liked_post
-
-
-def get_posts(groups: list, vk, cutoff):
+    params = {"type": "post", "owner_id": owner_id, "item_id": post_id}
+    try:
+        likers, _ = paginator.fetch_all(
+            vk, "likes.getList", params, LIKES_PAGE, retry=retry,
+            on_retry=(lambda uids: on_retry(like_records(owner_id, post_id, uids))) if on_retry is not None else None)
+    except API_ERRORS as e:
+        events.emit("post_error", f"Ошибка API при получении лайков к посту {post_id} (владелец {owner_id}): {b.RED}{e}{b.END}",
+                    events.DEBUG, owner_id=owner_id, post_id=post_id, error_code=getattr(e, "code", None))
+        if retry is not None and on_retry is not None:
+            retry.add("likes.getList", {**params, "count": LIKES_PAGE, "offset": 0}, e,
+                      lambda: on_retry(fetch_likes_from_post(vk, owner_id, post_id, retry, on_retry)))
+        return []
+    return like_records(owner_id, post_id, likers)
+
+
+def get_posts(groups: Iterable[Dict[str, Any]], vk, cutoff, budget=None, neg_cache: NegativeCache = None,
+              retry: RetryQueue = None):
+    """
+    Получить посты со стен групп
+    :param groups: Группы (список или поток `classes.group_reader.GroupReader`)
+    :param vk: VK API объект
+    :param cutoff: Пороговое время в формате unix timestamp
+    :param budget: Бюджет запросов; при его исчерпании остальные группы пропускаются
+    :param neg_cache: Негативный кэш: группы из него пропускаются без запроса
+    :param retry: Очередь повторов: неудавшиеся запросы повторяются в конце этапа
+    :return: Посты всех групп
+    """
     all_posts: list = []
-    with tqdm(groups, desc="Обработка групп", unit=" группа ") as pbar:
-        for g in pbar:
-            pbar.set_postfix({"id группы": b.YELLOW + g['group_link'] + " " + g['name'] + b.END})
+    with events.Progress("Обработка групп", unit=" групп", name="wall_posts") as progress:
+        for g in groups:
+            if budget is not None and budget.exhausted():
+                events.warning(f"{b.YELLOW}Бюджет запросов исчерпан{b.END}: остальные группы пропущены",
+                               event="budget_exhausted", stage="wall_posts")
+                break
+            if neg_cache is not None and neg_cache.blocked(g['id'], SCOPE_WALL):
+                progress.update(skipped=1)
+                continue
             try:
-                posts = fetch_wall_posts(vk, g, cutoff)
-                if len(posts) > 0:
-                    all_posts.extend(posts)
-                    print(f"  найдено постов: {b.GREEN}{len(posts)}{b.END} шт. к группе {g['group_link']}")
+                posts = fetch_wall_posts(vk, g, cutoff, neg_cache, retry, all_posts.extend)
+                all_posts.extend(posts)
+                progress.update(posts=len(posts))
             except Exception as e:
-                print(f"\nОшибка для группы {g['group_link']}: {e}")
+                progress.update(errors=1)
+                events.emit("group_error", f"Ошибка для группы {g['group_link']}: {b.RED}{e}{b.END}", events.DEBUG,
+                            group_id=g['id'], error=str(e))
+        if retry is not None and len(retry):
+            found = len(all_posts)
+            recovered = retry.drain(budget)
+            progress.update(0, recovered=recovered, posts=len(all_posts) - found)
     return all_posts
 
 
-def get_wall_comments(all_posts, vk):
+def get_wall_comments(all_posts, vk, retry: RetryQueue = None, since_ts: int = 0):
+    """
+    Получить комментарии к постам
+    :param all_posts: Посты
+    :param vk: VK API объект
+    :param retry: Очередь повторов: неудавшиеся запросы повторяются в конце этапа
+    :param since_ts: Начало окна анализа: более старые комментарии не запрашиваются
+    :return: Комментарии (с ответами в ветках)
+    """
     all_comments: list = []
-    with tqdm(all_posts, desc="Получение комментариев постам", unit=" пост ") as pbar:
-        for p in pbar:
-            comments: int = p['raw']["comments"]["count"]
-            if comments > 0:
-                owner_id = p["owner_id"]
-                post_id = p["post_id"]
-                pbar.set_postfix(
-                    {
-                        "пост": b.YELLOW + f"{vk_p.URI}/{p['group']['screen_name']}?w=wall{owner_id}_{post_id}" + b.END
-                    })
-                try:
-                    comments: list = fetch_comments_for_post(vk, owner_id, post_id)
-                    if len(comments) > 0:
-                        all_comments.extend(comments)
-                        print(f"  комментариев: {b.GREEN}{len(comments)}{b.END} шт.")
-                except Exception as e:
-                    print(f"Ошибка при получении комментариев для поста {post_id}: {b.RED}{e}{b.END}")
+    with events.Progress("Получение комментариев к постам", total=len(all_posts), unit=" постов",
+                         name="wall_comments") as progress:
+        for p in all_posts:
+            if p['raw']["comments"]["count"] <= 0:
+                progress.update()
+                continue
+            try:
+                comments: list = fetch_comments_for_post(vk, p["owner_id"], p["post_id"], retry, all_comments.extend,
+                                                         since_ts=since_ts)
+                all_comments.extend(comments)
+                progress.update(comments=len(comments))
+            except Exception as e:
+                progress.update(errors=1)
+                events.emit("post_error", f"Ошибка при получении комментариев для поста {p['post_id']}: {b.RED}{e}{b.END}",
+                            events.DEBUG, owner_id=p["owner_id"], post_id=p["post_id"], error=str(e))
+        if retry is not None and len(retry):
+            found = len(all_comments)
+            recovered = retry.drain()
+            progress.update(0, recovered=recovered, comments=len(all_comments) - found)
     return all_comments
 
 
-def get_wall_likes(all_posts, vk):
+def get_wall_likes(all_posts, vk, retry: RetryQueue = None):
+    """
+    Получить пользователей, поставивших лайк постам
+    :param all_posts: Посты
+    :param vk: VK API объект
+    :param retry: Очередь повторов: неудавшиеся запросы повторяются в конце этапа
+    :return: Лайки
+    """
     all_users_liked_wall_post = []
-    with tqdm(all_posts, desc="Получение пользователей оставивших лайк к постам", unit=" пост ") as pbar:
-        for p in pbar:
-            likes: int = p['raw']["likes"]["count"]
-            if likes > 0:
-                owner_id = p["owner_id"]
-                post_id = p["post_id"]
-                pbar.set_postfix(
-                    {
-                        "пост": b.YELLOW + f"{vk_p.URI}/{p['group']['screen_name']}?w=wall{owner_id}_{post_id}" + b.END
-                    }
-                )
-                try:
-                    likes_data = fetch_likes_from_post(vk, owner_id, post_id)
-                    if len(likes_data) > 0:
-                        all_users_liked_wall_post.extend(likes_data)
-                        print(f"  лайкнули: {b.GREEN}{len(likes_data)}{b.END} шт.: {b.YELLOW}{likes_data[0]['post_url']}{b.END}")
-                except Exception as e:
-                    print(f"Ошибка при получении пользователей оставивших лайк к посту {post_id}: {b.RED}{e}{b.END}")
+    with events.Progress("Получение лайков к постам", total=len(all_posts), unit=" постов", name="wall_likes") as progress:
+        for p in all_posts:
+            if p['raw']["likes"]["count"] <= 0:
+                progress.update()
+                continue
+            try:
+                likes_data = fetch_likes_from_post(vk, p["owner_id"], p["post_id"], retry, all_users_liked_wall_post.extend)
+                all_users_liked_wall_post.extend(likes_data)
+                progress.update(likes=len(likes_data))
+            except Exception as e:
+                progress.update(errors=1)
+                events.emit("post_error", f"Ошибка при получении лайков к посту {p['post_id']}: {b.RED}{e}{b.END}",
+                            events.DEBUG, owner_id=p["owner_id"], post_id=p["post_id"], error=str(e))
+        if retry is not None and len(retry):
+            found = len(all_users_liked_wall_post)
+            recovered = retry.drain()
+            progress.update(0, recovered=recovered, likes=len(all_users_liked_wall_post) - found)
     return all_users_liked_wall_post
 
 
-def main_get_leads_from_wall(access_token: str, file=GROUPS_SEARCH_ACTUAL_FILE, days_wall_max: int = 15) -> None:
+def main_get_leads_from_wall(access_token: str, file: str = None, days_wall_max: int = 15,
+                             vk=None, budget=None, ctx: RunContext = DEFAULT_CONTEXT, shard: Tuple[int, int] = None,
+                             min_yield: float = MIN_YIELD) -> None:
     """
     Основная функция для выгрузки постов, комментариев и лайков стены ВКонтакте.
     :param access_token: VK access token
-    :param file: Файл с группами
+    :param file: Файл с группами (по умолчанию — актуальные группы в каталоге запуска)
     :param days_wall_max: Количество дней для сбора постов
+    :param vk: Готовый объект VK API (общий для нескольких кампаний); если не передан — создается новая сессия
+    :param budget: Бюджет запросов (`classes.api_budget.ApiBudget`); если он ограничен — лайки и комментарии
+        выгружаются в порядке наибольшего числа лидов на вызов, пока бюджет не исчерпан
+    :param ctx: Контекст запуска (каталог и пути файлов)
+    :param shard: Обрабатывать только шард (i, n) входного списка
+    :param min_yield: Порог ожидаемого выхода лидов в день (`classes.engagement_index`): группы ниже него
+        не обходятся (0 — не отбрасывать)
     :rtype: None
     """
-    session = vk_api.VkApi(token=access_token)  # инициализация сессии VK
-    vk = session.get_api()  # объект для вызова методов API
-
-    try:
-        groups_actual = load_groups_from_file(file)
+    files = ctx.makedirs().files
+    file = file or files.GROUPS_SEARCH_ACTUAL_FILE
+    if vk is None:
+        vk = VkClient(access_token, budget=budget).get_api()  # объект для вызова методов API
+
+    neg_cache = NegativeCache.load(ctx.shared_path(NEGATIVE_CACHE_FILE_NAME))
+    engagement = EngagementIndex.load(ctx.shared_path(ENGAGEMENT_INDEX_FILE_NAME))  # группы ниже порога не обходятся
+    try:  # группы читаются из файла по одной, группы из негативного кэша отбрасываются без запроса
+        groups = GroupReader(file, neg_cache=neg_cache, scope=SCOPE_WALL, shard=shard,
+                             engagement=engagement, min_yield=min_yield)
     except Exception as e:
         raise SystemExit(f"Не удалось загрузить {b.BLUE}{file}{b.END}: {b.RED}{e}{b.END}")
-
-    groups = groups_actual.get("groups") if isinstance(groups_actual, dict) else groups_actual
-    if not isinstance(groups, list):
-        raise SystemExit(b.END + "Входной файл не содержит список групп в поле `groups`" + b.END)
     now_ts = int(time.time())  # текущее время в секундах с эпохи
     seconds = days_wall_max * 24 * 60 * 60  # дни в секунды
     cutoff = now_ts - seconds  # пороговое время
 
+    retry = RetryQueue("inspect_wall")  # неудавшиеся запросы повторяются в конце каждого шага, а не теряются
     # Собираем посты со стен групп
-    all_posts = get_posts(groups, vk, cutoff)
+    try:
+        all_posts = get_posts(groups, vk, cutoff, budget, neg_cache, retry)
+    except ValueError as e:
+        raise SystemExit(f"Не удалось загрузить {b.BLUE}{file}{b.END}: {b.RED}{e}{b.END}")
+    neg_cache.save()
 
     # Сохраняем посты
     if len(all_posts) > 0:
-        with open(POSTS_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_posts, f, ensure_ascii=False, indent=2)
-            print(f"{b.GREEN}Итого: Посты сохранены{b.END} в {b.BLUE}{POSTS_FILE}{b.END}\n")
+        posts_file = serializer.dump(all_posts, files.WALL_POSTS)
+        events.info(f"{b.GREEN}Итого: Посты сохранены{b.END} в {b.BLUE}{posts_file}{b.END}\n")
     else:
-        print(f"Посты {b.RED}не сохранены{b.END} в {b.BLUE}{POSTS_FILE}{b.END} так как {b.RED}не были найдены{b.END}.")
+        events.info(f"Посты {b.RED}не сохранены{b.END} в {b.BLUE}{files.WALL_POSTS}{b.END} так как {b.RED}не были найдены{b.END}.")
 
-    # Собираем комментарии ко всем постам
-    all_comments = get_wall_comments(all_posts, vk)
+    if budget is not None and budget.limited:  # без ограничений задачи выполняются все, порядок не важен
+        import planner  # локальный импорт: planner сам импортирует этот модуль
+        all_comments, all_users_liked_wall_post, _ = planner.run_wall_tasks(vk, planner.build_wall_tasks(all_posts), budget, retry, cutoff)
+    else:
+        # Собираем комментарии ко всем постам
+        all_comments = get_wall_comments(all_posts, vk, retry, cutoff)
+        # Собираем пользователей оставивших лайк на пост на стене группы
+        all_users_liked_wall_post = get_wall_likes(all_posts, vk, retry)
+
+    ctx.record_stage("inspect_wall", days=days_wall_max, cutoff_ts=cutoff, comments_since_ts=cutoff,
+                     groups=groups.read, posts=len(all_posts),
+                     comments=len(all_comments), likes=len(all_users_liked_wall_post),
+                     input=groups.summary(), negative_cache=neg_cache.summary(), retry=retry.summary(),
+                     min_yield=min_yield, engagement_dropped=engagement.dropped)
+    retry.save(ctx.path(DEAD_LETTER_FILE_NAME))
 
     if len(all_comments) > 0:
-        with open(WALL_COMMENTS_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_comments, f, ensure_ascii=False, indent=2)
-            print(f"{b.GREEN}Итого: Комментарии к постам на стене сохранены{b.END} в {b.BLUE}{WALL_COMMENTS_FILE}{b.END}\n")
+        comments_file = serializer.dump(all_comments, files.WALL_COMMENTS_FILE)
+        events.info(f"{b.GREEN}Итого: Комментарии к постам на стене сохранены{b.END} в {b.BLUE}{comments_file}{b.END}\n")
     else:
-        print(f"Комментарии {b.RED}не сохранены{b.END} в {b.BLUE}{WALL_COMMENTS_FILE}{b.END} так как {b.RED}не были найдены{b.END}.")
-
-    # Собираем пользователей оставивших лайк на пост на стене группы
-    all_users_liked_wall_post = get_wall_likes(all_posts, vk)
+        events.info(f"Комментарии {b.RED}не сохранены{b.END} в {b.BLUE}{files.WALL_COMMENTS_FILE}{b.END} так как {b.RED}не были найдены{b.END}.")
 
     if len(all_users_liked_wall_post) > 0:
-        with open(WALL_LIKES_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_users_liked_wall_post, f, ensure_ascii=False, indent=2)
-            print(f"{b.GREEN}Итого: Лайки постов на стене сохранены{b.END} в {b.BLUE}{WALL_LIKES_FILE}{b.END}")
+        likes_file = serializer.dump(all_users_liked_wall_post, files.WALL_LIKES_FILE)
+        events.info(f"{b.GREEN}Итого: Лайки постов на стене сохранены{b.END} в {b.BLUE}{likes_file}{b.END}")
     else:
-        print(f"Лайки пользователей {b.RED}не сохранены{b.END} в {b.BLUE}{WALL_LIKES_FILE}{b.END} так как {b.RED}не были найдены{b.END}.")
+        events.info(f"Лайки пользователей {b.RED}не сохранены{b.END} в {b.BLUE}{files.WALL_LIKES_FILE}{b.END} так как {b.RED}не были найдены{b.END}.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,176 @@
+"""
+group_members.py
+
+Модуль множества участников своей группы.
+
+Содержит:
+- Выгрузку участников группы в компактное множество `classes.lead_set.LeadSet`.
+- Инкрементальное обновление по новым участникам и полную выгрузку раз в `FULL_REFRESH_DAYS` дней.
+- Основную функцию обновления для этапов и командной строки.
+
+Автор: sergiomarotco, https://github.com/sergiomarotco/vk_lead_searcher
+Дата: 2026-10-19
+"""
+import argparse
+import os
+import time
+from typing import Any, Dict, Optional
+from vk_api.exceptions import ApiError
+import classes.bcolors as b
+from classes import events, paginator, serializer
+from classes.file_lock import file_lock
+from classes.lead_set import LeadSet
+from classes.run_context import RunContext, DEFAULT_CONTEXT
+from classes.vk_client import API_ERRORS, create_client
+from classes.vk_execute import EXECUTE_MAX_CALLS
+
+
+MEMBERS_PAGE = 1000  # максимальный count метода groups.getMembers
+NEW_PAGES_PER_CALL = 2  # новых участников обычно немного: небольшие пачки execute
+FULL_REFRESH_DAYS = 7  # раз в сколько дней выгружать участников целиком
+DRIFT_MAX = 0.01  # доля расхождения с count группы, после которой нужна полная выгрузка
+SORT_FULL = "id_asc"
+SORT_NEW_FIRST = "time_desc"  # доступна только администраторам группы
+MODE_TITLES = {"full": "полная выгрузка", "incremental": "новых", "cached": "сохраненное множество, новых"}
+
+
+def members_file_name(group_id: Any) -> str:
+    """
+    Имя файла множества участников группы
+    :param group_id: id группы (знак не важен)
+    :return: Имя файла, общего для всех запусков в out_dir
+    """
+    return f"members_{abs(int(group_id))}.bin"
+
+
+class GroupMembers:
+    """Класс множества участников группы.
+    Описание:
+
+        - хранит участников в `LeadSet` (`members_<id>.bin`), `refresh(vk)` дозагружает новых или выгружает всех.
+    """
+
+    def __init__(self, group_id: int, path: str, members: Optional[LeadSet] = None, meta: Optional[Dict[str, Any]] = None):
+        self.group_id = abs(int(group_id))
+        self.path = path
+        self.members = members if members is not None else LeadSet()
+        self.meta: Dict[str, Any] = meta or {"group_id": self.group_id, "count": 0, "full_sync": 0, "updated": 0}
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.members
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.splitext(self.path)[0] + ".json"
+
+    @classmethod
+    def load(cls, group_id: Any, path: str) -> "GroupMembers":
+        """
+        Прочитать множество участников из файла
+        :param group_id: id группы
+        :param path: Путь к файлу множества
+        :return: Множество (пустое, если файла нет)
+        """
+        members = cls(group_id, path, LeadSet.load(path))
+        if os.path.exists(serializer.resolve_path(members.meta_path)):
+            members.meta.update(serializer.load(members.meta_path))
+        return members
+
+    def save(self) -> None:
+        """Сохранить множество и сведения о синхронизации"""
+        self.members.save(self.path)
+        serializer.dump(self.meta, self.meta_path)
+
+    def _fetch(self, vk, sort: str, stop=None, pages_per_call: int = EXECUTE_MAX_CALLS):
+        return paginator.fetch_all(vk, "groups.getMembers", {"group_id": self.group_id, "sort": sort}, MEMBERS_PAGE,
+                                   stop=stop, pages_per_call=pages_per_call)
+
+    def refresh(self, vk, full_refresh_days: float = FULL_REFRESH_DAYS) -> Dict[str, Any]:
+        """
+        Обновить множество участников
+        :param vk: VK API объект
+        :param full_refresh_days: Через сколько дней после полной выгрузки выгружать всех заново
+        :return: Сводка: способ обновления (full, incremental, cached), добавлено участников, размер множества
+        """
+        now = int(time.time())
+        mode, added = "cached", 0
+        stale = not len(self.members) or now - self.meta["full_sync"] > full_refresh_days * 24 * 60 * 60
+        if not stale and self.meta.get("incremental", True):
+            try:  # новые участники — первыми: выгрузка останавливается на первом уже известном
+                new_ids, count = self._fetch(vk, SORT_NEW_FIRST, stop=lambda uid: uid in self.members,
+                                             pages_per_call=NEW_PAGES_PER_CALL)
+                added = self.members.update(new_ids)
+                self.meta["count"] = count
+                mode = "incremental"
+                # вышедших участников инкрементально не увидеть: при заметном расхождении — полная выгрузка
+                stale = abs(len(self.members) - count) > max(10, count * DRIFT_MAX)
+            except ApiError as e:  # нет прав администратора: до следующей полной выгрузки используется сохраненное множество
+                events.emit("members_incremental_failed", f"Инкрементальное обновление участников недоступно: {b.RED}{e}{b.END}",
+                            events.DEBUG, group_id=self.group_id, error_code=e.code)
+                self.meta["incremental"] = False
+        if stale:
+            try:
+                ids, count = self._fetch(vk, SORT_FULL)
+            except API_ERRORS as e:  # неполная выгрузка не сохраняется: полная выгрузка повторится в следующий раз
+                events.warning(f"Полная выгрузка участников группы {self.group_id} не удалась: {b.RED}{e}{b.END}",
+                               event="members_full_failed", group_id=self.group_id, error=str(e))
+                ids = None
+            if ids is not None:
+                added = sum(1 for uid in set(ids) if uid not in self.members)
+                self.members = LeadSet(ids)
+                self.meta.update(count=count, full_sync=now, incremental=True)
+                mode = "full"
+        self.meta["updated"] = now
+        return {"group_id": self.group_id, "mode": mode, "added": added, "members": len(self.members),
+                "count": self.meta["count"]}
+
+
+def load_members(ctx: RunContext, group_id: Any) -> Optional[GroupMembers]:
+    """
+    Прочитать сохраненное множество участников своей группы без запросов к API
+    :param ctx: Контекст запуска
+    :param group_id: id своей группы (пустое значение — группа не задана)
+    :return: Множество или None, если группа не задана или участники еще не выгружались
+    """
+    if not group_id:
+        return None
+    members = GroupMembers.load(group_id, ctx.shared_path(members_file_name(group_id)))
+    return members if len(members) else None
+
+
+def main_refresh_members(access_token: str, group_id: Any, vk=None, ctx: RunContext = DEFAULT_CONTEXT,
+                         full_refresh_days: float = FULL_REFRESH_DAYS) -> Dict[str, Any]:
+    """
+    Обновить и сохранить множество участников своей группы
+    :param access_token: VK access token
+    :param group_id: id своей группы
+    :param vk: Готовый объект VK API; если не передан — создается новая сессия
+    :param ctx: Контекст запуска (файл множества общий для всех запусков в out_dir)
+    :param full_refresh_days: Через сколько дней после полной выгрузки выгружать всех заново
+    :return: Сводка обновления
+    """
+    if vk is None:
+        vk = create_client(access_token).get_api()
+    path = ctx.makedirs().shared_path(members_file_name(group_id))
+    with file_lock(path):  # кампании с одной группой обновляют множество по очереди: вторая получит сохраненное
+        members = GroupMembers.load(group_id, path)
+        summary = members.refresh(vk, full_refresh_days)
+        members.save()
+    ctx.record_stage("members", **summary)
+    events.info(f"{b.GREEN}Участники группы{b.END} {b.YELLOW}{group_id}{b.END}: {summary['members']} "
+                f"({MODE_TITLES[summary['mode']]}: {summary['added']}) "
+                f"сохранены в {b.BLUE}{members.path}{b.END}", event="members", **summary)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Выгрузить участников своей группы VK для исключения из лидов")
+    parser.add_argument("--token", "-t", help="VK access token (или через VK_TOKEN env)", default=os.getenv("VK_TOKEN"))
+    parser.add_argument("--group_id", help="Id вашей группы в VK", required=True)
+    parser.add_argument("--out_dir", help="Каталог файлов запуска", default=DEFAULT_CONTEXT.out_dir, type=str)
+    parser.add_argument("--full_refresh_days", help="Раз в сколько дней выгружать участников целиком", default=FULL_REFRESH_DAYS, type=float)
+    args = parser.parse_args()
+    main_refresh_members(args.token, args.group_id, ctx=RunContext(args.out_dir), full_refresh_days=args.full_refresh_days)
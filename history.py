@@ -0,0 +1,272 @@
+"""
+history.py
+
+Модуль истории взаимодействий лидов между запусками.
+
+Содержит:
+- Хранилище взаимодействий только на дозапись, разбитое по дням (`history/day=YYYY-MM-DD/`).
+- Уплотнение частей дня в фоновом потоке и агрегаты по лидам.
+- Отчет по лидам за последние N дней.
+
+Автор: sergiomarotco, https://github.com/sergiomarotco/vk_lead_searcher
+Дата: 2026-10-19
+"""
+import argparse
+import contextlib
+import glob
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List
+import classes.bcolors as b
+from classes import events, serializer
+from classes.file_lock import file_lock
+from classes.lead_set import LeadSet
+from classes.run_context import RunContext, DEFAULT_CONTEXT
+import export_leads
+from export_leads import FORMAT_AUTO, FORMATS
+
+
+HISTORY_DIR_NAME = "history"  # каталог хранилища, общий для всех запусков в out_dir
+HISTORY_DAYS = 30  # за сколько последних дней строить отчет по лидам (0 — за все время)
+DAY_PREFIX = "day="
+DATA_FILE_NAME = "data.jsonl"  # уплотненный раздел дня
+PART_PREFIX = "part-"  # части, дописанные запусками и еще не уплотненные
+KEYS_FILE_NAME = "keys.bin"  # хеши уже сохраненных троек (лид, объект, тип)
+LEADS_FILE_NAME = "leads.json"  # агрегаты по лидам за все время
+
+
+def interaction_key(row: Dict[str, Any]) -> int:
+    """
+    Хеш тройки (лид, объект, тип) взаимодействия
+    :param row: Строка взаимодействия (`export_leads.INTERACTION_COLUMNS`)
+    :return: 64-битный знаковый хеш (хранится в `LeadSet`)
+    """
+    data = f"{row['lead_id']}|{row['item_url']}|{row['type']}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=True)
+
+
+def day_of(ts: int) -> str:
+    """
+    День раздела
+    :param ts: unix timestamp
+    :return: Строка вида 2026-10-19
+    """
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+
+class InteractionStore:
+    """Класс хранилища истории взаимодействий.
+    Описание:
+
+        - дописывает новые взаимодействия частями по дням (`append`) и сливает их (`compact`) под блокировкой файла.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()  # уплотнение заменяет файлы дня, чтение дня ждет его окончания
+
+    def _day_dir(self, day: str) -> str:
+        return os.path.join(self.path, DAY_PREFIX + day)
+
+    def days(self) -> List[str]:
+        """
+        Дни, за которые есть разделы
+        :return: Отсортированный список дней
+        """
+        dirs = glob.glob(os.path.join(self.path, DAY_PREFIX + "*"))
+        return sorted(os.path.basename(d)[len(DAY_PREFIX):] for d in dirs if os.path.isdir(d))
+
+    def _parts(self, day: str) -> List[str]:
+        return sorted(glob.glob(os.path.join(self._day_dir(day), PART_PREFIX + "*")))
+
+    def _data_file(self, day: str) -> str:
+        return serializer.resolve_path(os.path.join(self._day_dir(day), DATA_FILE_NAME))
+
+    def _files(self, day: str) -> List[str]:
+        data_file = self._data_file(day)
+        return ([data_file] if os.path.exists(data_file) else []) + self._parts(day)
+
+    def append(self, rows: Iterable[Dict[str, Any]], seen_ts: int = None) -> Dict[str, int]:
+        """
+        Дописать взаимодействия, которых еще нет в хранилище
+        :param rows: Строки взаимодействий (`export_leads.INTERACTION_COLUMNS`)
+        :param seen_ts: Время запуска (день раздела для взаимодействий без времени); по умолчанию — сейчас
+        :return: Прочитано строк, новых строк, разделов с новыми строками
+        """
+        with file_lock(self.path):  # множество хешей читается и перезаписывается целиком
+            return self._append(rows, seen_ts or int(time.time()))
+
+    def _append(self, rows: Iterable[Dict[str, Any]], seen_ts: int) -> Dict[str, int]:
+        keys_file = os.path.join(self.path, KEYS_FILE_NAME)
+        known = LeadSet.load(keys_file)
+        by_day: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        new_keys = set()
+        total = 0
+        for row in rows:
+            if row["lead_id"] is None:
+                continue
+            total += 1
+            key = interaction_key(row)
+            if key in known or key in new_keys:
+                continue
+            new_keys.add(key)
+            by_day[day_of(row["timestamp"] or seen_ts)].append({**row, "seen_ts": seen_ts})
+        part_name = f"{PART_PREFIX}{time.time_ns()}_{os.getpid()}.jsonl"
+        for day, day_rows in by_day.items():
+            os.makedirs(self._day_dir(day), exist_ok=True)
+            tmp_path = serializer.compressed_path(os.path.join(self._day_dir(day), "." + part_name))
+            with serializer.open_file(tmp_path, "wb") as f:
+                for row in day_rows:
+                    f.write(serializer.dumps(row, indent=False) + b"\n")
+            # часть появляется целиком: уплотнение в другом процессе не увидит недописанный файл
+            os.replace(tmp_path, os.path.join(self._day_dir(day), os.path.basename(tmp_path)[1:]))
+        known.update(new_keys)
+        known.save(keys_file)
+        return {"rows": total, "new": len(new_keys), "days": len(by_day)}
+
+    def _load_leads(self) -> export_leads.LeadAggregator:
+        leads_file = os.path.join(self.path, LEADS_FILE_NAME)
+        if not os.path.exists(serializer.resolve_path(leads_file)):
+            return export_leads.LeadAggregator()
+        return export_leads.LeadAggregator.from_records(serializer.load(leads_file))
+
+    def leads(self) -> export_leads.LeadAggregator:
+        """
+        Агрегаты по лидам за все время (по уплотненным разделам)
+        :return: Агрегаты
+        """
+        with self._lock:
+            return self._load_leads()
+
+    def _compact_day(self, day: str, leads: export_leads.LeadAggregator) -> int:
+        parts = self._parts(day)
+        data_file = self._data_file(day)
+        has_data = os.path.exists(data_file)
+        if not parts:
+            return 0
+        seen = set()
+        added = 0
+        target = serializer.compressed_path(os.path.join(self._day_dir(day), DATA_FILE_NAME))
+        tmp_path = serializer.compressed_path(
+            os.path.join(self._day_dir(day), f".compact-{time.time_ns()}_{os.getpid()}.jsonl"))
+        with serializer.open_file(tmp_path, "wb") as f:
+            if has_data:  # уплотненные строки уже учтены в агрегатах
+                for row in serializer.iter_array(data_file):
+                    seen.add(interaction_key(row))
+                    f.write(serializer.dumps(row, indent=False) + b"\n")
+            for part in parts:
+                for row in serializer.iter_array(part):
+                    key = interaction_key(row)
+                    if key in seen:  # повтор из параллельного запуска
+                        continue
+                    seen.add(key)
+                    leads.add(row)
+                    f.write(serializer.dumps(row, indent=False) + b"\n")
+                    added += 1
+        os.replace(tmp_path, target)
+        for path in ([data_file] if has_data and data_file != target else []) + parts:  # другое сжатие раздела и слитые части
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+        return added
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Уплотнить разделы: слить части каждого дня в один файл без повторов и дополнить агрегаты по лидам
+        :return: Уплотнено разделов, добавлено строк, лидов в агрегатах
+        """
+        with file_lock(self.path):  # части и агрегаты перечитываются под замком: другой процесс мог их слить
+            leads = self._load_leads()
+            days = added = 0
+            for day in self.days():
+                with self._lock:
+                    n = self._compact_day(day, leads)
+                if n:
+                    days += 1
+                    added += n
+            with self._lock:
+                serializer.dump(leads.records(), os.path.join(self.path, LEADS_FILE_NAME), indent=False)
+        return {"days": days, "added": added, "leads": len(leads.leads)}
+
+    def start_compaction(self) -> "threading.Thread":
+        """
+        Запустить уплотнение в фоновом потоке
+        :return: Поток (результат — в атрибуте `result`)
+        """
+        thread = threading.Thread(target=lambda: setattr(thread, "result", self.compact()), name="history-compaction")
+        thread.start()
+        return thread
+
+    def iter_rows(self, since_ts: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Читать взаимодействия начиная с дня `since_ts`
+        :param since_ts: Начало периода (unix timestamp); 0 — все разделы
+        :return: Строки взаимодействий без повторов
+        """
+        first_day = day_of(since_ts) if since_ts else ""
+        for day in self.days():
+            if day < first_day:  # дни сравниваются как строки ГГГГ-ММ-ДД, старые разделы не открываются
+                continue
+            seen = set()
+            with self._lock:
+                done = False
+                while not done:
+                    try:
+                        for path in self._files(day):
+                            for row in serializer.iter_array(path):
+                                key = interaction_key(row)
+                                if key not in seen:
+                                    seen.add(key)
+                                    yield row
+                        done = True
+                    except FileNotFoundError:  # части слиты уплотнением в другом процессе — раздел читается заново
+                        continue
+
+
+def main_history(ctx: RunContext = DEFAULT_CONTEXT, days: int = HISTORY_DAYS, export_format: str = FORMAT_AUTO,
+                 append: bool = True) -> Dict[str, Any]:
+    """
+    Дописать взаимодействия запуска в историю, уплотнить ее и сохранить агрегаты по лидам за последние дни
+    :param ctx: Контекст запуска (выгрузки сборщиков; хранилище — общее для всех запусков в out_dir)
+    :param days: За сколько последних дней строить отчет (0 — за все время)
+    :param export_format: auto (Parquet, если установлен pyarrow, иначе CSV), parquet или csv
+    :param append: Дописать выгрузки текущего запуска
+    :return: Сводка
+    """
+    files = ctx.makedirs().files
+    export_format = export_leads.resolve_format(export_format)
+    leads_file = os.path.splitext(files.HISTORY_LEADS)[0] + "." + export_format
+    store = InteractionStore(ctx.shared_path(HISTORY_DIR_NAME))
+    appended = store.append(export_leads.iter_interactions(ctx)) if append else {}
+    compaction = store.start_compaction()  # отчет за период читает разделы, пока уплотнение идет в фоне
+    if days:
+        leads = export_leads.LeadAggregator()
+        since_ts = int((datetime.now() - timedelta(days=days)).timestamp())
+        for row in store.iter_rows(since_ts):
+            leads.add(row)
+        compaction.join()
+    else:
+        compaction.join()  # за все время — готовые агрегаты после уплотнения
+        leads = store.leads()
+    lead_count = export_leads.write_table(leads.rows(), leads_file, export_leads.LEAD_COLUMNS, export_format,
+                                          export_leads.LEAD_SCHEMA)
+    result = {"appended": appended, "compaction": getattr(compaction, "result", {}), "days": days,
+              "leads": lead_count, "leads_file": leads_file, "store": store.path}
+    ctx.record_stage("history", **result)
+    events.info(f"{b.GREEN}История взаимодействий{b.END}: новых {appended.get('new', 0)} из {appended.get('rows', 0)}, "
+                f"лидов за {f'{days} дн.' if days else 'все время'} ({lead_count}) сохранены в {b.BLUE}{leads_file}{b.END}", event="history",
+                new=appended.get("new", 0), leads=lead_count)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сохранить взаимодействия запуска в историю и выгрузить лидов за последние дни")
+    parser.add_argument("--out_dir", help="Каталог файлов запуска", default=DEFAULT_CONTEXT.out_dir, type=str)
+    parser.add_argument("--days", help="За сколько последних дней выгрузить лидов (0 — за все время)", default=HISTORY_DAYS, type=int)
+    parser.add_argument("--format", dest="export_format", help="Формат выгрузки", default=FORMAT_AUTO, choices=FORMATS)
+    parser.add_argument("--no_append", help="Не дописывать выгрузки текущего запуска", action="store_true")
+    args = parser.parse_args()
+    main_history(RunContext(args.out_dir), args.days, args.export_format, not args.no_append)
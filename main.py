@@ -15,15 +15,30 @@ import os
 import sys
 from classes import vk_api_params
 from classes import file_params
+from classes import serializer
+from classes import events
 import classes.bcolors as b
+from classes.api_budget import ApiBudget
+from classes.engagement_index import MIN_YIELD
+from classes.group_reader import parse_shard
+from classes.run_context import RunContext, new_run_id
+from classes.rate_controller import MAX_RPS
+from classes.vk_client import POOL_SIZE, create_client
+import analytics
+import export_leads
 import generate_report
+import group_members
+import history
 import get_leads_from_wall
 import get_leads_from_photos
 import filter_groups
+import planner
+import scheduler
 import search_groups
 
 
-COMMANDS: list = ["search", "remove_old", "inspect_wall", "inspect_photos", "report"]
+API_COMMANDS: list = ["search", "remove_old", "inspect_wall", "inspect_photos", "plan", "members"]  # команды, которым нужен клиент VK API
+COMMANDS: list = ["search", "remove_old", "inspect_wall", "inspect_photos", "report", "schedule", "plan", "campaigns", "export", "analytics", "members", "history"]
 GROUPS_SEARCH_FILE: str = file_params.GROUPS_SEARCH_FILE
 OAUTH_URI: str = vk_api_params.OAUTH_URI
 API_SCOPES: str = vk_api_params.API_SCOPES
@@ -37,40 +52,90 @@ def main_py(args_):
     """
     Основная функция программы
     """
+    vk = None
+    client = None
+    budget = None
+    shard = parse_shard(args_.shard)
+    run_id = new_run_id() if args_.run_id == "auto" else args_.run_id
+    ctx = RunContext(args_.out_dir, run_id)
+    ctx.record("args", {k: v for k, v in vars(args_).items() if k != "token"})  # параметры запуска — в run.json
+    if run_id:
+        events.info(f"{b.BLUE}Каталог запуска{b.END}: {b.YELLOW}{ctx.out_dir}{b.END}")
+    if args_.RUN_FULL or args_.command in API_COMMANDS:  # все этапы работают через один клиент и делят бюджет запросов
+        budget = ApiBudget(max_calls=args_.max_calls, deadline_minutes=args_.deadline)
+        client = create_client(args_.token, budget=budget, pool_size=args_.pool_size, use_gzip=not args_.no_gzip,
+                               adaptive=not args_.fixed_rate, max_rps=args_.max_rps)
+        vk = client.get_api()
+        if args_.max_calls or args_.deadline:
+            events.info(f"{b.BLUE}Бюджет запросов{b.END}: вызовов {b.YELLOW}{args_.max_calls or '∞'}{b.END}, минут {b.YELLOW}{args_.deadline or '∞'}{b.END}")
     if args_.RUN_FULL:
-        print(f"{b.BLUE}Запущен полный цикл программы.{b.END}")
-        print(f"\n{b.BLUE}Шаг 1: Поиск групп по запросу{b.END} {b.YELLOW}{args_.search}{b.END} и не более {b.YELLOW}{args_.groups_limit}{b.END} штук.")
-        search_groups.main_search_groups(args_.token, search_query=args_.search, group_limit=args_.groups_limit, my_group_id=MY_VK_GROUP_ID, my_group_short_name=MY_VK_GROUP_SHORT_NAME)
-        print(f"\n{b.BLUE}Шаг 2: Удаление групп не публиковавших посты более{b.END} {b.YELLOW}{args_.months}{b.END} мес.")
-        filter_groups.main_filter_groups(args_.token, months_max=args_.months)
-        print(f"\n{b.BLUE}Шаг 3: Сбор лидов со стен групп за последние{b.END} {b.YELLOW}{args_.days_wall}{b.END} дней.")
-        get_leads_from_wall.main_get_leads_from_wall(args_.token, days_wall_max=args_.days_wall)
-        print(f"\n{b.BLUE}Шаг 4: Сбор лидов с фотографий групп за последние{b.END} {b.YELLOW}{args_.days_photos}{b.END} дней.")
-        get_leads_from_photos.main_get_leads_from_photos(args_.token, days=args_.days_photos)
-        print(f"\n{b.BLUE}Шаг 5: Генерация отчета по собранным лидам.{b.END}")
-        generate_report.main_generate_report()
+        events.info(f"{b.BLUE}Запущен полный цикл программы.{b.END}")
+        events.info(f"\n{b.BLUE}Шаг 1: Поиск групп по запросу{b.END} {b.YELLOW}{args_.search}{b.END} и не более {b.YELLOW}{args_.groups_limit}{b.END} штук.")
+        search_groups.main_search_groups(args_.token, search_query=args_.search, group_limit=args_.groups_limit, my_group_id=MY_VK_GROUP_ID, my_group_short_name=MY_VK_GROUP_SHORT_NAME, vk=vk, ctx=ctx,
+                                          sources=args_.sources.split(","), depth=args_.discovery_depth, max_calls=args_.discovery_calls)
+        events.info(f"\n{b.BLUE}Шаг 2: Удаление групп не публиковавших посты более{b.END} {b.YELLOW}{args_.months}{b.END} мес.")
+        filter_groups.main_filter_groups(args_.token, months_max=args_.months, vk=vk, budget=budget, ctx=ctx, shard=shard, min_yield=args_.min_yield)
+        events.info(f"\n{b.BLUE}Шаг 3: Сбор лидов со стен групп за последние{b.END} {b.YELLOW}{args_.days_wall}{b.END} дней.")
+        get_leads_from_wall.main_get_leads_from_wall(args_.token, days_wall_max=args_.days_wall, vk=vk, budget=budget, ctx=ctx, shard=shard, min_yield=args_.min_yield)
+        events.info(f"\n{b.BLUE}Шаг 4: Сбор лидов с фотографий групп за последние{b.END} {b.YELLOW}{args_.days_photos}{b.END} дней.")
+        get_leads_from_photos.main_get_leads_from_photos(args_.token, days=args_.days_photos, vk=vk, budget=budget, ctx=ctx, shard=shard, min_yield=args_.min_yield)
+        if MY_VK_GROUP_ID:  # участники своей группы исключаются из лидов
+            group_members.main_refresh_members(args_.token, MY_VK_GROUP_ID, vk=vk, ctx=ctx)
+        history.main_history(ctx=ctx, days=args_.history_days, export_format=args_.export_format)
+        events.info(f"\n{b.BLUE}Шаг 5: Генерация отчета по собранным лидам.{b.END}")
+        generate_report.main_generate_report(ctx=ctx, exclude_file=args_.exclude_file, my_group_id=MY_VK_GROUP_ID)
     else:
-        print(f"{b.BLUE}Передана команда{b.END}: {args_.command}")
+        events.info(f"{b.BLUE}Передана команда{b.END}: {args_.command}")
         if args_.command == "report":
-            print(f"{b.BLUE}Формирование отчета.")
-            generate_report.main_generate_report()
+            events.info(f"{b.BLUE}Формирование отчета.")
+            generate_report.main_generate_report(ctx=ctx, exclude_file=args_.exclude_file, my_group_id=MY_VK_GROUP_ID)
+        elif args_.command == "members":
+            if not MY_VK_GROUP_ID:
+                raise SystemExit(f"{b.RED}Для --command members укажите --my_vk_group_id{b.END}")
+            events.info(f"{b.BLUE}Обновление участников группы{b.END} {b.YELLOW}{MY_VK_GROUP_ID}{b.END} для исключения из лидов.")
+            group_members.main_refresh_members(args_.token, MY_VK_GROUP_ID, vk=vk, ctx=ctx)
+        elif args_.command == "export":
+            events.info(f"{b.BLUE}Выгрузка взаимодействий и лидов для аналитики.{b.END}")
+            export_leads.main_export(ctx=ctx, export_format=args_.export_format)
+        elif args_.command == "analytics":
+            events.info(f"{b.BLUE}Поиск лидов из нескольких групп и пересечений аудиторий групп.{b.END}")
+            analytics.main_analytics(ctx=ctx, export_format=args_.export_format, min_groups=args_.min_groups, top_pairs=args_.top_pairs)
+        elif args_.command == "history":
+            events.info(f"{b.BLUE}Сохранение взаимодействий в историю и выгрузка лидов за{b.END} {b.YELLOW}{args_.history_days or 'все'}{b.END} дней.")
+            history.main_history(ctx=ctx, days=args_.history_days, export_format=args_.export_format)
         elif args_.command == "search":
-            print(f"{b.BLUE}Запущен поиск групп по запросу{b.END} {b.YELLOW}{args_.search}{b.END} и не более {b.YELLOW}{args_.groups_limit}{b.END} штук.")
-            search_groups.main_search_groups(args_.token, search_query=args_.search, group_limit=args_.groups_limit, my_group_id=MY_VK_GROUP_ID, my_group_short_name=MY_VK_GROUP_SHORT_NAME)
+            events.info(f"{b.BLUE}Запущен поиск групп по запросу{b.END} {b.YELLOW}{args_.search}{b.END} и не более {b.YELLOW}{args_.groups_limit}{b.END} штук.")
+            search_groups.main_search_groups(args_.token, search_query=args_.search, group_limit=args_.groups_limit, my_group_id=MY_VK_GROUP_ID, my_group_short_name=MY_VK_GROUP_SHORT_NAME, vk=vk, ctx=ctx,
+                                              sources=args_.sources.split(","), depth=args_.discovery_depth, max_calls=args_.discovery_calls)
         elif args_.command == "remove_old":
-            print(f"{b.BLUE}Запущено удаление групп не публиковавших посты более{b.END} {b.YELLOW}{args_.months}{b.END} мес.")
-            filter_groups.main_filter_groups(args_.token, months_max=args_.months)
+            events.info(f"{b.BLUE}Запущено удаление групп не публиковавших посты более{b.END} {b.YELLOW}{args_.months}{b.END} мес.")
+            filter_groups.main_filter_groups(args_.token, months_max=args_.months, vk=vk, budget=budget, ctx=ctx, shard=shard, min_yield=args_.min_yield)
         elif args_.command == "inspect_wall":
-            print(f"{b.BLUE}Запущен сбор лидов со стен групп за {b.END} {b.YELLOW}{args_.days_wall}{b.END} дней.")
-            get_leads_from_wall.main_get_leads_from_wall(access_token=args_.token, days_wall_max=args_.days_wall)
+            events.info(f"{b.BLUE}Запущен сбор лидов со стен групп за {b.END} {b.YELLOW}{args_.days_wall}{b.END} дней.")
+            get_leads_from_wall.main_get_leads_from_wall(access_token=args_.token, days_wall_max=args_.days_wall, vk=vk, budget=budget, ctx=ctx, shard=shard, min_yield=args_.min_yield)
         elif args_.command == "inspect_photos":
-            print(f"{b.BLUE}Запущен сбор лидов с фотографий групп за {b.END} {b.YELLOW}{args_.days_photos}{b.END} дней.")
-            get_leads_from_photos.main_get_leads_from_photos(args_.token, days=args_.days_photos)
+            events.info(f"{b.BLUE}Запущен сбор лидов с фотографий групп за {b.END} {b.YELLOW}{args_.days_photos}{b.END} дней.")
+            get_leads_from_photos.main_get_leads_from_photos(args_.token, days=args_.days_photos, vk=vk, budget=budget, ctx=ctx, shard=shard, min_yield=args_.min_yield)
+        elif args_.command == "plan":
+            events.info(f"{b.BLUE}Запущена оценка стоимости сбора лидов (без выгрузки лайков и комментариев).{b.END}")
+            planner.main_plan(args_.token, days_wall=args_.days_wall, days_photos=args_.days_photos, vk=vk, ctx=ctx)
+        elif args_.command == "campaigns":
+            events.info(f"{b.BLUE}Запущены кампании из файла{b.END} {b.YELLOW}{args_.campaigns}{b.END} в отдельных процессах")
+            scheduler.run_campaigns_in_processes(args_.token, args_.campaigns, processes=args_.workers,
+                                                 my_group_id=MY_VK_GROUP_ID or "", my_group_short_name=MY_VK_GROUP_SHORT_NAME or "")
+        elif args_.command == "schedule":
+            events.info(f"{b.BLUE}Запущен планировщик кампаний из файла{b.END} {b.YELLOW}{args_.campaigns}{b.END}")
+            scheduler.run_scheduler(args_.token, args_.campaigns, max_workers=args_.workers, once=args_.once,
+                                    my_group_id=MY_VK_GROUP_ID or "", my_group_short_name=MY_VK_GROUP_SHORT_NAME or "")
         else:
-            print(f"{b.RED}Неизвестная команда: {args_.command}{b.END}")
-            print(f"{b.RED}Допустимые команды запуска (переменная {b.END}{b.YELLOW}--command{b.END}{b.BLUE}):{b.END}")
-            print(COMMANDS)
+            events.error(f"{b.RED}Неизвестная команда: {args_.command}{b.END}", event="unknown_command", command=args_.command)
+            events.error(f"{b.RED}Допустимые команды запуска (переменная {b.END}{b.YELLOW}--command{b.END}{b.BLUE}):{b.END} {COMMANDS}",
+                         event="unknown_command", commands=COMMANDS)
             sys.exit(1)
+    if client is not None:
+        ctx.record("vk_client", client.metrics())
+        if args_.max_calls or args_.deadline:
+            events.info(f"{b.BLUE}Расход бюджета запросов{b.END}: {budget.summary()}", event="budget", **budget.summary())
 
 
 def func(**kwargs):
@@ -85,6 +150,9 @@ if __name__ == "__main__":
     parser.add_argument("--token", help="VK access token (или через VK_TOKEN env)", default=os.getenv("VK_TOKEN"), type=str)
     parser.add_argument("--command", help="Что необходимо выполнить", default="report", type=str, choices=COMMANDS)
     parser.add_argument("--search", help="Поисковый запрос для поиска групп", default="фотограф новосибирск", type=str)
+    parser.add_argument("--sources", help="Источники групп через запятую: groups (groups.search), newsfeed (newsfeed.search), related (связанные группы)", default=",".join(search_groups.DEFAULT_SOURCES), type=str)
+    parser.add_argument("--discovery_depth", help="Глубина расширения по связанным группам", default=search_groups.DISCOVERY_DEPTH, type=int)
+    parser.add_argument("--discovery_calls", help="Бюджет запросов поиска групп (0 — без ограничения)", default=search_groups.DISCOVERY_MAX_CALLS, type=int)
     parser.add_argument("--days_wall", help="Количество дней для анализа стен", default=15, type=int)
     parser.add_argument("--days_photos", help="Количество дней для анализа фотографий групп ", default=15, type=int)
     parser.add_argument("--months", help="Количество месяцев при котором группу считать неактивной", default=3, type=int)
@@ -93,17 +161,42 @@ if __name__ == "__main__":
     parser.add_argument("--report", help="Генерирует отчет по собранным лидам", default=False, type=bool)
     parser.add_argument("--my_vk_group_id", help="Id вашей группы в VK для исключения из анализа", type=str)
     parser.add_argument("--my_vk_group_short_name", help="Короткое имя вашей группы в VK для исключения из анализа", type=str)
+    parser.add_argument("--compress", help="Сжатие JSON файлов в reports/", default="", type=str, choices=["", "gz", "zst"])
+    parser.add_argument("--campaigns", help="JSON файл со списком кампаний для планировщика (--command schedule)", default="campaigns.json", type=str)
+    parser.add_argument("--workers", help="Сколько кампаний обрабатывать одновременно (потоков планировщика или процессов --command campaigns)", default=scheduler.MAX_WORKERS, type=int)
+    parser.add_argument("--once", help="Планировщик выполняет созревшие кампании один раз и завершается", action="store_true")
+    parser.add_argument("--max-calls", dest="max_calls", help="Максимум вызовов VK API за запуск (0 — без ограничения)", default=0, type=int)
+    parser.add_argument("--deadline", help="Максимальное время работы в минутах (0 — без ограничения)", default=0, type=float)
+    parser.add_argument("--pool_size", help="Размер пула keep-alive соединений к VK API", default=POOL_SIZE, type=int)
+    parser.add_argument("--no_gzip", help="Не запрашивать сжатые ответы VK API", action="store_true")
+    parser.add_argument("--max_rps", help="Верхняя граница адаптивного темпа запросов к VK API в секунду", default=MAX_RPS, type=float)
+    parser.add_argument("--fixed_rate", help="Не подбирать темп запросов: один запрос за API_SLEEP секунд", action="store_true")
+    parser.add_argument("--min_yield", help="Не обходить группы с ожидаемым выходом лидов (взаимодействий в день по последним постам) ниже порога (0 — не отбрасывать)", default=MIN_YIELD, type=float)
+    parser.add_argument("--exclude_file", help="Файл лидов-исключений для отчета о новых лидах (id или ссылки построчно)", default=None, type=str)
+    parser.add_argument("--shard", help="Обрабатывать только шард i/n списка групп (например, 0/4)", default="", type=str)
+    parser.add_argument("--export_format", help="Формат --command export, analytics и history: auto (Parquet, если установлен pyarrow, иначе CSV), parquet или csv", default=export_leads.FORMAT_AUTO, type=str, choices=export_leads.FORMATS)
+    parser.add_argument("--min_groups", help="--command analytics: минимум групп, в которых активен лид", default=analytics.MIN_GROUPS, type=int)
+    parser.add_argument("--top_pairs", help="--command analytics: сколько пар групп с наибольшей общей аудиторией сохранить (0 — все)", default=analytics.TOP_PAIRS, type=int)
+    parser.add_argument("--history_days", help="--command history: за сколько последних дней выгрузить лидов из истории (0 — за все время)", default=history.HISTORY_DAYS, type=int)
+    parser.add_argument("--out_dir", help="Каталог файлов запуска", default=file_params.REPORTS_DIR, type=str)
+    parser.add_argument("--log", help="Вывод: text (для человека), quiet (только предупреждения и ошибки), json (события строками JSON для демонов и cron)", default=events.MODE_TEXT, type=str, choices=events.MODES)
+    parser.add_argument("--log_level", help="Минимальный уровень событий", default=events.INFO, type=str, choices=list(events.LEVELS))
+    parser.add_argument("--progress_interval", help="Секунд между выводами строки прогресса", default=events.PROGRESS_INTERVAL, type=float)
+    parser.add_argument("--run_id", help="Идентификатор запуска: файлы пишутся в <out_dir>/<run_id>; auto — сгенерировать", default="", type=str)
     args = parser.parse_args()
+    serializer.set_default_compression(args.compress)
+    events.configure(args.log, args.log_level, args.progress_interval)
     if hasattr(args, "my_vk_group_id"):
         MY_VK_GROUP_ID = args.my_vk_group_id
     if hasattr(args, "my_vk_group_short_name"):
         MY_VK_GROUP_SHORT_NAME = args.my_vk_group_short_name
-    print(f"{b.GREEN}Информация о программе:{b.END}")
-    parser.print_help()
-    print(f"{b.BLUE}Как получить токен (`--token`)?{b.END}: перейти по ссылке {b.YELLOW}{LINK}{b.END}")
-    print(f"авторизоваться, скопировать токен из адресной строки браузера после {b.YELLOW}access_token={b.END}")
-    print("Он очень длинный")
-    print(f"{b.RED}Токен конфиденциален, не храните его в открытом где-либо!!!{b.END}")
-    print("https://github.com/sergiomarotco/vk_lead_searcher")
-    print(f"{b.GREEN}------------------------------------------------{b.END}")
+    if args.log == events.MODE_TEXT:  # справка — только для человека, не для демонов и cron
+        print(f"{b.GREEN}Информация о программе:{b.END}")
+        parser.print_help()
+        print(f"{b.BLUE}Как получить токен (`--token`)?{b.END}: перейти по ссылке {b.YELLOW}{LINK}{b.END}")
+        print(f"авторизоваться, скопировать токен из адресной строки браузера после {b.YELLOW}access_token={b.END}")
+        print("Он очень длинный")
+        print(f"{b.RED}Токен конфиденциален, не храните его в открытом где-либо!!!{b.END}")
+        print("https://github.com/sergiomarotco/vk_lead_searcher")
+        print(f"{b.GREEN}------------------------------------------------{b.END}")
     main_py(args)
@@ -0,0 +1,247 @@
+"""
+planner.py
+
+Модуль планирования сбора лидов в рамках бюджета запросов к VK API.
+
+Содержит:
+- Оценку числа вызовов и времени этапов по счетчикам постов и фото (пробный запуск).
+- Задачи выгрузки лайков и комментариев, упорядоченные по числу лидов на вызов.
+
+Автор: sergiomarotco, https://github.com/sergiomarotco/vk_lead_searcher
+Дата: 2026-10-19
+"""
+import argparse
+import math
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+from classes import vk_api_params as vk_p, bcolors as b, file_params as f_p, serializer, events
+from classes.api_budget import ApiBudget
+from classes.group_reader import GroupReader
+from classes.negative_cache import NEGATIVE_CACHE_FILE_NAME, SCOPE_PHOTOS, SCOPE_WALL, NegativeCache
+from classes.retry_queue import RetryQueue
+from classes.run_context import RunContext, DEFAULT_CONTEXT
+from classes.vk_client import create_client
+from classes.paginator import calls_needed
+import get_leads_from_wall
+import get_leads_from_photos
+
+
+CALL_LATENCY = 0.1  # средняя задержка ответа API в секундах, добавляется к паузе между запросами
+SECONDS_PER_CALL = vk_p.API_SLEEP + CALL_LATENCY
+WALL_PAGE = get_leads_from_wall.REQUEST_COUNT  # размер страницы комментариев стены
+LIKES_PAGE = get_leads_from_wall.LIKES_PAGE
+PHOTOS_PAGE = 100  # размер страницы photos.getComments
+
+
+def calls_for(count: int, page: int) -> int:
+    """
+    Количество вызовов для выгрузки списка постранично
+    :param count: Размер списка
+    :param page: Размер страницы
+    :return: Количество вызовов
+    """
+    return math.ceil(count / page) if count > 0 else 0
+
+
+def build_wall_tasks(posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Построить задачи выгрузки лайков и комментариев постов, упорядоченные по выгоде
+    :param posts: Посты со стен групп (как возвращает `get_leads_from_wall.get_posts`)
+    :return: Задачи: вид, пост, оценка вызовов и лидов; первыми идут задачи с наибольшим числом лидов на вызов
+    """
+    tasks = []
+    for p in posts:
+        raw = p.get("raw", {})
+        comments = raw.get("comments", {}).get("count", 0)
+        if comments > 0:
+            tasks.append({"kind": "comments", "post": p, "calls": calls_for(comments, WALL_PAGE), "leads": comments})
+        likes = raw.get("likes", {}).get("count", 0)
+        if likes > 0:  # страницы лайков после первой упаковываются в execute
+            tasks.append({"kind": "likes", "post": p, "calls": calls_needed(likes, LIKES_PAGE), "leads": likes})
+    tasks.sort(key=lambda t: (t["leads"] / t["calls"], t["leads"]), reverse=True)
+    return tasks
+
+
+def build_photo_tasks(photos: List[Tuple[int, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Построить задачи выгрузки комментариев и лайков фото, упорядоченные по выгоде
+    :param photos: Пары (id владельца, фото из ответа `photos.getAll` с `extended=1`)
+    :return: Задачи: владелец, фото, оценка вызовов и лидов; первыми идут задачи с наибольшим числом лидов на вызов
+    """
+    tasks = []
+    for owner_id, photo in photos:
+        comments = get_leads_from_photos.photo_count(photo, "comments")
+        likes = get_leads_from_photos.photo_count(photo, "likes")
+        calls = calls_for(comments, PHOTOS_PAGE) + (calls_needed(likes, LIKES_PAGE) if likes > 0 else 0)
+        if calls:
+            tasks.append({"owner_id": owner_id, "photo": photo, "calls": calls, "leads": comments + likes})
+    tasks.sort(key=lambda t: (t["leads"] / t["calls"], t["leads"]), reverse=True)
+    return tasks
+
+
+def estimate_wall(posts: List[Dict[str, Any]], wall_calls: int = 0) -> Dict[str, Any]:
+    """
+    Оценить стоимость этапа сбора лидов со стен
+    :param posts: Посты в окне анализа
+    :param wall_calls: Сколько вызовов `wall.get` уже потрачено на получение постов
+    :return: Оценка вызовов, времени и лидов
+    """
+    tasks = build_wall_tasks(posts)
+    calls = {"wall.get": wall_calls, "wall.getComments": 0, "likes.getList": 0}
+    leads = 0
+    for t in tasks:
+        calls["wall.getComments" if t["kind"] == "comments" else "likes.getList"] += t["calls"]
+        leads += t["leads"]
+    total = sum(calls.values())
+    return {"posts": len(posts), "calls": calls, "total_calls": total,
+            "seconds": round(total * SECONDS_PER_CALL), "expected_leads": leads}
+
+
+def estimate_photos(photos_by_group: Dict[int, List[Dict[str, Any]]], scan_calls: int = 0) -> Dict[str, Any]:
+    """
+    Оценить стоимость этапа сбора лидов с фотографий по счетчикам фото в окне анализа
+    :param photos_by_group: Фото в окне анализа по id группы (как возвращает `get_leads_from_photos.scan_owner_photos`)
+    :param scan_calls: Сколько вызовов `photos.getAll` уже потрачено
+    :return: Оценка вызовов, времени и лидов
+    """
+    photos = [photo for group_photos in photos_by_group.values() for photo in group_photos]
+    comments = [get_leads_from_photos.photo_count(photo, "comments") for photo in photos]
+    likes = [get_leads_from_photos.photo_count(photo, "likes") for photo in photos]
+    calls = {
+        "photos.getAll": scan_calls,
+        "photos.getComments": sum(calls_for(c, PHOTOS_PAGE) for c in comments),
+        "likes.getList": sum(calls_needed(n, LIKES_PAGE) for n in likes if n > 0),
+    }
+    total = sum(calls.values())
+    return {"photos": len(photos), "calls": calls, "total_calls": total,
+            "seconds": round(total * SECONDS_PER_CALL), "expected_leads": sum(comments) + sum(likes)}
+
+
+def run_wall_tasks(vk, tasks: List[Dict[str, Any]], budget: ApiBudget, retry: RetryQueue = None,
+                   since_ts: int = 0) -> Tuple[list, list, int]:
+    """
+    Выполнить задачи стены в порядке приоритета в рамках бюджета
+    :param vk: VK API объект
+    :param tasks: Задачи из `build_wall_tasks`
+    :param budget: Бюджет запросов
+    :param retry: Очередь повторов: неудавшиеся запросы повторяются после всех задач, пока бюджет не исчерпан
+    :param since_ts: Начало окна анализа: более старые комментарии не запрашиваются
+    :return: Комментарии, лайки и количество пропущенных из-за бюджета задач
+    """
+    all_comments, all_likes = [], []
+    skipped = 0
+    with events.Progress("Задачи стены", total=len(tasks), unit=" задач", name="plan_wall") as progress:
+        for t in tasks:
+            if not budget.can_afford(t["calls"]):
+                skipped += 1
+                progress.update(skipped=1)
+                continue  # дорогую задачу пропускаем, более дешевые после нее еще могут поместиться
+            p = t["post"]
+            try:
+                if t["kind"] == "comments":
+                    comments = get_leads_from_wall.fetch_comments_for_post(vk, p["owner_id"], p["post_id"], retry, all_comments.extend,
+                                                                           since_ts=since_ts)
+                    all_comments.extend(comments)
+                    progress.update(comments=len(comments))
+                else:
+                    likes = get_leads_from_wall.fetch_likes_from_post(vk, p["owner_id"], p["post_id"], retry, all_likes.extend)
+                    all_likes.extend(likes)
+                    progress.update(likes=len(likes))
+            except Exception as e:
+                progress.update(errors=1)
+                events.emit("task_error", f"Ошибка задачи {t['kind']} для поста {p['post_id']}: {b.RED}{e}{b.END}",
+                            events.DEBUG, kind=t["kind"], post_id=p["post_id"], error=str(e))
+        if retry is not None and len(retry):
+            found = len(all_comments), len(all_likes)
+            recovered = retry.drain(budget)
+            progress.update(0, recovered=recovered, comments=len(all_comments) - found[0], likes=len(all_likes) - found[1])
+    if skipped:
+        events.warning(f"{b.YELLOW}Бюджет исчерпан{b.END}: пропущено задач {skipped} из {len(tasks)}",
+                       event="budget_exhausted", stage="wall_tasks", skipped=skipped, tasks=len(tasks))
+    return all_comments, all_likes, skipped
+
+
+def print_estimate(title: str, estimate: Dict[str, Any]) -> None:
+    """
+    Вывести оценку этапа
+    :param title: Название этапа
+    :param estimate: Оценка
+    """
+    minutes = estimate["seconds"] / 60
+    lines = [f"{b.BLUE}{title}{b.END}: вызовов {b.YELLOW}{estimate['total_calls']}{b.END}, ~{b.YELLOW}{minutes:.1f}{b.END} мин."]
+    lines += [f"  {method}: {calls}" for method, calls in estimate["calls"].items()]
+    if "expected_leads" in estimate:
+        lines.append(f"  ожидаемо взаимодействий: {estimate['expected_leads']}")
+    events.info("\n".join(lines), event="plan_estimate", stage=title, total_calls=estimate["total_calls"],
+                seconds=estimate["seconds"], calls=estimate["calls"], expected_leads=estimate.get("expected_leads"))
+
+
+def main_plan(access_token: str, file: str = None, days_wall: int = 15, days_photos: int = 15,
+              vk=None, ctx: RunContext = DEFAULT_CONTEXT) -> Dict[str, Any]:
+    """
+    Пробный запуск: сделать только дешевые запросы со счетчиками и оценить стоимость сбора лидов
+    :param access_token: VK access token
+    :param file: Файл с актуальными группами (по умолчанию — в каталоге запуска)
+    :param days_wall: Количество дней для анализа стен
+    :param days_photos: Количество дней для анализа фотографий
+    :param vk: Готовый объект VK API; если не передан — создается новая сессия
+    :param ctx: Контекст запуска (каталог и пути файлов)
+    :return: План: оценки этапов
+    """
+    files = ctx.makedirs().files
+    file = file or files.GROUPS_SEARCH_ACTUAL_FILE
+    if vk is None:
+        vk = create_client(access_token).get_api()
+    groups = list(GroupReader(file))  # оценка обходит группы дважды (стены и альбомы)
+
+    cutoff = int(time.time()) - days_wall * 24 * 60 * 60
+    # группы из негативного кэша не стоят запросов — в оценку не входят
+    neg_cache = NegativeCache.load(ctx.shared_path(NEGATIVE_CACHE_FILE_NAME))
+    wall_groups = [g for g in groups if not neg_cache.blocked(g["id"], SCOPE_WALL)]
+    posts = get_leads_from_wall.get_posts(wall_groups, vk, cutoff)
+    posts_per_group = Counter(p["group"]["id"] for p in posts)
+    # +1: последняя страница содержит и первый пост старше окна
+    wall_calls = sum(calls_needed(posts_per_group[g["id"]] + 1, get_leads_from_wall.POSTS_PAGE,
+                                  get_leads_from_wall.POSTS_PAGES_PER_CALL) for g in wall_groups)
+
+    since_ts = get_leads_from_photos.unix_days_ago(days_photos)
+    photos_by_group: Dict[int, List[Dict[str, Any]]] = {}
+    for g in groups:
+        if neg_cache.blocked(g["id"], SCOPE_PHOTOS):
+            continue
+        try:
+            photos_by_group[g["id"]] = get_leads_from_photos.scan_owner_photos(vk, -g["id"], since_ts)
+        except Exception as e:
+            events.emit("group_error", f"Ошибка получения фото группы {g['id']}: {b.RED}{e}{b.END}", events.DEBUG,
+                        group_id=g["id"], error=str(e))
+    # +1: последняя страница содержит и первое фото старше окна
+    scan_calls = sum(calls_needed(len(photos) + 1, get_leads_from_photos.PHOTOS_PAGE,
+                                  get_leads_from_photos.PHOTOS_PAGES_PER_CALL) for photos in photos_by_group.values())
+
+    plan = {
+        "created": int(time.time()),
+        "groups": len(groups),
+        "wall": estimate_wall(posts, wall_calls),
+        "photos": estimate_photos(photos_by_group, scan_calls),
+    }
+    plan["total_calls"] = plan["wall"]["total_calls"] + plan["photos"]["total_calls"]
+    plan["seconds"] = round(plan["total_calls"] * SECONDS_PER_CALL)
+    print_estimate("Стены", plan["wall"])
+    print_estimate("Фотографии", plan["photos"])
+    plan_file = serializer.dump(plan, files.PLAN_FILE)
+    events.info(f"{b.GREEN}Итого{b.END}: вызовов {plan['total_calls']}, ~{plan['seconds'] / 60:.1f} мин.\n"
+                f"План сохранен в {b.BLUE}{plan_file}{b.END}", event="plan", total_calls=plan["total_calls"],
+                seconds=plan["seconds"], plan_file=plan_file)
+    return plan
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Оценить стоимость сбора лидов VK (пробный запуск)")
+    parser.add_argument("--token", "-t", help="VK access token (или через VK_TOKEN env)", default=os.getenv("VK_TOKEN"))
+    parser.add_argument("--in", "-in", dest="infile", help="Файл с группами", default=f_p.GROUPS_SEARCH_ACTUAL_FILE)
+    parser.add_argument("--days_wall", type=int, help="Количество дней для анализа стен", default=15)
+    parser.add_argument("--days_photos", type=int, help="Количество дней для анализа фотографий", default=15)
+    args = parser.parse_args()
+    main_plan(args.token, args.infile, args.days_wall, args.days_photos)
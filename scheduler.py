@@ -0,0 +1,263 @@
+"""
+scheduler.py
+
+Модуль планировщика кампаний с периодическим пересканированием.
+
+Содержит:
+- Загрузку кампаний из JSON файла и хранение их состояния между запусками.
+- Цикл планировщика и однократный запуск кампаний в отдельных процессах.
+
+Пример файла кампаний:
+[{"name": "photo_nsk", "query": "фотограф новосибирск", "days_wall": 15, "interval_hours": 24, "search_every": 7}]
+
+Автор: sergiomarotco, https://github.com/sergiomarotco/vk_lead_searcher
+Дата: 2026-10-19
+"""
+import argparse
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Dict, List
+from classes import vk_api_params as vk_p, bcolors as b, file_params as f_p, serializer, events
+from classes.run_context import RunContext
+from classes.rate_controller import MAX_RPS
+from classes.vk_client import POOL_SIZE, VkClient
+import filter_groups
+import generate_report
+import group_members
+import get_leads_from_photos
+import get_leads_from_wall
+import history
+import search_groups
+
+
+STATE_FILE_NAME = "scheduler_state.json"  # файл состояния в каталоге кампании
+DEFAULT_INTERVAL_HOURS = 24  # интервал пересканирования кампании
+DEFAULT_SEARCH_EVERY = 7  # поиск групп заново раз в N сканирований
+IDLE_SLEEP_MAX = 300  # максимальная пауза цикла планировщика в секундах
+MAX_WORKERS = 2  # сколько кампаний обрабатывать одновременно
+
+
+class Campaign:
+    """Класс кампании планировщика.
+    Описание:
+
+        - хранит параметры кампании, ее каталог отчетов и состояние между запусками.
+    """
+
+    def __init__(self, name: str, query: str, days_wall: int = 15, days_photos: int = 15, months: int = 3,
+                 groups_limit: int = 20, interval_hours: float = DEFAULT_INTERVAL_HOURS,
+                 search_every: int = DEFAULT_SEARCH_EVERY, out_dir: str = "", token: str = ""):
+        self.name = name
+        self.query = query
+        self.days_wall = days_wall
+        self.days_photos = days_photos
+        self.months = months
+        self.groups_limit = groups_limit
+        self.interval_hours = interval_hours
+        self.search_every = max(1, search_every)
+        self.token = token  # свой токен кампании; если не задан — используется общий
+        self.ctx = RunContext(out_dir or os.path.join(f_p.REPORTS_DIR, name))
+        self.state_file = self.ctx.path(STATE_FILE_NAME)
+        self.state: Dict[str, Any] = {"last_run_ts": 0, "scans": 0, "last_error": ""}
+        if os.path.exists(serializer.resolve_path(self.state_file)):
+            self.state.update(serializer.load(self.state_file))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Campaign":
+        """
+        Создать кампанию из словаря (элемента файла кампаний)
+        :param data: Параметры кампании
+        :return: Кампания
+        """
+        if "query" not in data:
+            raise ValueError(f"У кампании {data} не задан `query`")
+        name = data.get("name") or data["query"].replace(" ", "_")
+        params = {k: v for k, v in data.items() if k not in ("name", "query")}
+        return cls(name, data["query"], **params)
+
+    def next_run_ts(self) -> float:
+        """
+        Время следующего запуска кампании
+        :return: unix timestamp
+        """
+        return self.state["last_run_ts"] + self.interval_hours * 3600
+
+    def needs_search(self) -> bool:
+        """
+        Нужно ли в этом сканировании заново искать группы (сбор лидов повторяется каждый раз)
+        :return: True, если пора обновить список групп или его еще нет
+        """
+        if not os.path.exists(serializer.resolve_path(self.ctx.files.GROUPS_SEARCH_FILE)):
+            return True
+        return self.state["scans"] % self.search_every == 0
+
+    def save_state(self) -> None:
+        """
+        Сохранить состояние кампании в ее каталог
+        """
+        serializer.dump(self.state, self.state_file)
+
+
+def load_campaigns(path: str) -> List[Campaign]:
+    """
+    Загрузить кампании из JSON файла
+    :param path: Путь к файлу со списком кампаний
+    :return: Кампании
+    """
+    data = serializer.load(path)
+    items = data.get("campaigns") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise SystemExit(f"Файл {b.BLUE}{path}{b.END} не содержит список кампаний")
+    campaigns = [Campaign.from_dict(item) for item in items]
+    names = [c.ctx.out_dir for c in campaigns]
+    if len(names) != len(set(names)):
+        raise SystemExit(f"{b.RED}У кампаний совпадают каталоги отчетов{b.END}: {names}")
+    return campaigns
+
+
+def run_campaign(campaign: Campaign, vk, my_group_id: str = "", my_group_short_name: str = "") -> None:
+    """
+    Выполнить одно сканирование кампании
+    :param campaign: Кампания
+    :param vk: Общий объект VK API
+    :param my_group_id: Id вашей группы в VK для исключения из анализа
+    :param my_group_short_name: Короткое имя вашей группы в VK для исключения из анализа
+    """
+    ctx = campaign.ctx.makedirs()
+    started = time.time()
+    events.info(f"\n{b.BLUE}Кампания{b.END} {b.YELLOW}{campaign.name}{b.END}: сканирование №{campaign.state['scans'] + 1}",
+                event="campaign_start", campaign=campaign.name, scan=campaign.state["scans"] + 1)
+    try:
+        if campaign.needs_search():
+            search_groups.main_search_groups(None, my_group_id, my_group_short_name, search_query=campaign.query,
+                                             group_limit=campaign.groups_limit, vk=vk, ctx=ctx)
+        filter_groups.main_filter_groups(None, months_max=campaign.months, vk=vk, ctx=ctx)
+        get_leads_from_wall.main_get_leads_from_wall(None, days_wall_max=campaign.days_wall, vk=vk, ctx=ctx)
+        get_leads_from_photos.main_get_leads_from_photos(None, days=campaign.days_photos, vk=vk, ctx=ctx)
+        history.main_history(ctx=ctx)
+        if my_group_id:  # участники своей группы исключаются из лидов
+            group_members.main_refresh_members(None, my_group_id, vk=vk, ctx=ctx)
+        generate_report.main_generate_report(ctx=ctx, my_group_id=my_group_id)
+        campaign.state["scans"] += 1
+        campaign.state["last_error"] = ""
+    except (Exception, SystemExit) as e:  # ошибка одной кампании не должна останавливать планировщик
+        campaign.state["last_error"] = str(e)
+        events.error(f"{b.RED}Кампания {campaign.name} завершилась ошибкой{b.END}: {e}", event="campaign_error",
+                     campaign=campaign.name, error=str(e))
+    campaign.state["last_run_ts"] = started
+    campaign.save_state()
+
+
+def _run_campaign_process(data: Dict[str, Any], access_token: str, rps_delay: float, max_rps: float,
+                          my_group_id: str, my_group_short_name: str) -> Dict[str, Any]:
+    """
+    Выполнить кампанию в отдельном процессе со своей сессией VK API
+    :param data: Параметры кампании (элемент файла кампаний)
+    :param access_token: VK access token кампании
+    :param rps_delay: Пауза между запросами для этой сессии
+    :param max_rps: Верхняя граница адаптивного темпа запросов для этой сессии
+    :param my_group_id: Id вашей группы в VK для исключения из анализа
+    :param my_group_short_name: Короткое имя вашей группы в VK для исключения из анализа
+    :return: Состояние кампании после сканирования
+    """
+    campaign = Campaign.from_dict(data)
+    client = VkClient(access_token, rps_delay=rps_delay, max_rps=max_rps)
+    run_campaign(campaign, client.get_api(), my_group_id, my_group_short_name)
+    campaign.ctx.record("vk_client", client.metrics())
+    return {"name": campaign.name, "out_dir": campaign.ctx.out_dir, **campaign.state}
+
+
+def run_campaigns_in_processes(access_token: str, campaigns_file: str, processes: int = MAX_WORKERS,
+                               my_group_id: str = "", my_group_short_name: str = "") -> List[Dict[str, Any]]:
+    """
+    Однократно выполнить все кампании из файла, каждую в отдельном процессе и в своем каталоге отчетов
+    :param access_token: Общий VK access token (для кампаний без собственного `token`)
+    :param campaigns_file: JSON файл со списком кампаний
+    :param processes: Сколько процессов запускать одновременно
+    :param my_group_id: Id вашей группы в VK для исключения из анализа
+    :param my_group_short_name: Короткое имя вашей группы в VK для исключения из анализа
+    :return: Состояния кампаний после сканирования
+    """
+    campaigns = load_campaigns(campaigns_file)
+    items = serializer.load(campaigns_file)
+    items = items.get("campaigns") if isinstance(items, dict) else items
+    tokens = [c.token or access_token for c in campaigns]
+    if not all(tokens):
+        raise SystemExit("Требуется VK token через --token, переменную окружения VK_TOKEN или поле `token` кампании")
+    processes = max(1, min(processes, len(campaigns)))
+    # процессы с одним и тем же токеном делят его лимит запросов: увеличиваем паузу и делим верхнюю границу темпа
+    per_token = Counter(tokens)
+    events.info(f"{b.GREEN}Запуск кампаний в процессах{b.END}: кампаний {len(campaigns)}, процессов {processes}",
+                event="campaigns_start", campaigns=len(campaigns), processes=processes)
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_run_campaign_process, data, token, vk_p.API_SLEEP * min(per_token[token], processes),
+                               MAX_RPS / min(per_token[token], processes), my_group_id, my_group_short_name)
+                   for data, token in zip(items, tokens)]
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            status = f"{b.RED}ошибка: {result['last_error']}{b.END}" if result["last_error"] else f"{b.GREEN}готово{b.END}"
+            events.emit("campaign_done", f"Кампания {b.YELLOW}{result['name']}{b.END} ({result['out_dir']}): {status}",
+                        events.ERROR if result["last_error"] else events.INFO, campaign=result["name"],
+                        out_dir=result["out_dir"], error=result["last_error"])
+    return results
+
+
+def run_scheduler(access_token: str, campaigns_file: str, max_workers: int = MAX_WORKERS, once: bool = False,
+                  my_group_id: str = "", my_group_short_name: str = "") -> None:
+    """
+    Запустить планировщик кампаний
+    :param access_token: VK access token
+    :param campaigns_file: JSON файл со списком кампаний
+    :param max_workers: Сколько кампаний обрабатывать одновременно
+    :param once: Выполнить только созревшие кампании и завершиться
+    :param my_group_id: Id вашей группы в VK для исключения из анализа
+    :param my_group_short_name: Короткое имя вашей группы в VK для исключения из анализа
+    """
+    if not access_token:
+        raise SystemExit("Требуется VK token через --token или переменную окружения VK_TOKEN")
+    campaigns = load_campaigns(campaigns_file)
+    # один клиент на все кампании: он выдерживает общий темп запросов,
+    # поэтому кампании делят один лимит запросов и один пул HTTP соединений
+    client = VkClient(access_token, pool_size=max(max_workers, POOL_SIZE))
+    vk = client.get_api()
+    events.info(f"{b.GREEN}Планировщик запущен{b.END}: кампаний {len(campaigns)}, потоков {max_workers}",
+                event="scheduler_start", campaigns=len(campaigns), workers=max_workers)
+
+    running: Dict[Any, Campaign] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            now = time.time()
+            busy = set(running.values())
+            due = [c for c in campaigns if c not in busy and c.next_run_ts() <= now]
+            due.sort(key=lambda c: c.next_run_ts())  # самые просроченные — первыми
+            for campaign in due:
+                running[pool.submit(run_campaign, campaign, vk, my_group_id, my_group_short_name)] = campaign
+
+            if once and not due and not running:
+                break
+            if running:
+                idle = [c for c in campaigns if c not in running.values()]
+                timeout = min([max(0.0, c.next_run_ts() - time.time()) for c in idle] + [IDLE_SLEEP_MAX])
+                done, _ = wait(list(running), timeout=None if once else timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+            elif once:
+                break
+            else:
+                sleep_for = min(max(0.0, c.next_run_ts() - time.time()) for c in campaigns)
+                time.sleep(min(sleep_for, IDLE_SLEEP_MAX))
+    events.info(f"{b.GREEN}Планировщик остановлен{b.END}", event="scheduler_stop")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Планировщик кампаний поиска лидов VK")
+    parser.add_argument("--token", "-t", help="VK access token (или через VK_TOKEN env)", default=os.getenv("VK_TOKEN"))
+    parser.add_argument("--campaigns", "-c", help="JSON файл со списком кампаний", required=True)
+    parser.add_argument("--workers", "-w", type=int, help="Сколько кампаний обрабатывать одновременно", default=MAX_WORKERS)
+    parser.add_argument("--once", action="store_true", help="Выполнить созревшие кампании один раз и завершиться")
+    args = parser.parse_args()
+    run_scheduler(args.token, args.campaigns, max_workers=args.workers, once=args.once)
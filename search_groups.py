@@ -5,48 +5,241 @@ search_groups.py
 
 Содержит:
 - Функции для поиска групп, загрузки и сохранения результатов в файл.
+- Источники групп: поиск по названию (`groups.search`), поиск постов (`newsfeed.search`)
+  и расширение по связанным группам (группы, чьи посты репостят уже найденные группы).
+- Общий приемник групп с дедупликацией по id: источники работают одновременно и останавливаются,
+  как только набрано `group_limit` групп или исчерпан бюджет запросов поиска.
 
 Автор: sergiomarotco, https://github.com/sergiomarotco/vk_lead_searcher
 Дата: 2025-01-10
 """
 import argparse
 import datetime
-import json
 import os
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterable, List, Optional
 from vk_api import VkApiError
-import vk_api
-from classes import vk_api_params as vk_p, bcolors as b, file_params as file_p
+from classes import vk_api_params as vk_p, bcolors as b, file_params as file_p, serializer, events
+from classes.api_budget import ApiBudget
+from classes.run_context import RunContext, DEFAULT_CONTEXT
+from classes.vk_client import VkClient
 
 
 API_SLEEP = vk_p.API_SLEEP * 2  # пауза между запросами, х2 на всякий случай
-BATCH_SIZE = 10  # сколько групп за один запрос
+BATCH_SIZE = 1000  # сколько групп за один запрос (максимальный count метода groups.search)
 GROUPS_SEARCH_FILE = file_p.GROUPS_SEARCH_FILE
+NEWSFEED_PAGE = 200  # максимальный count метода newsfeed.search
+NEWSFEED_PAGES = 5  # сколько страниц постов просматривать
+RELATED_POSTS = 100  # сколько последних постов группы просматривать в поисках репостов
+DISCOVERY_DEPTH = 1  # глубина расширения по связанным группам (0 — без расширения)
+DISCOVERY_MAX_CALLS = 50  # бюджет запросов дополнительных источников (0 — без ограничения); поиск по названию в него не упирается
+GROUP_FIELDS = "members_count"  # поля групп в ответах поиска: число участников нужно индексу вовлеченности
 
-def search_groups(vk, search_query: str, group_limit: int) -> List[Dict[str, Any]]:
+
+class GroupSink:
+    """Класс приемника найденных групп.
+    Описание:
+
+        - источники добавляют группы по мере получения (`add`), повторы по id отбрасываются;
+        - прием прекращается, когда набрано `limit` групп (`full`);
+        - источник связанных групп читает найденные группы как затравку (`seed`), ожидая новые,
+          пока работают остальные источники.
     """
-    Выполнить поиск групп по фразе
-    :param vk: объект класса vk
-    :param search_query: фраза для поиска групп
-    :param group_limit: количество групп в результате поиска
-    :return: группы
+
+    def __init__(self, limit: int, exclude_ids: Iterable[int] = ()):
+        self.limit = limit
+        self.groups: List[Dict[str, Any]] = []
+        self.ids = set(exclude_ids)
+        self.by_source: Counter = Counter()
+        self.producers = 0  # сколько источников (кроме связанных групп) еще работает
+        self.calls = 0  # сколько запросов потрачено источниками
+        self._cond = threading.Condition()
+
+    def full(self) -> bool:
+        return len(self.groups) >= self.limit
+
+    def add(self, groups: Iterable[Dict[str, Any]], source: str, depth: int = 0) -> bool:
+        """
+        Добавить найденные группы
+        :param groups: Группы из ответа API
+        :param source: Название источника
+        :param depth: Глубина расширения, на которой группа найдена
+        :return: True, если группы еще нужны
+        """
+        with self._cond:
+            for g in groups:
+                if self.full():
+                    break
+                gid = g.get("id")
+                if gid is None or gid in self.ids:
+                    continue
+                self.ids.add(gid)
+                self.groups.append({**g, "source": source, "depth": depth})
+                self.by_source[source] += 1
+            self._cond.notify_all()
+            return not self.full()
+
+    def seed(self, index: int) -> Optional[Dict[str, Any]]:
+        """
+        Получить найденную группу по порядковому номеру, дождавшись ее появления
+        :param index: Номер группы
+        :return: Группа; None, если групп больше не будет или набран лимит
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.full() or index < len(self.groups) or self.producers == 0)
+            if self.full() or index >= len(self.groups):
+                return None
+            return self.groups[index]
+
+    def producer_done(self) -> None:
+        with self._cond:
+            self.producers -= 1
+            self._cond.notify_all()
+
+
+def _spend(calls: ApiBudget, method: str) -> bool:
+    """
+    Списать вызов из бюджета поиска
+    :param calls: Бюджет запросов поиска
+    :param method: Имя метода
+    :return: False, если бюджет исчерпан и вызов делать нельзя
+    """
+    if calls.exhausted():
+        return False
+    calls.spend(method)
+    return True
+
+
+def source_groups_search(vk, search_query: str, sink: GroupSink, calls: ApiBudget) -> None:
+    """
+    Источник: поиск групп по названию (`groups.search`). Основной источник: вызовы учитываются в бюджете поиска,
+    но не ограничиваются им
     """
-    results_groups: List[Dict[str, Any]] = []
     offset = 0
-    while len(results_groups) < group_limit:
-        count = min(BATCH_SIZE, group_limit - len(results_groups))
-        resp = vk.groups.search(q=search_query, count=count, offset=offset)
+    while not sink.full():
+        calls.spend("groups.search")
+        resp = vk.groups.search(q=search_query, count=BATCH_SIZE, offset=offset, fields=GROUP_FIELDS)
         items = resp.get("items", [])
-        if not items:
-            break
-        results_groups.extend(items)
-        if len(items) < count:
+        if not sink.add(items, "groups") or len(items) < BATCH_SIZE:
             break
         offset += len(items)
-        time.sleep(API_SLEEP)
-    return results_groups
+
+
+def source_newsfeed(vk, search_query: str, sink: GroupSink, calls: ApiBudget) -> None:
+    """
+    Источник: группы, опубликовавшие недавние посты с поисковой фразой (`newsfeed.search`)
+    """
+    start_from = None
+    for _ in range(NEWSFEED_PAGES):
+        if sink.full() or not _spend(calls, "newsfeed.search"):
+            break
+        params = {"q": search_query, "count": NEWSFEED_PAGE, "extended": 1, "fields": GROUP_FIELDS}
+        if start_from:
+            params["start_from"] = start_from
+        resp = vk.newsfeed.search(**params)
+        groups_by_id = {g["id"]: g for g in resp.get("groups", [])}
+        owners = dict.fromkeys(-p["owner_id"] for p in resp.get("items", []) if p.get("owner_id", 0) < 0)
+        # закрытые группы пропускаются: их стену и фото все равно не прочитать
+        found = [groups_by_id[gid] for gid in owners if gid in groups_by_id and not groups_by_id[gid].get("is_closed")]
+        if not sink.add(found, "newsfeed"):
+            break
+        start_from = resp.get("next_from")
+        if not start_from:
+            break
+
+
+def related_groups(vk, group_id: int, calls: ApiBudget) -> List[Dict[str, Any]]:
+    """
+    Найти группы, связанные с группой: источники репостов в ее последних постах
+    :param vk: VK API объект
+    :param group_id: id группы
+    :param calls: Бюджет запросов поиска
+    :return: Открытые связанные группы
+    """
+    if not _spend(calls, "wall.get"):
+        return []
+    resp = vk.wall.get(owner_id=-abs(group_id), count=RELATED_POSTS, extended=1, fields=GROUP_FIELDS)
+    related = dict.fromkeys(-c["owner_id"] for p in resp.get("items", []) for c in p.get("copy_history", [])
+                            if c.get("owner_id", 0) < 0 and -c["owner_id"] != abs(group_id))
+    groups_by_id = {g["id"]: g for g in resp.get("groups", [])}
+    missing = [gid for gid in related if gid not in groups_by_id]
+    if missing and _spend(calls, "groups.getById"):
+        by_id = vk.groups.getById(group_ids=",".join(map(str, missing)), fields=GROUP_FIELDS)
+        for g in by_id.get("groups", []) if isinstance(by_id, dict) else by_id:
+            groups_by_id[g["id"]] = g
+    return [groups_by_id[gid] for gid in related if gid in groups_by_id and not groups_by_id[gid].get("is_closed")]
+
+
+def source_related(vk, sink: GroupSink, calls: ApiBudget, depth: int = DISCOVERY_DEPTH) -> None:
+    """
+    Источник: расширение по связанным группам. Затравка — группы, найденные другими источниками,
+    найденные здесь группы сами становятся затравкой, пока не достигнута глубина `depth`
+    """
+    index = 0
+    while not calls.exhausted():
+        seed = sink.seed(index)
+        if seed is None:
+            break
+        index += 1
+        if seed["depth"] >= depth:
+            continue
+        try:
+            found = related_groups(vk, seed["id"], calls)
+        except VkApiError:  # стена закрыта или группа удалена — берем следующую затравку
+            continue
+        if not sink.add(found, "related", seed["depth"] + 1):
+            break
+
+
+SOURCES: Dict[str, Callable] = {
+    "groups": source_groups_search,
+    "newsfeed": source_newsfeed,
+    "related": source_related,
+}
+DEFAULT_SOURCES = ["groups", "newsfeed", "related"]
+
+
+def discover_groups(vk, search_query: str, group_limit: int, sources: List[str] = None, depth: int = DISCOVERY_DEPTH,
+                    max_calls: int = DISCOVERY_MAX_CALLS, exclude_ids: Iterable[int] = ()) -> GroupSink:
+    """
+    Найти группы всеми источниками одновременно
+    :param vk: VK API объект
+    :param search_query: Фраза для поиска групп
+    :param group_limit: Сколько групп найти
+    :param sources: Источники (ключи `SOURCES`)
+    :param depth: Глубина расширения по связанным группам
+    :param max_calls: Бюджет запросов поиска (0 — без ограничения)
+    :param exclude_ids: id групп, которые не нужно добавлять в результат (например, своя группа)
+    :return: Приемник с найденными группами в порядке нахождения
+    """
+    sources = sources or DEFAULT_SOURCES
+    unknown = [s for s in sources if s not in SOURCES]
+    if unknown:
+        raise ValueError(f"Неизвестные источники групп: {unknown}; допустимые: {list(SOURCES)}")
+    sink = GroupSink(group_limit, exclude_ids)
+    sink.producers = sum(1 for s in sources if s != "related")
+    calls = ApiBudget(max_calls=max_calls)
+
+    def run(source: str) -> None:
+        try:
+            if source == "related":  # затравка — найденные группы, а не поисковая фраза
+                SOURCES[source](vk, sink, calls, depth)
+            else:
+                SOURCES[source](vk, search_query, sink, calls)
+        except VkApiError as e:
+            events.warning(f"Источник групп {b.YELLOW}{source}{b.END}: {b.RED}{e}{b.END}", event="source_error", source=source, error=str(e))
+        finally:
+            if source != "related":
+                sink.producer_done()
+
+    with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+        list(pool.map(run, sources))
+    sink.calls = calls.calls
+    return sink
 
 
 def load_groups(path: str) -> Dict[str, Any]:
@@ -55,8 +248,7 @@ def load_groups(path: str) -> Dict[str, Any]:
     :param path: имя файла для чтения
     :return: группы ранее сохранённые в файл
     """
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return serializer.load(path)
 
 
 def save_groups(path: str, search_query: str, groups: List[Dict[str, Any]]) -> None:
@@ -67,8 +259,7 @@ def save_groups(path: str, search_query: str, groups: List[Dict[str, Any]]) -> N
     :param groups: группы
     """
     out_data = {"query": search_query, "found": len(groups), "groups": groups}
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(out_data, f, ensure_ascii=False, indent=2)
+    serializer.dump(out_data, path)
 
 
 def get_group_id(group: Dict[str, Any]) -> int:
@@ -142,32 +333,42 @@ def filter_recent_groups(vk, groups: List[Dict[str, Any]], months: int = 3) -> L
 def main_search_groups(
         access_token: str, my_group_id: str, my_group_short_name: str,
         search_query: str = "фотограф новосибирск",
-        out_file: str = GROUPS_SEARCH_FILE, group_limit: int = 10) -> None:
+        out_file: str = None, group_limit: int = 10, vk=None, ctx: RunContext = DEFAULT_CONTEXT,
+        sources: List[str] = None, depth: int = DISCOVERY_DEPTH, max_calls: int = DISCOVERY_MAX_CALLS) -> None:
     """
     Найти группы по фразе и сохранить в файл
     :param my_group_short_name: Короткое имя вашей группы в VK для исключения из анализа
     :param my_group_id: Id вашей группы в VK для исключения из анализа
     :param access_token: токен доступа VK
     :param search_query: поисковая фраза групп
-    :param out_file: имя файла для сохранения
+    :param out_file: имя файла для сохранения (по умолчанию — файл поиска в каталоге запуска)
     :param group_limit: количество групп для поиска
+    :param vk: готовый объект VK API (общий для нескольких кампаний); если не передан — создается новая сессия
+    :param ctx: контекст запуска (каталог и пути файлов)
+    :param sources: источники групп (ключи `SOURCES`, по умолчанию — все)
+    :param depth: глубина расширения по связанным группам
+    :param max_calls: бюджет запросов поиска на все источники (0 — без ограничения)
     """
-    if not access_token:
+    if vk is None and not access_token:
         raise SystemExit("Требуется access token: передайте через --token или переменную окружения VK_TOKEN")
+    out_file = out_file or ctx.makedirs().files.GROUPS_SEARCH_FILE
 
     # Поиск групп по заданной фразе в `--query`
     try:
-        vk_session = vk_api.VkApi(token=access_token)
-        vk = vk_session.get_api()
-        print(f"Поиск групп по фразе: {b.BLUE}{search_query}{b.END} (limit={group_limit})")
-        groups = search_groups(vk, search_query, group_limit)
+        if vk is None:
+            vk = VkClient(access_token).get_api()
+        sources = sources or DEFAULT_SOURCES
+        events.info(f"Поиск групп по фразе: {b.BLUE}{search_query}{b.END} (limit={group_limit}, источники: {', '.join(sources)})")
+        exclude_ids = [int(my_group_id)] if my_group_id else []
+        sink = discover_groups(vk, search_query, group_limit, sources, depth=depth, max_calls=max_calls, exclude_ids=exclude_ids)
+        groups = sink.groups
         for g in groups:  # исключаем свою группу
             if my_group_id or my_group_short_name:
                 if g['id'] == int(my_group_id) or g['screen_name'] == my_group_short_name:  # Сверяем по id или короткому имени
                     if my_group_short_name:
-                        print(f"Группа {b.YELLOW}{vk_p.URI}/{my_group_short_name}{b.END} {b.GREEN}исключена{b.END} из результатов поиска.")
+                        events.info(f"Группа {b.YELLOW}{vk_p.URI}/{my_group_short_name}{b.END} {b.GREEN}исключена{b.END} из результатов поиска.")
                     elif my_group_id:
-                        print(f"Группа {b.YELLOW}{vk_p.URI}/club{my_group_id}{b.END} {b.GREEN}исключена{b.END} из результатов поиска.")
+                        events.info(f"Группа {b.YELLOW}{vk_p.URI}/club{my_group_id}{b.END} {b.GREEN}исключена{b.END} из результатов поиска.")
                     groups.remove(g)
                     break
 
@@ -177,9 +378,9 @@ def main_search_groups(
         for g in out_data["groups"]:
             for key in useless_params:
                 g.pop(key, None)
-        with open(out_file, "w", encoding="utf-8") as f:
-            json.dump(out_data, f, ensure_ascii=False, indent=2)
-        print(b.GREEN + f"Найдены и сохранены группы: {len(groups)}{b.END} шт. в {b.BLUE}{out_file}{b.END}" + b.END)
+        out_file = serializer.dump(out_data, out_file)
+        ctx.record_stage("search", query=search_query, found=len(groups), by_source=dict(sink.by_source), calls=sink.calls)
+        events.info(b.GREEN + f"Найдены и сохранены группы: {len(groups)}{b.END} шт. в {b.BLUE}{out_file}{b.END}" + b.END)
     except VkApiError as e:
         raise SystemExit(f"VK API error: {e}")
     except Exception as e:
@@ -194,6 +395,9 @@ if __name__ == "__main__":
     parser.add_argument("--limit", "-n", type=int, help="Максимальное число групп", default=50)
     parser.add_argument("--my_vk_group_id", help="Id вашей группы в VK для исключения из анализа", default="", type=str)
     parser.add_argument("--my_vk_group_short_name", help="Короткое имя вашей группы в VK для исключения из анализа", default="", type=str)
+    parser.add_argument("--sources", help="Источники групп через запятую", default=",".join(DEFAULT_SOURCES), type=str)
+    parser.add_argument("--depth", help="Глубина расширения по связанным группам", default=DISCOVERY_DEPTH, type=int)
+    parser.add_argument("--max_calls", help="Бюджет запросов поиска (0 — без ограничения)", default=DISCOVERY_MAX_CALLS, type=int)
     args = parser.parse_args()
     token = args.token
     query = args.query
@@ -201,4 +405,5 @@ if __name__ == "__main__":
     my_vk_group_id = args.my_vk_group_id
     my_vk_group_short_name = args.my_vk_group_short_name
     limit: int = args.limit
-    main_search_groups(token, query, my_vk_group_id, my_vk_group_short_name, out, limit)
+    main_search_groups(token, my_vk_group_id, my_vk_group_short_name, query, out, limit,
+                       sources=args.sources.split(","), depth=args.depth, max_calls=args.max_calls)
@@ -0,0 +1,52 @@
+import random
+import unittest
+import analytics
+from analytics import Incidence, analyze_python, analyze_sparse
+
+
+def incidence(pairs):
+    result = Incidence()
+    for lead_id, group_id in pairs:
+        result.add(lead_id, group_id)
+    return result
+
+
+# группы 10 и 20 делят лидов 1 и 2, группа 30 — только лида 2; лид 1 дважды активен в группе 10
+SAMPLE = [(1, 10), (1, 10), (1, 20), (2, 10), (2, 20), (2, 30), (3, 10), (4, 30)]
+
+
+class AnalyticsTest(unittest.TestCase):
+    def check_sample(self, analyze):
+        leads, pairs = analyze(incidence(SAMPLE))
+        self.assertEqual([(x["lead_id"], x["groups"], x["interactions"]) for x in leads], [(2, 3, 3), (1, 2, 3)])
+        by_pair = {(p["group_a"], p["group_b"]): (p["shared"], p["jaccard"]) for p in pairs}
+        self.assertEqual(by_pair, {(10, 20): (2, round(2 / 3, 6)), (10, 30): (1, 0.25), (20, 30): (1, round(1 / 3, 6))})
+        self.assertEqual((pairs[0]["size_a"], pairs[0]["size_b"]), (3, 2))
+
+    def test_python_backend(self):
+        self.check_sample(analyze_python)
+
+    @unittest.skipIf(analytics.sp is None, "scipy не установлен")
+    def test_sparse_backend(self):
+        self.check_sample(analyze_sparse)
+
+    @unittest.skipIf(analytics.sp is None, "scipy не установлен")
+    def test_backends_agree(self):
+        rnd = random.Random(3)
+        data = incidence((rnd.randrange(300), rnd.randrange(1, 15)) for _ in range(2000))
+
+        def key(rows):
+            return sorted(tuple(sorted(r.items())) for r in rows)
+
+        for min_groups in (1, 3):
+            sparse, python = analyze_sparse(data, min_groups, 0), analyze_python(data, min_groups, 0)
+            self.assertEqual(key(sparse[0]), key(python[0]))
+            self.assertEqual(key(sparse[1]), key(python[1]))
+        top = analyze_sparse(data, top_pairs=5)[1]
+        self.assertEqual(len(top), 5)
+        self.assertEqual([p["shared"] for p in top], sorted((p["shared"] for p in analyze_python(data, top_pairs=0)[1]), reverse=True)[:5])
+
+    def test_rows_without_group_are_skipped(self):
+        data = Incidence.from_rows([{"lead_id": 1, "group_id": None}, {"lead_id": None, "group_id": 5},
+                                    {"lead_id": 2, "group_id": 5}])
+        self.assertEqual((len(data), data.leads, data.groups), (1, [2], [5]))
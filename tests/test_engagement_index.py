@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from classes.engagement_index import SMOOTHING, EngagementIndex, engagement_from_posts
+
+DAY = 24 * 60 * 60
+NOW = 1_800_000_000
+
+
+class EngagementFromPostsTest(unittest.TestCase):
+    def test_pinned_post_is_ignored(self):
+        posts = [{"date": NOW - DAY, "likes": {"count": 4}, "comments": {"count": 2}},
+                 {"date": NOW - 2 * DAY, "likes": {"count": 2}, "comments": {"count": 0}},
+                 {"date": NOW - 400 * DAY, "is_pinned": 1, "likes": {"count": 1000}}]
+        stats = engagement_from_posts(posts, members_count=50, now=NOW)
+        self.assertEqual(stats["sampled"], 2)
+        self.assertEqual(stats["posts_per_day"], 1.0)
+        self.assertEqual(stats["avg_likes"], 3.0)
+        self.assertEqual(stats["expected_yield"], 4.0)
+
+    def test_no_posts(self):
+        self.assertEqual(engagement_from_posts([], now=NOW)["expected_yield"], 0.0)
+
+
+class EngagementIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "engagement_index.json")
+
+    def test_update_smooths_with_previous_estimate(self):
+        index = EngagementIndex(self.path)
+        index.update(-1, {"posts_per_day": 1.0, "avg_likes": 0.0, "avg_comments": 0.0, "expected_yield": 10.0})
+        entry = index.update(1, {"posts_per_day": 1.0, "avg_likes": 0.0, "avg_comments": 0.0, "expected_yield": 0.0})
+        self.assertEqual(entry["expected_yield"], round((1 - SMOOTHING) * 10.0, 3))
+
+    def test_below_drops_only_estimated_groups(self):
+        index = EngagementIndex(self.path)
+        index.update(1, {"posts_per_day": 0.1, "avg_likes": 0.0, "avg_comments": 0.0, "expected_yield": 0.1})
+        self.assertTrue(index.below(1, 1.0))
+        self.assertFalse(index.below(2, 1.0))  # не оценивалась
+        self.assertFalse(index.below(1, 0))  # порог не задан
+        self.assertEqual(index.summary(), {"size": 1, "updated": 1, "dropped": 1})
+
+    def test_save_merges_estimates_of_concurrent_runs(self):
+        first, second = EngagementIndex.load(self.path), EngagementIndex.load(self.path)
+        stats = {"posts_per_day": 1.0, "avg_likes": 1.0, "avg_comments": 0.0, "expected_yield": 1.0}
+        first.update(1, stats)
+        second.update(2, stats)
+        first.save()
+        second.save()
+        merged = EngagementIndex.load(self.path)
+        self.assertIsNotNone(merged.expected_yield(1))
+        self.assertIsNotNone(merged.expected_yield(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
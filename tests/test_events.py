@@ -0,0 +1,56 @@
+import io
+import json
+import unittest
+from unittest import mock
+from classes import events
+
+
+class EventsTest(unittest.TestCase):
+    def setUp(self):
+        saved = dict(events._config)
+        self.addCleanup(events._config.update, saved)
+        self.out = io.StringIO()
+        events.configure(stream=self.out, level=events.INFO, progress_interval=3600)
+
+    def lines(self):
+        return self.out.getvalue().splitlines()
+
+    def test_json_mode_strips_colors_and_keeps_fields(self):
+        events.configure(mode=events.MODE_JSON)
+        events.info("\033[92mИтого\033[0m: 5", event="stage_done", groups=5)
+        events.emit("group_error", "скрыто", events.DEBUG, group_id=1)
+        [record] = [json.loads(line) for line in self.lines()]
+        self.assertEqual((record["event"], record["msg"], record["groups"]), ("stage_done", "Итого: 5", 5))
+
+    def test_quiet_mode_shows_only_warnings(self):
+        events.configure(mode=events.MODE_QUIET)
+        events.info("сообщение")
+        events.warning("внимание")
+        self.assertEqual(self.lines(), ["внимание"])
+
+    def test_progress_is_throttled(self):
+        events.configure(mode=events.MODE_TEXT)
+        with events.Progress("Посты", total=1000, unit=" групп") as progress:
+            for _ in range(1000):
+                progress.update(posts=2)
+        [line] = self.lines()  # только итог, а не строка на каждый элемент
+        self.assertTrue(line.startswith("Посты: 1000/1000 групп"))
+        self.assertIn("posts=2000", line)
+
+    def test_progress_renders_after_interval(self):
+        events.configure(mode=events.MODE_JSON)
+        clock = [0.0, 0.5, 5000.0] + [5000.5] * 4  # старт, два update, затем снимки и итог
+        with mock.patch("classes.events.time.monotonic", side_effect=clock):
+            progress = events.Progress("Фото", name="inspect_photos")
+            progress.update()  # 0.5 с — рано
+            progress.update()  # интервал прошел
+            progress.close()
+        records = [json.loads(line) for line in self.lines()]
+        self.assertEqual([(r["done"], r["final"]) for r in records], [(2, False), (2, True)])
+
+    def test_errors_warning_on_close(self):
+        events.configure(mode=events.MODE_QUIET)
+        with events.Progress("Стены", name="inspect_wall") as progress:
+            progress.update(errors=3)
+        self.assertEqual(len(self.lines()), 1)
+        self.assertIn("ошибок запросов 3", self.out.getvalue())
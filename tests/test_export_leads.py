@@ -0,0 +1,47 @@
+import csv
+import tempfile
+import unittest
+from classes import serializer
+from classes.run_context import RunContext
+from export_leads import FORMAT_CSV, INTERACTION_COLUMNS, group_id_from_url, main_export, to_timestamp
+
+
+class ExportLeadsTest(unittest.TestCase):
+    def setUp(self):
+        self.ctx = RunContext(tempfile.mkdtemp()).makedirs()
+        files = self.ctx.files
+        serializer.dump([{"photo_url": "https://vk.com/photo-10_1", "likes": [{"user_id": 1, "user_link": "https://vk.com/id1"}]}],
+                        files.PHOTOS_LIKES_FILE)
+        serializer.dump([{"photo_url": "https://vk.com/photo-10_1", "comments": [
+            {"author_id": 2, "author_link": "https://vk.com/id2", "text": "цена?", "date": "2026-01-02T10:00:00"}]}],
+            files.PHOTOS_COMMENTS_FILE)
+        serializer.dump([{"owner_id": -20, "post_id": 5, "liker_id": 1, "liker_url": "https://vk.com/id1",
+                          "post_url": "https://vk.com/wall-20_5"}], files.WALL_LIKES_FILE)
+        serializer.dump([{"owner_id": -20, "post_id": 5, "author_id": 1, "author_url": "https://vk.com/id1", "text": "да",
+                          "date": 1700000000, "parent_comment_id": 9, "post_url": "https://vk.com/wall-20_5"}],
+                        files.WALL_COMMENTS_FILE)
+
+    def read(self, path):
+        with open(path, encoding="utf-8", newline="") as f:
+            return list(csv.DictReader(f))
+
+    def test_csv_export_in_small_batches(self):
+        result = main_export(self.ctx, FORMAT_CSV, batch_rows=1)
+        self.assertEqual((result["interactions"], result["leads"]), (4, 2))
+        interactions = self.read(result["interactions_file"])
+        self.assertEqual(list(interactions[0]), INTERACTION_COLUMNS)
+        self.assertEqual([r["type"] for r in interactions], ["photo_like", "photo_comment", "wall_like", "wall_reply"])
+        leads = self.read(result["leads_file"])
+        self.assertEqual([(r["lead_id"], r["interactions"], r["likes"], r["comments"], r["groups"]) for r in leads],
+                         [("1", "3", "2", "1", "2"), ("2", "1", "0", "1", "1")])
+        self.assertEqual(leads[0]["first_ts"], leads[0]["last_ts"])
+
+    def test_url_and_time_helpers(self):
+        self.assertEqual(group_id_from_url("https://vk.com/wall-123_45"), 123)
+        self.assertIsNone(group_id_from_url("https://vk.com/photo5_1"))
+        self.assertEqual(to_timestamp(1.5), 1)
+        self.assertIsNone(to_timestamp(""))
+
+
+if __name__ == "__main__":
+    unittest.main()
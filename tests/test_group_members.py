@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from vk_api.exceptions import ApiError
+from classes.run_context import RunContext
+from group_members import SORT_FULL, GroupMembers, load_members, members_file_name
+
+
+class FakeGroup:
+    """Участники группы в порядке вступления; `admin=False` — сортировка по времени недоступна"""
+
+    def __init__(self, joined, admin=True):
+        self.joined, self.admin, self.calls = list(joined), admin, []
+        self.fail_full = False
+
+    @property
+    def groups(self):
+        return self
+
+    def getMembers(self, sort, count, offset, **_):
+        self.calls.append(sort)
+        if sort == SORT_FULL:
+            if self.fail_full:
+                raise ApiError(None, "groups.getMembers", {}, False, {"error_code": 10, "error_msg": "error"})
+            items = sorted(self.joined)
+        elif not self.admin:
+            raise ApiError(None, "groups.getMembers", {}, False, {"error_code": 15, "error_msg": "Access denied"})
+        else:
+            items = self.joined[::-1]
+        return {"count": len(items), "items": items[offset:offset + count]}
+
+
+class GroupMembersTest(unittest.TestCase):
+    def setUp(self):
+        self.ctx = RunContext(tempfile.mkdtemp())
+        self.path = self.ctx.shared_path(members_file_name(-42))
+
+    def test_full_then_incremental_refresh(self):
+        vk = FakeGroup([30, 10, 20])
+        members = GroupMembers.load(42, self.path)
+        self.assertEqual(members.refresh(vk)["mode"], "full")
+        members.save()
+        vk.joined += [5, 50]
+        members = GroupMembers.load(42, self.path)
+        summary = members.refresh(vk)
+        self.assertEqual((summary["mode"], summary["added"], summary["members"]), ("incremental", 2, 5))
+        self.assertIn(5, members)
+        self.assertEqual(vk.calls, [SORT_FULL, "time_desc"])
+
+    def test_without_admin_rights_saved_set_is_used(self):
+        vk = FakeGroup(range(1, 100), admin=False)
+        members = GroupMembers.load(42, self.path)
+        members.refresh(vk)
+        summary = members.refresh(vk)
+        self.assertEqual(summary["mode"], "cached")
+        self.assertFalse(members.meta["incremental"])
+        members.refresh(vk)
+        self.assertEqual(vk.calls, [SORT_FULL, "time_desc"])  # инкрементальное обновление больше не пробуется
+
+    def test_failed_full_sync_keeps_previous_set(self):
+        vk = FakeGroup([1, 2, 3])
+        members = GroupMembers.load(42, self.path)
+        members.refresh(vk)
+        synced = members.meta["full_sync"]
+        vk.fail_full = True
+        summary = members.refresh(vk, full_refresh_days=-1)
+        self.assertEqual((summary["mode"], summary["members"]), ("cached", 3))
+        self.assertEqual(members.meta["full_sync"], synced)
+
+    def test_load_members(self):
+        self.assertIsNone(load_members(self.ctx, ""))
+        self.assertIsNone(load_members(self.ctx, 42))
+        members = GroupMembers(42, self.path)
+        members.refresh(FakeGroup([7]))
+        members.save()
+        self.assertIn(7, load_members(self.ctx, "-42"))
+        self.assertTrue(os.path.exists(members.meta_path))
@@ -0,0 +1,57 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from vk_api.exceptions import ApiError
+from classes.group_reader import GroupReader, parse_shard
+from classes.negative_cache import SCOPE_PHOTOS, SCOPE_WALL, NegativeCache
+
+
+class GroupReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with (gzip.open(path, "wt", encoding="utf-8") if name.endswith(".gz") else open(path, "w", encoding="utf-8")) as f:
+            f.write(text)
+        return path
+
+    def test_json_object_with_groups_and_meta(self):
+        path = self.write("groups.json", json.dumps({"query": "фото", "groups": [{"id": 1}, {"id": 2}, {"id": 1}]}))
+        reader = GroupReader(path)
+        self.assertEqual([g["id"] for g in reader], [1, 2])
+        self.assertEqual(reader.meta, {"query": "фото"})
+        self.assertEqual(reader.summary(), {"read": 3, "skipped": 1})
+
+    def test_jsonl_and_compressed_input(self):
+        path = self.write("groups.jsonl.gz", "\n".join(json.dumps({"id": i}) for i in range(5)))
+        self.assertEqual([g["id"] for g in GroupReader(path)], list(range(5)))
+
+    def test_shard_splits_groups_by_id(self):
+        path = self.write("groups.json", json.dumps([{"id": i} for i in range(10)]))
+        shards = [[g["id"] for g in GroupReader(path, shard=(i, 3))] for i in range(3)]
+        self.assertEqual(sorted(sum(shards, [])), list(range(10)))
+        self.assertEqual(shards[1], [1, 4, 7])
+
+    def test_negative_cache_filters_by_scope(self):
+        path = self.write("groups.json", json.dumps([{"id": 1}, {"id": 2}]))
+        cache = NegativeCache()
+        cache.add(1, ApiError(None, "wall.get", {}, False, {"error_code": 30, "error_msg": "private"}), SCOPE_WALL)
+        self.assertEqual([g["id"] for g in GroupReader(path, neg_cache=cache, scope=SCOPE_WALL)], [2])
+        self.assertEqual([g["id"] for g in GroupReader(path, neg_cache=cache, scope=SCOPE_PHOTOS)], [1, 2])
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            GroupReader(os.path.join(self.dir, "none.json"))
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("1/4"), (1, 4))
+        self.assertIsNone(parse_shard(""))
+        with self.assertRaises(ValueError):
+            parse_shard("4/4")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from history import DATA_FILE_NAME, DAY_PREFIX, PART_PREFIX, InteractionStore, day_of
+
+DAY = 24 * 60 * 60
+NOW = int(time.time())
+
+
+def row(lead_id, item, kind="wall_comment", ts=None, group_id=1):
+    return {"lead_id": lead_id, "lead_url": f"https://vk.com/id{lead_id}", "type": kind, "group_id": group_id,
+            "item_url": f"https://vk.com/wall-1_{item}", "timestamp": ts, "text": None}
+
+
+def append_rows(path, first):
+    InteractionStore(path).append([row(lead_id, 1, ts=NOW) for lead_id in range(first, first + 20)])
+
+
+class InteractionStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = InteractionStore(os.path.join(tempfile.mkdtemp(), "history"))
+
+    def files(self, day):
+        return sorted(os.listdir(os.path.join(self.store.path, DAY_PREFIX + day)))
+
+    def test_append_partitions_by_day_and_skips_known(self):
+        first = self.store.append([row(1, 1, ts=NOW - 3 * DAY), row(2, 1, "wall_like"), row(2, 1, "wall_like")], seen_ts=NOW)
+        self.assertEqual(first, {"rows": 3, "new": 2, "days": 2})
+        self.assertEqual(self.store.days(), sorted([day_of(NOW - 3 * DAY), day_of(NOW)]))
+        again = self.store.append([row(1, 1, ts=NOW - 3 * DAY), row(2, 1, "wall_like"), row(2, 1, "wall_comment", NOW)])
+        self.assertEqual(again["new"], 1)
+
+    def test_compaction_merges_parts_and_updates_leads(self):
+        self.store.append([row(1, 1, ts=NOW), row(2, 1, ts=NOW)])
+        self.store.append([row(1, 2, ts=NOW, group_id=2)])
+        self.assertEqual(len([f for f in self.files(day_of(NOW)) if f.startswith(PART_PREFIX)]), 2)
+        thread = self.store.start_compaction()
+        thread.join()
+        self.assertEqual(getattr(thread, "result"), {"days": 1, "added": 3, "leads": 2})
+        self.assertEqual(self.files(day_of(NOW)), [DATA_FILE_NAME])
+        lead = {x["lead_id"]: x for x in self.store.leads().rows()}[1]
+        self.assertEqual((lead["interactions"], lead["groups"]), (2, 2))
+        # повторное уплотнение без новых частей агрегаты не удваивает
+        self.store.append([row(3, 1, ts=NOW)])
+        self.assertEqual(self.store.compact()["leads"], 3)
+        self.assertEqual({x["lead_id"]: x["interactions"] for x in self.store.leads().rows()}, {1: 2, 2: 1, 3: 1})
+
+    def test_iter_rows_reads_only_recent_days(self):
+        self.store.append([row(1, 1, ts=NOW - 40 * DAY), row(2, 1, ts=NOW - 2 * DAY), row(3, 1, ts=NOW)])
+        self.store.compact()
+        self.store.append([row(4, 1, ts=NOW)])  # часть поверх уплотненного раздела
+        self.assertEqual(sorted(r["lead_id"] for r in self.store.iter_rows(NOW - 7 * DAY)), [2, 3, 4])
+        self.assertEqual(len(list(self.store.iter_rows())), 4)
+
+    def test_concurrent_appends_store_each_row_once(self):
+        processes = [multiprocessing.Process(target=append_rows, args=(self.store.path, first % 60))
+                     for first in range(0, 120, 20)]  # каждая строка пишется двумя процессами
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        self.assertEqual(sorted(r["lead_id"] for r in self.store.iter_rows()), list(range(60)))
+        self.assertEqual(self.store.compact()["added"], 60)
@@ -0,0 +1,52 @@
+import os
+import random
+import tempfile
+import unittest
+from classes.intent_index import INTENTS_FILE, AhoCorasick, IntentIndex, normalize, read_phrases
+
+
+class AhoCorasickTest(unittest.TestCase):
+    def test_overlapping_and_nested_phrases(self):
+        automaton = AhoCorasick()
+        for phrase in ("he", "she", "his", "hers"):
+            automaton.add(phrase, phrase)
+        automaton.build()
+        self.assertEqual(automaton.values("ushers"), {"he", "she", "hers"})
+        self.assertEqual(automaton.values("ahishers"), {"his", "she", "he", "hers"})
+        self.assertEqual(automaton.values("xyz"), set())
+
+    def test_matches_naive_search(self):
+        rnd = random.Random(7)
+        phrases = {"".join(rnd.choice("абв") for _ in range(rnd.randint(1, 4))) for _ in range(30)}
+        automaton = AhoCorasick()
+        for phrase in phrases:
+            automaton.add(phrase, phrase)
+        automaton.build()
+        for _ in range(200):
+            text = "".join(rnd.choice("абвг") for _ in range(rnd.randint(0, 20)))
+            self.assertEqual(automaton.values(text), {p for p in phrases if p in text}, text)
+
+
+class IntentIndexTest(unittest.TestCase):
+    def test_classify_normalizes_text(self):
+        index = IntentIndex([("price", "сколько стоит"), ("price", "цена"), ("booking", "хочу записаться"),
+                             ("booking", "re: запис\\w* на \\d+")])
+        self.assertEqual(index.classify("Сколько   СТОИТ съёмка? Хочу записаться!"), ["booking", "price"])
+        self.assertEqual(index.classify("Можно записаться на 15 число"), ["booking"])
+        self.assertEqual(index.classify("Ёлка в студии"), [])
+        self.assertEqual(index.classify(""), [])
+        self.assertEqual(normalize(" Ёж\n и  ель "), "еж и ель")
+
+    def test_read_phrases(self):
+        path = os.path.join(tempfile.mkdtemp(), "intents.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("# комментарий\n\nprice: цена\nre:booking: запис\\w*\n")
+        self.assertEqual(read_phrases(path), [("price", "цена"), ("booking", "re:запис\\w*")])
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("без двоеточия\n")
+        with self.assertRaises(ValueError):
+            read_phrases(path)
+
+    def test_bundled_intents_file_compiles(self):
+        index = IntentIndex.from_file(os.path.join(os.path.dirname(__file__), "..", INTENTS_FILE))
+        self.assertTrue(index.intents)
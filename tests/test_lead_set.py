@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+from classes.lead_set import LeadSet, lead_id_from_url, read_id_list
+from classes.run_context import RunContext
+from generate_report import SEEN_LEADS_FILE_NAME, write_new_leads
+
+
+def urls(*ids):
+    return [f"https://vk.com/id{i}" if i > 0 else f"https://vk.com/club{-i}" for i in ids]
+
+
+def report_leads(base_dir, first):
+    ctx = RunContext(base_dir, f"run_{first}").makedirs()
+    write_new_leads(ctx, urls(*range(first, first + 50)))
+
+
+class LeadSetTest(unittest.TestCase):
+    def test_update_merges_and_counts_new(self):
+        leads = LeadSet([5, 1, 3])
+        self.assertEqual(leads.update([2, 3, 9, 2]), 2)
+        self.assertEqual(list(leads), [1, 2, 3, 5, 9])
+        self.assertIn(9, leads)
+        self.assertNotIn(4, leads)
+
+    def test_save_and_load(self):
+        path = os.path.join(tempfile.mkdtemp(), "seen", "leads.bin")
+        LeadSet([-7, 42, 2 ** 40]).save(path)
+        self.assertEqual(list(LeadSet.load(path)), [-7, 42, 2 ** 40])
+        self.assertEqual(os.path.getsize(path), 24)
+        self.assertEqual(len(LeadSet.load(path + ".missing")), 0)
+
+    def test_lead_id_from_url(self):
+        self.assertEqual(lead_id_from_url("https://vk.com/id15/"), 15)
+        self.assertEqual(lead_id_from_url("https://vk.com/public77"), -77)
+        self.assertEqual(lead_id_from_url("-3"), -3)
+        self.assertIsNone(lead_id_from_url("https://vk.com/durov"))
+
+    def test_read_id_list(self):
+        path = os.path.join(tempfile.mkdtemp(), "exclude.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("# клиенты\nhttps://vk.com/id1  # Иван\n2\nhttps://vk.com/durov\n")
+        self.assertEqual(read_id_list(path), {1, 2})
+
+
+class NewLeadsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def test_only_unseen_and_not_excluded_leads_are_new(self):
+        first = write_new_leads(RunContext(self.dir, "a").makedirs(), urls(1, 2, 3))
+        self.assertEqual((first["new"], first["seen_total"]), (3, 3))
+        with open(os.path.join(self.dir, "exclude_leads.txt"), "w", encoding="utf-8") as f:
+            f.write("https://vk.com/id4\n")
+        ctx = RunContext(self.dir, "b").makedirs()
+        second = write_new_leads(ctx, urls(2, 3, 4, 5, -6))
+        self.assertEqual({k: second[k] for k in ("new", "seen_before", "excluded")}, {"new": 2, "seen_before": 2, "excluded": 1})
+        self.assertEqual(read_id_list(ctx.files.REPORT_NEW_LEADS), {5, -6})
+
+    def test_rerun_of_same_report_keeps_new_leads(self):
+        write_new_leads(RunContext(self.dir, "a").makedirs(), urls(1))
+        ctx = RunContext(self.dir, "b").makedirs()
+        first = write_new_leads(ctx, urls(1, 2, 3))
+        rerun = write_new_leads(ctx, urls(3, 2, 1), previous=first)
+        self.assertEqual(rerun["new"], 2)
+        self.assertEqual(read_id_list(ctx.files.REPORT_NEW_LEADS), {2, 3})
+        # другие данные — уже не повтор: все лиды виденные
+        changed = write_new_leads(ctx, urls(1, 2), previous=first)
+        self.assertEqual(changed["new"], 0)
+
+    def test_concurrent_reports_keep_all_seen_leads(self):
+        processes = [multiprocessing.Process(target=report_leads, args=(self.dir, first)) for first in range(1, 400, 50)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        self.assertEqual(list(LeadSet.load(os.path.join(self.dir, SEEN_LEADS_FILE_NAME))), list(range(1, 401)))
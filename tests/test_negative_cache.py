@@ -0,0 +1,68 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+from vk_api.exceptions import ApiError
+from classes.negative_cache import ACCESS_TTL_DAYS, DEAD_TTL_DAYS, SCOPE_PHOTOS, SCOPE_WALL, NegativeCache
+
+
+def api_error(code):
+    return ApiError(None, "wall.get", {}, False, {"error_code": code, "error_msg": "error"})
+
+
+class NegativeCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "negative_cache.json")
+
+    def test_dead_group_is_blocked_for_all_scopes(self):
+        cache = NegativeCache(self.path)
+        self.assertTrue(cache.add(-125, api_error(18), SCOPE_WALL))
+        self.assertTrue(cache.blocked(125, SCOPE_PHOTOS))
+        entry = next(iter(cache.entries.values()))
+        self.assertEqual(entry["expires"] - entry["added"], DEAD_TTL_DAYS * 24 * 60 * 60)
+
+    def test_closed_wall_is_blocked_only_for_wall(self):
+        cache = NegativeCache(self.path)
+        self.assertTrue(cache.add(7, api_error(30), SCOPE_WALL))
+        self.assertTrue(cache.blocked(7, SCOPE_WALL))
+        self.assertFalse(cache.blocked(7, SCOPE_PHOTOS))
+        entry = next(iter(cache.entries.values()))
+        self.assertEqual(entry["expires"] - entry["added"], ACCESS_TTL_DAYS * 24 * 60 * 60)
+
+    def test_token_and_transient_errors_are_not_cached(self):
+        cache = NegativeCache(self.path)
+        for code in (5, 6, 7, 10, 15, 29):
+            self.assertFalse(cache.add(1, api_error(code), SCOPE_WALL), code)
+        self.assertEqual(len(cache), 0)
+
+    def test_expired_entries_are_dropped_on_load(self):
+        cache = NegativeCache(self.path)
+        cache.add(1, api_error(30), SCOPE_WALL)
+        cache.save()
+        later = time.time() + (ACCESS_TTL_DAYS + 1) * 24 * 60 * 60
+        with mock.patch("classes.negative_cache.time.time", return_value=later):
+            self.assertEqual(len(NegativeCache.load(self.path)), 0)
+
+    def test_ttl_depends_on_reason(self):
+        cache = NegativeCache(self.path)
+        cache.add(1, api_error(18))  # удалена
+        cache.add(2, api_error(203), SCOPE_PHOTOS)  # закрыта
+        day = 24 * 60 * 60
+        for days, expected in ((ACCESS_TTL_DAYS - 1, (True, True)), (ACCESS_TTL_DAYS + 1, (True, False)),
+                               (DEAD_TTL_DAYS + 1, (False, False))):
+            with self.subTest(days=days), mock.patch("classes.negative_cache.time.time", return_value=time.time() + days * day):
+                self.assertEqual((cache.blocked(1, SCOPE_WALL), cache.blocked(2, SCOPE_PHOTOS)), expected)
+
+    def test_save_merges_entries_of_concurrent_runs(self):
+        first, second = NegativeCache.load(self.path), NegativeCache.load(self.path)
+        first.add(1, api_error(18))
+        second.add(2, api_error(18))
+        first.save()
+        second.save()
+        merged = NegativeCache.load(self.path)
+        self.assertTrue(merged.blocked(1) and merged.blocked(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
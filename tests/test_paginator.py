@@ -0,0 +1,80 @@
+import json
+import re
+import unittest
+from vk_api.exceptions import ApiError
+from classes import paginator
+from classes.retry_queue import RetryQueue
+
+_CALL = re.compile(r"API\.([\w.]+)\((\{.*?\})\)")
+
+
+class FakeList:
+    """Список из `total` элементов за методом `wall.get`; execute может «терять» страницы"""
+
+    def __init__(self, total, lost_offsets=(), failing_offsets=()):
+        self.data = list(range(total))
+        self.lost_offsets = set(lost_offsets)  # execute вернет false вместо страницы
+        self.failing_offsets = set(failing_offsets)  # прямой вызов завершится ошибкой
+        self.calls = []
+
+    def get(self, count, offset, **_):
+        self.calls.append(("wall.get", offset))
+        if offset in self.failing_offsets:
+            raise ApiError(None, "wall.get", {}, False, {"error_code": 10, "error_msg": "error"})
+        return {"count": len(self.data), "items": self.data[offset:offset + count]}
+
+    def execute(self, code):
+        self.calls.append(("execute", None))
+        pages = []
+        for _, params in _CALL.findall(code):
+            params = json.loads(params)
+            offset = params["offset"]
+            pages.append(False if offset in self.lost_offsets
+                         else {"count": len(self.data), "items": self.data[offset:offset + params["count"]]})
+        return pages
+
+    @property
+    def wall(self):
+        return self
+
+
+class FetchAllTest(unittest.TestCase):
+    def test_pages_are_returned_in_offset_order_with_execute_batches(self):
+        vk = FakeList(95)
+        items, count = paginator.fetch_all(vk, "wall.get", {}, 10, pages_per_call=3)
+        self.assertEqual(items, list(range(95)))
+        self.assertEqual(count, 95)
+        self.assertEqual(len(vk.calls), paginator.calls_needed(95, 10, 3))
+
+    def test_early_stop_skips_remaining_batches(self):
+        vk = FakeList(1000)
+        items, _ = paginator.fetch_all(vk, "wall.get", {}, 10, stop=lambda x: x >= 25, pages_per_call=2)
+        self.assertEqual(items, list(range(25)))
+        self.assertEqual(len(vk.calls), 2)  # первая страница и одна пачка из двух страниц
+
+    def test_max_items(self):
+        items, _ = paginator.fetch_all(FakeList(100), "wall.get", {}, 10, max_items=35, pages_per_call=5)
+        self.assertEqual(items, list(range(35)))
+
+    def test_lost_page_without_retry_queue_is_fetched_again(self):
+        vk = FakeList(50, lost_offsets={20})
+        items, _ = paginator.fetch_all(vk, "wall.get", {}, 10, pages_per_call=5)
+        self.assertEqual(items, list(range(50)))
+        self.assertIn(("wall.get", 20), vk.calls)
+
+    def test_lost_page_without_retry_queue_raises_instead_of_partial_result(self):
+        vk = FakeList(50, lost_offsets={20}, failing_offsets={20})
+        with self.assertRaises(ApiError):
+            paginator.fetch_all(vk, "wall.get", {}, 10, pages_per_call=5)
+
+    def test_lost_page_goes_to_retry_queue(self):
+        vk = FakeList(50, lost_offsets={20})
+        retry, recovered = RetryQueue("test"), []
+        items, _ = paginator.fetch_all(vk, "wall.get", {}, 10, pages_per_call=5, retry=retry, on_retry=recovered.extend)
+        self.assertEqual(items, [x for x in range(50) if not 20 <= x < 30])
+        self.assertEqual(retry.drain(), 1)
+        self.assertEqual(recovered, list(range(20, 30)))
+
+
+if __name__ == "__main__":
+    unittest.main()
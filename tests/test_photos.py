@@ -0,0 +1,85 @@
+import unittest
+from types import SimpleNamespace
+from vk_api.exceptions import ApiError
+from classes.negative_cache import SCOPE_PHOTOS, SCOPE_WALL, NegativeCache
+from classes.retry_queue import RetryQueue
+from get_leads_from_photos import PhotoCollector, get_comments, like_records
+
+
+class PhotoCommentsTest(unittest.TestCase):
+    def test_community_author_links_to_club(self):
+        items = [{"id": 2, "text": "от группы", "from_id": -42, "date": 200},
+                 {"id": 1, "text": "от человека", "from_id": 7, "date": 150},
+                 {"id": 0, "text": "старый", "from_id": 8, "date": 50}]
+        vk = SimpleNamespace(photos=SimpleNamespace(getComments=lambda **params: {"count": 3, "items": items}))
+        comments = get_comments(vk, -1, 10, since_ts=100)
+        self.assertEqual([c["author_link"] for c in comments], ["https://vk.com/club42", "https://vk.com/id7"])
+
+    def test_comment_pages_stop_at_window(self):
+        items = [{"id": i, "text": "", "from_id": i, "date": 1000 - i} for i in range(500)]
+        offsets = []
+
+        def comments_page(offset, count, sort, **_):
+            self.assertEqual(sort, "desc")
+            offsets.append(offset)
+            return {"count": len(items), "items": items[offset:offset + count]}
+
+        vk = SimpleNamespace(photos=SimpleNamespace(getComments=comments_page))
+        self.assertEqual(len(get_comments(vk, -1, 10, since_ts=850)), 151)
+        self.assertEqual(offsets, [0, 100])
+
+    def test_like_records(self):
+        self.assertEqual([r["user_link"] for r in like_records([5, -3])], ["https://vk.com/id5", "https://vk.com/club3"])
+
+
+class FakePhotos:
+    """Фото группы от новых к старым; `closed` — группы с закрытыми фото"""
+
+    def __init__(self, photos, closed=()):
+        self.items, self.closed, self.calls = photos, set(closed), []
+
+    def getAll(self, owner_id, offset, count, **_):
+        self.calls.append("photos.getAll")
+        if -owner_id in self.closed:
+            raise ApiError(None, "photos.getAll", {}, False, {"error_code": 200, "error_msg": "Access denied"})
+        return {"count": len(self.items), "items": self.items[offset:offset + count]}
+
+    def getComments(self, photo_id, **_):
+        self.calls.append("photos.getComments")
+        return {"count": 1, "items": [{"id": photo_id, "text": "", "from_id": 1, "date": 1000}]}
+
+    def getList(self, item_id, **_):
+        self.calls.append("likes.getList")
+        return {"count": 1, "items": [item_id]}
+
+    @property
+    def photos(self):
+        return self
+
+    @property
+    def likes(self):
+        return self
+
+
+class PhotoCollectorTest(unittest.TestCase):
+    def test_single_scan_stops_at_window_and_skips_photos_without_counters(self):
+        photos = [{"id": 3, "date": 900, "album_id": -7, "comments": {"count": 1}, "likes": {"count": 1}},  # со стены
+                  {"id": 2, "date": 800, "album_id": 5, "comments": {"count": 0}, "likes": {"count": 0}},
+                  {"id": 1, "date": 100, "album_id": 5, "comments": {"count": 4}, "likes": {"count": 4}}]  # старое
+        vk = FakePhotos(photos)
+        collector = PhotoCollector(vk, since_ts=500, neg_cache=NegativeCache())
+        collector.group({"id": 10})
+        self.assertEqual(vk.calls, ["photos.getAll", "photos.getComments", "likes.getList"])
+        self.assertEqual(collector.counters["photos"], 2)
+        self.assertEqual(collector.comments[0]["photo_url"], "https://vk.com/photo-10_3")
+        self.assertEqual(collector.likes[0]["album_id"], -7)
+
+    def test_closed_photos_go_to_negative_cache(self):
+        vk = FakePhotos([], closed={10})
+        cache, retry = NegativeCache(), RetryQueue("inspect_photos")
+        collector = PhotoCollector(vk, since_ts=0, neg_cache=cache, retry=retry)
+        collector.group({"id": 10})
+        self.assertTrue(cache.blocked(10, SCOPE_PHOTOS))
+        self.assertFalse(cache.blocked(10, SCOPE_WALL))
+        self.assertEqual(len(retry), 0)
+        self.assertEqual(collector.counters["errors"], 1)
@@ -0,0 +1,64 @@
+import unittest
+from classes.api_budget import ApiBudget
+from classes.negative_cache import NegativeCache
+from get_leads_from_photos import PhotoCollector
+import planner
+
+
+def photo(photo_id, comments=0, likes=0):
+    return {"id": photo_id, "comments": {"count": comments}, "likes": {"count": likes}}
+
+
+class ApiBudgetTest(unittest.TestCase):
+    def test_unlimited_budget(self):
+        budget = ApiBudget()
+        self.assertFalse(budget.limited)
+        self.assertEqual(budget.remaining_calls(), float("inf"))
+
+    def test_deadline_uses_current_pace(self):
+        budget = ApiBudget(deadline_minutes=1)
+        self.assertTrue(budget.limited)
+        budget.seconds_per_call = lambda: 0.1
+        fast = budget.remaining_calls()
+        budget.seconds_per_call = lambda: 1.0
+        slow = budget.remaining_calls()
+        self.assertAlmostEqual(fast / slow, 10, places=1)
+        self.assertLessEqual(slow, 60)
+
+    def test_max_calls(self):
+        budget = ApiBudget(max_calls=5)
+        budget.spend("wall.get", 3)
+        self.assertTrue(budget.can_afford(2))
+        self.assertFalse(budget.can_afford(3))
+        budget.spend("likes.getList", 2)
+        self.assertTrue(budget.exhausted())
+        self.assertEqual(budget.summary()["calls_by_method"], {"wall.get": 3, "likes.getList": 2})
+
+
+class PhotoTasksTest(unittest.TestCase):
+    def test_tasks_ordered_by_leads_per_call(self):
+        tasks = planner.build_photo_tasks([(-1, photo(1, comments=150)),  # 2 вызова, 75 лидов на вызов
+                                           (-1, photo(2)),  # без счетчиков — не задача
+                                           (-2, photo(3, likes=900)),  # 1 вызов
+                                           (-2, photo(4, comments=10, likes=5))])  # 2 вызова
+        self.assertEqual([t["photo"]["id"] for t in tasks], [3, 1, 4])
+        self.assertEqual([t["calls"] for t in tasks], [1, 2, 2])
+
+    def test_deferred_photos_follow_budget(self):
+        budget = ApiBudget(max_calls=2)
+        done = []
+
+        class Collector(PhotoCollector):
+            def photo(self, owner_id, p):
+                done.append(p["id"])
+                budget.spend("photos.getComments", planner.build_photo_tasks([(owner_id, p)])[0]["calls"])
+
+        collector = Collector(None, 0, NegativeCache(), budget=budget, defer=True)
+        collector.photos(-1, [photo(1, comments=150), photo(2, comments=30)])
+        collector.photos(-2, [photo(3, likes=900)])
+        self.assertEqual(done, [])
+        # порядок 3, 1, 2: после 3 на фото 1 (2 вызова) бюджета не хватает, а более дешевое 2 помещается
+        self.assertEqual(collector.run_deferred(), 1)
+        self.assertEqual(done, [3, 2])
+        self.assertEqual(collector.counters["photos"], 3)
+        self.assertEqual(collector.deferred, [])
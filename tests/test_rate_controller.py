@@ -0,0 +1,71 @@
+import threading
+import time
+import unittest
+from vk_api.exceptions import ApiError
+from classes.rate_controller import (DECREASE_FACTOR, RPS_STEP, SLOW_START_FACTOR, WARMUP, WINDOW, RateController,
+                                     overload_reason)
+
+
+class RateControllerTest(unittest.TestCase):
+    def succeed(self, controller, n, latency=0.1):
+        for _ in range(n):
+            controller.on_success(latency, time.monotonic())
+
+    def test_slow_start_then_additive_increase(self):
+        controller = RateController(min_delay=0.5, max_rps=10, max_in_flight=4)
+        self.succeed(controller, WINDOW)
+        self.assertAlmostEqual(controller.rps, 2 * SLOW_START_FACTOR)
+        self.assertEqual(controller.limit, 2)
+        controller.on_overload("flood", time.monotonic())
+        after_cut = controller.rps
+        self.assertAlmostEqual(after_cut, max(2, 2 * SLOW_START_FACTOR * DECREASE_FACTOR))
+        self.assertEqual(controller.limit, 1)
+        self.succeed(controller, WINDOW)
+        self.assertAlmostEqual(controller.rps, after_cut + RPS_STEP)
+
+    def test_bounds(self):
+        controller = RateController(min_delay=0.5, max_rps=3, max_in_flight=2)
+        self.succeed(controller, WINDOW * 20)
+        self.assertEqual((controller.rps, controller.limit), (3, 2))
+        for _ in range(10):
+            controller.on_overload("flood", time.monotonic())
+        self.assertEqual((controller.delay, controller.limit), (0.5, 1))
+
+    def test_one_cut_per_overload_burst(self):
+        controller = RateController(min_delay=1, max_rps=20, max_in_flight=8)
+        self.succeed(controller, WINDOW * 6)
+        started = time.monotonic()  # несколько запросов ушли одновременно и все получили флуд-контроль
+        rps = controller.rps
+        for _ in range(4):
+            controller.on_overload("flood", started)
+        self.assertAlmostEqual(controller.rps, rps * DECREASE_FACTOR)
+        self.assertEqual(controller.state()["decreases"], {"flood": 1})
+
+    def test_latency_spike_cuts_rate(self):
+        controller = RateController(min_delay=0.1, max_rps=20)
+        self.succeed(controller, WINDOW)
+        rps = controller.rps
+        self.succeed(controller, WARMUP, latency=0.1)
+        self.succeed(controller, 3, latency=2.0)
+        self.assertLess(controller.rps, rps)
+        self.assertIn("latency", controller.state()["decreases"])
+
+    def test_in_flight_limit(self):
+        controller = RateController(max_in_flight=4)
+        controller.acquire()
+        waiter = threading.Thread(target=controller.acquire)
+        waiter.start()
+        waiter.join(0.1)
+        self.assertTrue(waiter.is_alive())  # limit = 1: второй запрос ждет
+        controller.release()
+        waiter.join(1)
+        self.assertFalse(waiter.is_alive())
+
+    def test_overload_reason(self):
+        def api_error(code):
+            return ApiError(None, "wall.get", {}, False, {"error_code": code, "error_msg": ""})
+
+        self.assertEqual(overload_reason(api_error(9)), "flood")
+        self.assertEqual(overload_reason(api_error(29)), "rate_limit")
+        self.assertEqual(overload_reason(api_error(15)), "")
+        self.assertEqual(overload_reason(ValueError()), "")
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from vk_api.exceptions import ApiError
+from classes import serializer
+from classes.api_budget import ApiBudget
+from classes.retry_queue import RETRY_ATTEMPTS, RetryQueue
+
+
+def api_error(code):
+    return ApiError(None, "wall.get", {}, False, {"error_code": code, "error_msg": "error"})
+
+
+class RetryQueueTest(unittest.TestCase):
+    def test_replay_that_requeues_itself_is_not_recovered(self):
+        queue = RetryQueue("wall_posts")
+
+        def replay():  # как fetch_wall_posts: ошибка записывается в очередь, исключение не пробрасывается
+            queue.add("wall.get", {"offset": 0}, api_error(10), replay)
+
+        queue.add("wall.get", {"offset": 0}, api_error(10), replay)
+        self.assertEqual(queue.drain(), 0)
+        self.assertEqual(queue.summary(), {"added": 3, "retried": 2, "recovered": 0, "dead": 1})
+        self.assertEqual(queue.dead[0]["attempts"], RETRY_ATTEMPTS)
+
+    def test_replay_without_new_errors_is_recovered(self):
+        queue = RetryQueue("wall_posts")
+        received = []
+        queue.add("wall.get", {"offset": 100}, api_error(6), lambda: received.append("page"))
+        self.assertEqual(queue.drain(), 1)
+        self.assertEqual(received, ["page"])
+        self.assertEqual(queue.summary()["recovered"], 1)
+        self.assertFalse(queue.dead)
+
+    def test_raising_replay_is_requeued_until_dead_letter(self):
+        queue = RetryQueue("inspect_photos")
+
+        def replay():
+            raise api_error(10)
+
+        queue.add("photos.getAll", {"offset": 0}, api_error(10), replay)
+        self.assertEqual(queue.drain(), 0)
+        self.assertEqual(len(queue.dead), 1)
+        self.assertEqual(queue.dead[0]["error_code"], 10)
+
+    def test_permanent_error_goes_to_dead_letter(self):
+        queue = RetryQueue("wall_posts")
+        self.assertFalse(queue.add("wall.get", {"offset": 0}, api_error(18), lambda: None))
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.dead[0]["kind"], "dead")
+
+    def test_exhausted_budget_sends_rest_to_dead_letter(self):
+        budget = ApiBudget(max_calls=1)
+        queue = RetryQueue("inspect_photos")
+        calls = []
+        for offset in (0, 100):
+            queue.add("photos.getComments", {"offset": offset}, api_error(10),
+                      lambda: (calls.append(1), budget.spend("photos.getComments")))
+        self.assertEqual(queue.drain(budget), 1)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([d["params"]["offset"] for d in queue.dead], [100])
+
+    def test_dead_letter_file_accumulates_stages(self):
+        path = os.path.join(tempfile.mkdtemp(), "dead_letter.json")
+        for stage in ("inspect_wall", "inspect_photos"):
+            queue = RetryQueue(stage)
+            queue.add("wall.get", {"owner_id": -1}, api_error(18), lambda: None)
+            queue.save(path)
+        RetryQueue("empty").save(path)  # пустая очередь файл не трогает
+        self.assertEqual([d["stage"] for d in serializer.load(path)], ["inspect_wall", "inspect_photos"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import threading
+import unittest
+from classes import serializer
+from classes.run_context import RUN_METADATA_FILE_NAME, RunContext
+
+
+class RunContextTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def test_runs_write_to_own_directories_and_share_base(self):
+        first, second = RunContext(self.dir, "run_1"), RunContext(self.dir, "run_2")
+        self.assertNotEqual(first.files.GROUPS_SEARCH_FILE, second.files.GROUPS_SEARCH_FILE)
+        self.assertTrue(first.files.GROUPS_SEARCH_FILE.startswith(os.path.join(self.dir, "run_1")))
+        self.assertEqual(first.shared_path("seen.json"), second.shared_path("seen.json"))
+        self.assertEqual(first.path("x.json"), os.path.join(self.dir, "run_1", "x.json"))
+
+    def test_without_run_id_files_go_to_out_dir(self):
+        ctx = RunContext(self.dir)
+        self.assertEqual(ctx.out_dir, self.dir)
+        self.assertEqual(ctx.path("x.json"), ctx.shared_path("x.json"))
+
+    def test_stage_metadata_from_threads(self):
+        ctx = RunContext(self.dir, "run")
+        threads = [threading.Thread(target=ctx.record_stage, args=(f"stage_{i}",), kwargs={"groups": i}) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        ctx.record("params", {"days_wall": 15})
+        saved = serializer.load(os.path.join(self.dir, "run", RUN_METADATA_FILE_NAME))
+        self.assertEqual(sorted(saved["stages"]), [f"stage_{i}" for i in range(8)])
+        self.assertEqual(saved["stages"]["stage_3"]["groups"], 3)
+        self.assertIn("finished", saved["stages"]["stage_3"])
+        self.assertEqual(saved["params"], {"days_wall": 15})
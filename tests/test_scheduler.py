@@ -0,0 +1,70 @@
+import contextlib
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from scheduler import Campaign, load_campaigns, run_campaign
+
+STAGES = ["filter_groups.main_filter_groups", "get_leads_from_wall.main_get_leads_from_wall",
+          "get_leads_from_photos.main_get_leads_from_photos", "history.main_history",
+          "generate_report.main_generate_report"]
+
+
+class CampaignTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def campaign(self, **params):
+        return Campaign.from_dict({"query": "фотограф нск", "out_dir": os.path.join(self.dir, "nsk"), **params})
+
+    def run_stages(self, campaign, fail=False):
+        with contextlib.ExitStack() as stack:
+            for target in STAGES:
+                stack.enter_context(mock.patch(target))
+            if fail:
+                stack.enter_context(mock.patch("filter_groups.main_filter_groups", side_effect=RuntimeError("нет сети")))
+            search = stack.enter_context(mock.patch("search_groups.main_search_groups"))
+            run_campaign(campaign, vk=None)
+        return search
+
+    def test_name_defaults_to_query(self):
+        self.assertEqual(self.campaign().name, "фотограф_нск")
+        with self.assertRaises(ValueError):
+            Campaign.from_dict({"name": "no_query"})
+
+    def test_search_repeats_every_n_scans(self):
+        campaign = self.campaign(search_every=2)
+        searched = []
+        for _ in range(4):
+            search = self.run_stages(campaign)
+            searched.append(search.called)
+            # поиск записал бы список групп — дальше нужен только раз в search_every сканирований
+            open(campaign.ctx.files.GROUPS_SEARCH_FILE, "w").close()
+        self.assertEqual(searched, [True, False, True, False])
+        self.assertEqual(campaign.state["scans"], 4)
+
+    def test_state_survives_restart(self):
+        campaign = self.campaign(interval_hours=2)
+        self.run_stages(campaign)
+        restored = self.campaign(interval_hours=2)
+        self.assertEqual(restored.state["scans"], 1)
+        self.assertAlmostEqual(restored.next_run_ts(), campaign.state["last_run_ts"] + 7200)
+
+    def test_stage_error_is_recorded_not_raised(self):
+        campaign = self.campaign()
+        self.run_stages(campaign, fail=True)
+        self.assertEqual(campaign.state["scans"], 0)
+        self.assertEqual(campaign.state["last_error"], "нет сети")
+        self.assertGreater(campaign.state["last_run_ts"], 0)
+
+    def test_campaigns_must_not_share_out_dir(self):
+        path = os.path.join(self.dir, "campaigns.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([{"query": "а", "out_dir": self.dir}, {"query": "б", "out_dir": self.dir}], f)
+        with self.assertRaises(SystemExit):
+            load_campaigns(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
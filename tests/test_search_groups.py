@@ -0,0 +1,42 @@
+import unittest
+from types import SimpleNamespace
+from search_groups import discover_groups
+
+
+class FakeVk:
+    """groups.search находит `found` групп; остальные источники ничего не находят"""
+
+    def __init__(self, found):
+        self.found = found
+        self.search_calls = []
+        self.groups = SimpleNamespace(search=self._search, getById=lambda **_: [])
+        self.newsfeed = SimpleNamespace(search=lambda **_: {"items": [], "groups": []})
+        self.wall = SimpleNamespace(get=lambda **_: {"items": [], "groups": []})
+
+    def _search(self, q, count, offset, **_):
+        self.search_calls.append((count, offset))
+        ids = range(offset + 1, min(self.found, offset + count) + 1)
+        return {"count": self.found, "items": [{"id": gid, "name": q} for gid in ids]}
+
+
+class DiscoverGroupsTest(unittest.TestCase):
+    def test_name_search_is_not_capped_by_discovery_budget(self):
+        vk = FakeVk(found=900)
+        sink = discover_groups(vk, "фотограф", group_limit=800, sources=["groups"], max_calls=1)
+        self.assertEqual(len(sink.groups), 800)
+        self.assertEqual(vk.search_calls, [(1000, 0)])  # одна страница максимального размера
+
+    def test_groups_are_deduplicated_and_excluded(self):
+        vk = FakeVk(found=5)
+        sink = discover_groups(vk, "фотограф", group_limit=10, sources=["groups", "newsfeed", "related"],
+                               exclude_ids=[3])
+        self.assertEqual([g["id"] for g in sink.groups], [1, 2, 4, 5])
+        self.assertEqual(sink.by_source["groups"], 4)
+
+    def test_unknown_source(self):
+        with self.assertRaises(ValueError):
+            discover_groups(FakeVk(found=1), "фотограф", 10, sources=["nope"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from classes import serializer
+
+DATA = {"group": "Фото на документы", "ids": [1, 2, 3], "nested": {"ok": True, "ratio": 0.5}}
+
+
+class SerializerTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(serializer.set_default_compression, "")
+
+    def test_backends_produce_the_same_json(self):
+        for backend in {serializer.BACKEND, "json"}:
+            with self.subTest(backend=backend), mock.patch.object(serializer, "BACKEND", backend):
+                data = serializer.dumps(DATA)
+                self.assertIn("Фото".encode("utf-8"), data)  # кириллица не экранируется
+                self.assertEqual(json.loads(data), DATA)
+                self.assertEqual(serializer.loads(serializer.dumps(DATA, indent=False)), DATA)
+
+    def test_default_compression_adds_extension(self):
+        serializer.set_default_compression("gz")
+        path = serializer.dump(DATA, os.path.join(self.dir, "report.json"))
+        self.assertTrue(path.endswith("report.json.gz"))
+        with gzip.open(path, "rb") as f:
+            self.assertEqual(json.loads(f.read()), DATA)
+        # читатель находит сжатый файл по исходному имени
+        self.assertEqual(serializer.load(os.path.join(self.dir, "report.json")), DATA)
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            serializer.set_default_compression("bz2")
+
+    def test_dump_replaces_file_without_leftovers(self):
+        path = os.path.join(self.dir, "plan.json")
+        serializer.dump({"v": 1}, path)
+        serializer.dump({"v": 2}, path)
+        self.assertEqual(serializer.load(path), {"v": 2})
+        self.assertEqual(os.listdir(self.dir), ["plan.json"])
+
+
+class IterArrayTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        small_buffer = mock.patch.object(serializer, "READ_SIZE", 7)  # значения рвутся на границах буфера
+        small_buffer.start()
+        self.addCleanup(small_buffer.stop)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with (gzip.open(path, "wt", encoding="utf-8") if name.endswith(".gz") else open(path, "w", encoding="utf-8")) as f:
+            f.write(text)
+        return path
+
+    def test_top_level_array(self):
+        items = [123456789, -0.25, "строка, с запятой ]", {"a": [1, {"b": None}]}, [], True]
+        path = self.write("items.json", json.dumps(items, ensure_ascii=False, indent=2))
+        self.assertEqual(list(serializer.iter_array(path)), items)
+
+    def test_array_in_object_field_with_meta(self):
+        path = self.write("groups.json", json.dumps({"query": "фото", "groups": [{"id": 1}, {"id": 22}], "count": 2}))
+        meta = {}
+        self.assertEqual(list(serializer.iter_array(path, "groups", meta)), [{"id": 1}, {"id": 22}])
+        self.assertEqual(meta, {"query": "фото", "count": 2})
+        with self.assertRaises(ValueError):
+            list(serializer.iter_array(path, "items"))
+
+    def test_jsonl_found_by_compressed_name(self):
+        self.write("rows.jsonl.gz", '{"id": 1}\n\n{"id": 2}\n')
+        self.assertEqual(list(serializer.iter_array(os.path.join(self.dir, "rows.jsonl"))), [{"id": 1}, {"id": 2}])
+
+    def test_empty_and_broken_arrays(self):
+        self.assertEqual(list(serializer.iter_array(self.write("empty.json", " [ ] "))), [])
+        with self.assertRaises(ValueError):
+            list(serializer.iter_array(self.write("broken.json", "[1 2]")))
+
+
+if __name__ == "__main__":
+    unittest.main()
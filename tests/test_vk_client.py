@@ -0,0 +1,69 @@
+import unittest
+from unittest import mock
+import requests
+from vk_api.exceptions import ApiError
+from classes.api_budget import ApiBudget
+from classes.vk_client import ERROR_ACCESS, ERROR_FLOOD, ERROR_NETWORK, ERROR_OTHER, VkClient, error_kind
+
+
+def _response(payload):
+    """
+    Ответ HTTP с заданным телом
+    :param payload: Тело ответа
+    :return: Объект, похожий на requests.Response
+    """
+    response = mock.Mock(ok=True)
+    response.json.return_value = payload
+    return response
+
+
+class VkClientFloodTest(unittest.TestCase):
+    def test_flood_error_goes_through_rate_controller(self):
+        vk = VkClient("token", rps_delay=0.01)
+        flood = {"error": {"error_code": 6, "error_msg": "Too many requests per second", "request_params": []}}
+        vk.http.post = mock.Mock(side_effect=[_response(flood), _response({"response": [1]})])
+        with mock.patch("classes.vk_client.backoff_delay", return_value=0):
+            self.assertEqual(vk.method("groups.getById", {"group_id": 1}), [1])
+        self.assertEqual(vk.http.post.call_count, 2)
+        self.assertEqual(vk.controller.state()["decreases"], {"flood": 1})
+        self.assertEqual(vk.metrics()["retries"], 1)
+
+
+class VkClientErrorsTest(unittest.TestCase):
+    def test_error_kind(self):
+        def api_error(code):
+            return ApiError(None, "wall.get", {}, False, {"error_code": code, "error_msg": ""})
+
+        self.assertEqual(error_kind(api_error(9)), ERROR_FLOOD)
+        self.assertEqual(error_kind(api_error(203)), ERROR_ACCESS)
+        self.assertEqual(error_kind(api_error(999)), ERROR_OTHER)
+        self.assertEqual(error_kind(requests.ConnectionError()), ERROR_NETWORK)
+
+    def test_access_error_is_not_retried_but_counted(self):
+        budget = ApiBudget()
+        vk = VkClient("token", budget=budget, rps_delay=0.01)
+        closed = {"error": {"error_code": 203, "error_msg": "Access to group denied", "request_params": []}}
+        vk.http.post = mock.Mock(return_value=_response(closed))
+        with self.assertRaises(ApiError):
+            vk.method("wall.get", {"owner_id": -1})
+        self.assertEqual(vk.http.post.call_count, 1)
+        self.assertEqual(budget.calls_by_method, {"wall.get": 1})
+        self.assertEqual(vk.metrics()["errors"], {ERROR_ACCESS: 1})
+
+    def test_network_errors_are_retried_until_limit(self):
+        vk = VkClient("token", rps_delay=0.01, max_retries=2)
+        vk.http.post = mock.Mock(side_effect=requests.ConnectionError("reset"))
+        with mock.patch("classes.vk_client.backoff_delay", return_value=0), self.assertRaises(requests.ConnectionError):
+            vk.method("wall.get", {"owner_id": -1})
+        self.assertEqual(vk.http.post.call_count, 3)
+        self.assertEqual(vk.budget.calls, 3)
+
+    def test_budget_deadline_follows_client_pace(self):
+        budget = ApiBudget(deadline_minutes=1)
+        vk = VkClient("token", budget=budget, rps_delay=0.5, adaptive=False)
+        self.assertEqual(budget.seconds_per_call(), vk.delay())
+        self.assertLessEqual(budget.remaining_calls(), 120)
+
+
+if __name__ == "__main__":
+    unittest.main()
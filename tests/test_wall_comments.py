@@ -0,0 +1,76 @@
+import json
+import re
+import unittest
+from types import SimpleNamespace
+from classes.retry_queue import RetryQueue
+from get_leads_from_wall import THREAD_ITEMS_COUNT, THREAD_PAGE, expand_threads, fetch_comments_for_post
+
+
+def comment(comment_id, date, thread=None):
+    c = {"id": comment_id, "from_id": comment_id, "date": date, "text": ""}
+    if thread is not None:
+        c["thread"] = thread
+    return c
+
+
+class WallCommentsTest(unittest.TestCase):
+    def test_thread_replies_respect_window(self):
+        inline = [comment(10 + i, 500 + i) for i in range(THREAD_ITEMS_COUNT)]
+        expanded = inline + [comment(90, 600), comment(91, 50)]  # 91 — ответ старше окна
+        items = [comment(1, 400, {"count": len(expanded), "items": inline}),
+                 comment(2, 90, {"count": 1, "items": [comment(20, 95), comment(21, 150)]})]
+        executed = []
+
+        def execute(code):
+            executed.append(code)
+            return [{"items": expanded}]
+
+        vk = SimpleNamespace(wall=SimpleNamespace(getComments=lambda **params: {"current_level_count": 2, "items": items}),
+                             execute=execute)
+        comments = fetch_comments_for_post(vk, -1, 7, since_ts=100)
+        ids = [c["comment_id"] for c in comments]
+        self.assertEqual(ids[0], 1)
+        self.assertIn(90, ids)  # недостающий ответ ветки дозагружен
+        self.assertIn(21, ids)  # свежий ответ в ветке старого комментария
+        self.assertNotIn(91, ids)
+        self.assertNotIn(20, ids)
+        self.assertNotIn(2, ids)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(executed), 1)
+
+    def test_paging_stops_at_first_comment_older_than_window(self):
+        top = [comment(1000 - i, 1000 - i) for i in range(1000)]  # от новых к старым, дата = id
+        offsets = []
+
+        def get_comments(offset, count, sort, **_):
+            self.assertEqual(sort, "desc")
+            offsets.append(offset)
+            return {"current_level_count": len(top), "items": top[offset:offset + count]}
+
+        vk = SimpleNamespace(wall=SimpleNamespace(getComments=get_comments))
+        comments = fetch_comments_for_post(vk, -1, 7, since_ts=850)
+        self.assertEqual(len(comments), 151)
+        self.assertEqual(offsets, [0, 100])  # страницы старше окна не запрашиваются
+        self.assertEqual(len(fetch_comments_for_post(vk, -1, 7)), 1000)
+
+    def test_thread_pages_are_batched_and_lost_pages_retried(self):
+        def page(params):
+            start = params["comment_id"] * 1000 + params["offset"]
+            return {"items": [comment(start + i, 500) for i in range(min(THREAD_PAGE, 150 - params["offset"]))]}
+
+        calls = []
+
+        def execute(code):
+            batch = [json.loads(arg) for arg in re.findall(r"API\.wall\.getComments\((\{.*?\})\)", code)]
+            calls.append(len(batch))
+            return [False if len(calls) == 1 and i == 0 else page(params) for i, params in enumerate(batch)]
+
+        vk = SimpleNamespace(execute=execute, wall=SimpleNamespace(getComments=lambda **params: page(params)))
+        threads = [{"comment_id": i, "count": 150, "known": set()} for i in range(1, 31)]
+        retry, recovered = RetryQueue("inspect_wall"), []
+        replies = expand_threads(vk, -1, 7, threads, retry, recovered.extend, since_ts=100)
+        self.assertEqual(calls, [25, 25, 10])  # 60 страниц веток в трех execute
+        self.assertEqual(len(replies), 30 * 150 - THREAD_PAGE)
+        self.assertEqual(retry.drain(), 1)
+        self.assertEqual(len(recovered), THREAD_PAGE)
+        self.assertEqual(len({r["comment_id"] for r in replies + recovered}), 30 * 150)